@@ -15,6 +15,8 @@ from localmoves.utils.config_manager import (
     get_notice_period_multipliers,   # ADD THIS
     get_move_day_multipliers         # ADD THIS
 )
+from localmoves.utils.pagination import get_page_size, decode_cursor, build_page
+from localmoves.utils import view_quota
 from datetime import datetime, timedelta
 import json
 import calendar as cal
@@ -87,13 +89,13 @@ def check_company_can_view_requests(company):
     Check if company has remaining request views based on subscription plan
     
     Args:
-        company: Company dict with subscription_plan and requests_viewed_this_month
+        company: Company dict with subscription_plan, requests_viewed_this_month and quota_period
     
     Returns:
         bool: True if company can view more requests, False otherwise
     """
     plan = company.get('subscription_plan', 'Free')
-    viewed_count = int(company.get('requests_viewed_this_month', 0) or 0)
+    viewed_count = view_quota.get_period_usage(company)
     
     # Get limit for the plan from dynamic config
     plan_limits = get_plan_limits()
@@ -1071,7 +1073,7 @@ def search_number_of_companies_by_pincode(pincode=None):
             if check_company_can_view_requests(company):
                 # Add plan info for transparency
                 plan = company.get('subscription_plan', 'Free')
-                viewed = int(company.get('requests_viewed_this_month', 0) or 0)
+                viewed = view_quota.get_period_usage(company)
                 # limit = PLAN_LIMITS.get(plan, 5)
                 
                 # company['subscription_info'] = {
@@ -1572,7 +1574,7 @@ def search_companies_by_pincode(pincode=None, property_type=None, property_size=
             
             # Add subscription info
             plan = company.get('subscription_plan', 'Free')
-            viewed = int(company.get('requests_viewed_this_month', 0) or 0)
+            viewed = view_quota.get_period_usage(company)
             # limit = PLAN_LIMITS.get(plan, 5)
             
             # company['subscription_info'] = {
@@ -1745,22 +1747,47 @@ def get_property_size_options(property_type=None):
     
 # ------------------------- Admin: Get All Companies ------------------------- #
 @frappe.whitelist(allow_guest=True)
-def get_all_companies():
-    """Get all companies (Admin only)"""
+def get_all_companies(cursor=None, page_size=None):
+    """
+    Get all companies (Admin only), newest first, one keyset page at a time
+    
+    Query Parameters:
+    - page_size: Companies per page (default 20, max 100)
+    - cursor: next_cursor from the previous page (omit for the first page)
+    """
     try:
         user_info = get_user_from_token()
         if user_info['role'] != "Admin":
             frappe.local.response['http_status_code'] = 403
             return {"success": False, "message": "Only Admins can access all companies"}
-
-        companies = frappe.get_all("Logistics Company",
-                                   fields=["*"],
-                                   order_by="created_at desc")
+        
+        data = get_request_data()
+        page_size = get_page_size(page_size or data.get("page_size"))
+        after = decode_cursor(cursor or data.get("cursor"), 2)
+        
+        keyset_condition = ""
+        if after:
+            keyset_condition = """
+            WHERE (creation < %(after_creation)s
+                OR (creation = %(after_creation)s AND name > %(after_name)s))"""
+        
+        companies = frappe.db.sql("""
+            SELECT *
+            FROM `tabLogistics Company`{keyset_condition}
+            ORDER BY creation DESC, name ASC
+            LIMIT %(limit)s
+        """.format(keyset_condition=keyset_condition), {
+            "after_creation": after[0] if after else None,
+            "after_name": after[1] if after else None,
+            "limit": page_size + 1
+        }, as_dict=True)
+        
+        companies, pagination = build_page(companies, page_size, ["creation", "name"])
         
         for company in companies:
             parse_json_fields(company)
         
-        return {"success": True, "count": len(companies), "data": companies}
+        return {"success": True, "count": len(companies), "data": companies, "pagination": pagination}
 
     except frappe.AuthenticationError as e:
         frappe.local.response['http_status_code'] = 401
@@ -1809,7 +1836,10 @@ def search_companies_with_cost(
     user_email=None,
     send_email=False,
     # ✅ CRITICAL: Accept current_date from frontend to ensure timezone consistency
-    current_date=None
+    current_date=None,
+    # Keyset pagination over the price-ordered results
+    cursor=None,
+    page_size=None
 ):
     """
     Search companies with EXACT pricing as per request_pricing.py
@@ -1871,6 +1901,9 @@ def search_companies_with_cost(
        
         # ✅ CRITICAL: Accept current_date from frontend (added to parameter extraction)
         current_date = current_date or data.get("current_date")
+        
+        page_size = get_page_size(page_size or data.get("page_size"))
+        after = decode_cursor(cursor or data.get("cursor"), 2)
        
         if not pincode:
             frappe.local.response['http_status_code'] = 400
@@ -2035,25 +2068,111 @@ def search_companies_with_cost(
         if include_reassembly and reassembly_volume_m3 == 0:
             reassembly_volume_m3 = total_volume_m3
        
+        # ========== CALCULATE PROPERTY ASSESSMENT (ADDITIVE) ==========
+        # Same for every company, so computed once outside the company loop
+        # Collection Assessment - Load from config_manager (dynamic, not hardcoded)
+        COLLECTION_ASSESSMENT = get_collection_assessment()
+       
+        collection_increment = 0.0
+        collection_increment += COLLECTION_ASSESSMENT['parking'].get(collection_parking, 0.0)
+        collection_increment += COLLECTION_ASSESSMENT['parking_distance'].get(collection_parking_distance, 0.0)
+       
+        if property_type in ['house']:
+            collection_increment += COLLECTION_ASSESSMENT['house_type'].get(collection_house_type, 0.0)
+        else:
+            collection_increment += COLLECTION_ASSESSMENT['internal_access'].get(collection_internal_access, 0.0)
+            collection_increment += COLLECTION_ASSESSMENT['floor_level'].get(collection_floor_level, 0.0)
+       
+        # Delivery Assessment (same structure)
+        delivery_increment = 0.0
+        delivery_increment += COLLECTION_ASSESSMENT['parking'].get(delivery_parking, 0.0)
+        delivery_increment += COLLECTION_ASSESSMENT['parking_distance'].get(delivery_parking_distance, 0.0)
+       
+        if property_type in ['house']:
+            delivery_increment += COLLECTION_ASSESSMENT['house_type'].get(delivery_house_type, 0.0)
+        else:
+            delivery_increment += COLLECTION_ASSESSMENT['internal_access'].get(delivery_internal_access, 0.0)
+            delivery_increment += COLLECTION_ASSESSMENT['floor_level'].get(delivery_floor_level, 0.0)
+       
+        collection_multiplier = 1.0 + collection_increment
+        delivery_multiplier = 1.0 + delivery_increment
+       
+        # ========== PRICE SORT KEY ==========
+        # The subtotal is linear in each company's rates, and the move date
+        # multiplier is the same for every company, so the price order can be
+        # computed in SQL. Only the requested page is then fully priced.
+        config = get_config()
+        pricing_config = config.get('pricing', {})
+        distance = float(distance_miles or 0)
+        packing_percentage = pricing_config.get('packing_percentage', 0.35) if include_packing else 0
+       
+        price_sort_key = """ROUND(
+                IFNULL(NULLIF(loading_cost_per_m3, 0), %(default_loading)s) * %(loading_weight)s
+                + IFNULL(NULLIF(cost_per_mile_under_25, 0), %(default_mile_under)s) * %(mile_under_weight)s
+                + IFNULL(NULLIF(cost_per_mile_over_25, 0), %(default_mile_over)s) * %(mile_over_weight)s
+                + IFNULL(NULLIF(disassembly_cost_per_item, 0), %(default_disassembly)s) * %(disassembly_weight)s
+                + IFNULL(NULLIF(assembly_cost_per_item, 0), %(default_assembly)s) * %(assembly_weight)s
+            , 4)"""
+       
+        sort_params = {
+            "default_loading": float(pricing_config.get('loading_cost_per_m3', 35.00)),
+            "default_mile_under": float(pricing_config.get('cost_per_mile_under_100', 0.25)),
+            "default_mile_over": float(pricing_config.get('cost_per_mile_over_100', 0.15)),
+            "default_disassembly": float(pricing_config.get('disassembly_per_m3', 25.00)),
+            "default_assembly": float(pricing_config.get('assembly_per_m3', 50.00)),
+            "loading_weight": total_volume_m3 * collection_multiplier * delivery_multiplier * (1 + packing_percentage),
+            "mile_under_weight": min(distance, 100) * total_volume_m3,
+            "mile_over_weight": max(distance - 100, 0) * total_volume_m3,
+            "disassembly_weight": dismantling_volume_m3 if include_dismantling else 0,
+            "assembly_weight": reassembly_volume_m3 if include_reassembly else 0
+        }
+       
         # ========== SEARCH COMPANIES ==========
-        companies = frappe.db.sql("""
-            SELECT *
+        search_params = dict(sort_params, pincode=pincode, pincode_pattern=f'%{pincode}%')
+       
+        total_companies = frappe.db.sql("""
+            SELECT COUNT(*)
             FROM `tabLogistics Company`
             WHERE is_active = 1
             AND (
                 pincode = %(pincode)s
                 OR areas_covered LIKE %(pincode_pattern)s
             )
-            ORDER BY created_at DESC
-        """, {
-            "pincode": pincode,
-            "pincode_pattern": f'%{pincode}%'
-        }, as_dict=True)
+        """, search_params)[0][0]
+       
+        keyset_condition = ""
+        if after:
+            keyset_condition = """
+            AND (
+                {key} > %(after_price)s
+                OR ({key} = %(after_price)s AND name > %(after_name)s)
+            )""".format(key=price_sort_key)
+       
+        companies = frappe.db.sql("""
+            SELECT *, {price_sort_key} as price_sort_key
+            FROM `tabLogistics Company`
+            WHERE is_active = 1
+            AND (
+                pincode = %(pincode)s
+                OR areas_covered LIKE %(pincode_pattern)s
+            ){keyset_condition}
+            ORDER BY price_sort_key ASC, name ASC
+            LIMIT %(limit)s
+        """.format(price_sort_key=price_sort_key, keyset_condition=keyset_condition), dict(
+            search_params,
+            after_price=after[0] if after else None,
+            after_name=after[1] if after else None,
+            limit=page_size + 1
+        ), as_dict=True)
+       
+        companies, pagination = build_page(companies, page_size, ["price_sort_key", "name"])
        
         available_companies = []
         filtered_reasons = []
        
         for company in companies:
+            company.pop('price_sort_key', None)
+            
             # ========== COMMENTED OUT: Jobs service check ==========
             # CRITICAL: For booking, ONLY show companies with JOBS service active
             # Leads service is for initial search/viewing only, NOT for booking
@@ -2070,8 +2189,6 @@ def search_companies_with_cost(
             parse_json_fields(company)
            
             # ========== GET COMPANY RATES ==========
-            config = get_config()
-            pricing_config = config.get('pricing', {})
             company_rates = {
                 'loading_cost_per_m3': float(company.get('loading_cost_per_m3', 0) or pricing_config.get('loading_cost_per_m3', 35.00)),
                 'disassembly_cost_per_m3': float(company.get('disassembly_cost_per_item', 0) or pricing_config.get('disassembly_per_m3', 25.00)),
@@ -2080,34 +2197,6 @@ def search_companies_with_cost(
                 'cost_per_mile_over_100': float(company.get('cost_per_mile_over_25', 0) or pricing_config.get('cost_per_mile_over_100', 0.15)),
             }
            
-            # ========== CALCULATE PROPERTY ASSESSMENT (ADDITIVE) ==========
-            # Collection Assessment - Load from config_manager (dynamic, not hardcoded)
-            COLLECTION_ASSESSMENT = get_collection_assessment()
-           
-            collection_increment = 0.0
-            collection_increment += COLLECTION_ASSESSMENT['parking'].get(collection_parking, 0.0)
-            collection_increment += COLLECTION_ASSESSMENT['parking_distance'].get(collection_parking_distance, 0.0)
-           
-            if property_type in ['house']:
-                collection_increment += COLLECTION_ASSESSMENT['house_type'].get(collection_house_type, 0.0)
-            else:
-                collection_increment += COLLECTION_ASSESSMENT['internal_access'].get(collection_internal_access, 0.0)
-                collection_increment += COLLECTION_ASSESSMENT['floor_level'].get(collection_floor_level, 0.0)
-           
-            # Delivery Assessment (same structure)
-            delivery_increment = 0.0
-            delivery_increment += COLLECTION_ASSESSMENT['parking'].get(delivery_parking, 0.0)
-            delivery_increment += COLLECTION_ASSESSMENT['parking_distance'].get(delivery_parking_distance, 0.0)
-           
-            if property_type in ['house']:
-                delivery_increment += COLLECTION_ASSESSMENT['house_type'].get(delivery_house_type, 0.0)
-            else:
-                delivery_increment += COLLECTION_ASSESSMENT['internal_access'].get(delivery_internal_access, 0.0)
-                delivery_increment += COLLECTION_ASSESSMENT['floor_level'].get(delivery_floor_level, 0.0)
-           
-            collection_multiplier = 1.0 + collection_increment
-            delivery_multiplier = 1.0 + delivery_increment
-           
             # ========== CALCULATE INVENTORY COST ==========
             base_inventory = total_volume_m3 * company_rates['loading_cost_per_m3']
             inventory_cost = base_inventory * collection_multiplier * delivery_multiplier
@@ -2132,7 +2221,6 @@ def search_companies_with_cost(
             }
            
             # ========== CALCULATE MILEAGE COST ==========
-            distance = float(distance_miles or 0)
             if distance <= 100:
                 mileage_cost = distance * total_volume_m3 * company_rates['cost_per_mile_under_100']
             else:
@@ -2145,8 +2233,6 @@ def search_companies_with_cost(
             # PACKING = PERCENTAGE OF INVENTORY COST (from config_manager, not hardcoded)
             packing_cost = 0
             if include_packing:
-                pricing_config = get_config()
-                packing_percentage = pricing_config.get('pricing', {}).get('packing_percentage', 0.35)
                 packing_cost = inventory_cost * packing_percentage
            
             # DISMANTLING = Volume × £25 per m³
@@ -2430,8 +2516,7 @@ def search_companies_with_cost(
 
             available_companies.append(company)
        
-        # Sort by final total
-        available_companies.sort(key=lambda x: x['exact_pricing']['final_total'])
+        # Already in final total order: the SQL price sort key is proportional to it
        
         # ========== COMMENTED OUT: Subscription exhaustion check ==========
         # CRITICAL: Check if ANY company has exhausted their subscription
@@ -2460,8 +2545,9 @@ def search_companies_with_cost(
         result = {
             "success": True,
             "count": len(available_companies),
-            "total_companies": len(companies),
+            "total_companies": total_companies,
             "filtered_out": len(companies) - len(available_companies),
+            "pagination": pagination,
             "filtered_companies_debug": filtered_reasons if filtered_reasons else [],
             "data": available_companies,
             # ========== COMMENTED OUT: Subscription warning ==========
@@ -2772,31 +2858,48 @@ def get_items_by_category(category=None):
 
 
 @frappe.whitelist(allow_guest=True)
-def search_companies_with_ratings(pincode=None):
+def search_companies_with_ratings(pincode=None, cursor=None, page_size=None):
     """
     Enhanced company search that includes rating information
     
     Request Body:
     {
-        "pincode": "SW1A 1AA"
+        "pincode": "SW1A 1AA",
+        "page_size": 20,
+        "cursor": "<next_cursor from the previous page>"
     }
     
+    Results are ordered by average rating (highest first) then company name
+    and returned one keyset page at a time.
+    
     Response includes:
     - Basic company info
     - Average rating and total ratings
     - Recent reviews preview
     - Rating distribution
+    - Pagination (next_cursor, has_more)
     """
     try:
-        data = frappe.request.get_json() or {}
-        pincode = pincode or safe_get_dict_value(data, 'pincode')
+        data = frappe.request.get_json(silent=True) or {}
+        pincode = pincode or data.get('pincode')
+        page_size = get_page_size(page_size or data.get('page_size'))
+        after = decode_cursor(cursor or data.get('cursor'), 2)
         
         if not pincode:
             return {"success": False, "message": "Pincode is required"}
         
+        keyset_condition = ""
+        if after:
+            keyset_condition = """
+            AND (
+                IFNULL(average_rating, 0) < %(after_rating)s
+                OR (IFNULL(average_rating, 0) = %(after_rating)s AND name > %(after_name)s)
+            )"""
+        
         # Search companies
         companies = frappe.db.sql("""
             SELECT 
+                name,
                 company_name,
                 manager_email,
                 phone,
@@ -2806,7 +2909,7 @@ def search_companies_with_ratings(pincode=None):
                 description,
                 subscription_plan,
                 is_active,
-                average_rating,
+                IFNULL(average_rating, 0) as average_rating,
                 total_ratings,
                 created_at
             FROM `tabLogistics Company`
@@ -2814,49 +2917,34 @@ def search_companies_with_ratings(pincode=None):
             AND (
                 pincode = %(pincode)s 
                 OR areas_covered LIKE %(pincode_pattern)s
-            )
-            ORDER BY average_rating DESC, total_ratings DESC, created_at DESC
-        """, {
+            ){keyset_condition}
+            ORDER BY IFNULL(average_rating, 0) DESC, name ASC
+            LIMIT %(limit)s
+        """.format(keyset_condition=keyset_condition), {
             "pincode": pincode,
-            "pincode_pattern": f'%{pincode}%'
+            "pincode_pattern": f'%{pincode}%',
+            "after_rating": after[0] if after else None,
+            "after_name": after[1] if after else None,
+            "limit": page_size + 1
         }, as_dict=True)
         
+        companies, pagination = build_page(companies, page_size, ["average_rating", "name"])
+        
+        # Distribution and 3 latest reviews for every match in two queries
+        from localmoves.api.rating_review import get_batched_review_aggregates
+        review_aggregates = get_batched_review_aggregates(
+            [c['company_name'] for c in companies],
+            preview_limit=3,
+            comments_only=True
+        )
+        
         enriched_companies = []
         
         for company in companies:
-            # Get rating distribution
-            rating_dist = frappe.db.sql("""
-                SELECT 
-                    rating,
-                    COUNT(*) as count
-                FROM `tabLogistics Request`
-                WHERE company_name = %(company_name)s
-                AND rating IS NOT NULL
-                AND rating > 0
-                GROUP BY rating
-                ORDER BY rating DESC
-            """, {"company_name": company['company_name']}, as_dict=True)
-            
-            company['rating_distribution'] = {
-                str(r['rating']): r['count'] for r in rating_dist
-            }
+            aggregate = review_aggregates.get(company['company_name'], {})
+            company['rating_distribution'] = aggregate.get('rating_distribution', {})
             
-            # Get 3 most recent reviews preview
-            recent_reviews = frappe.db.sql("""
-                SELECT 
-                    rating,
-                    review_comment,
-                    rated_at,
-                    full_name as user_name
-                FROM `tabLogistics Request`
-                WHERE company_name = %(company_name)s
-                AND rating IS NOT NULL
-                AND rating > 0
-                AND review_comment IS NOT NULL
-                AND review_comment != ''
-                ORDER BY rated_at DESC
-                LIMIT 3
-            """, {"company_name": company['company_name']}, as_dict=True)
+            recent_reviews = aggregate.get('recent_reviews', [])
             
             # Format recent reviews
             for review in recent_reviews:
@@ -2894,6 +2982,7 @@ def search_companies_with_ratings(pincode=None):
             "success": True,
             "count": len(enriched_companies),
             "data": enriched_companies,
+            "pagination": pagination,
             "search_criteria": {
                 "pincode": pincode
             }
@@ -2907,49 +2996,64 @@ def search_companies_with_ratings(pincode=None):
 # ==================== GET TOP RATED COMPANIES ====================
 
 @frappe.whitelist(allow_guest=True)
-def get_top_rated_companies(limit=10):
+def get_top_rated_companies(limit=10, region=None, outward_code=None):
     """
-    Get top rated companies across the platform
+    Get top rated companies across the platform, a region or an outward code
+    
+    Companies are ranked on the precomputed Bayesian score, so a single 5-star
+    review does not outrank hundreds of 4.8 reviews. The score is kept up to
+    date by the rating endpoints and read through the leaderboard indexes.
     
     Query Parameters:
     - limit: Number of companies to return (default: 10)
+    - region: Postcode area, e.g. "SW" (optional)
+    - outward_code: Outward code, e.g. "SW1A" (optional)
     """
     try:
-        data = frappe.request.get_json() or {}
-        limit = limit or safe_get_dict_value(data, 'limit', 10)
+        data = frappe.request.get_json(silent=True) or {}
+        limit = int(limit or data.get('limit') or 10)
+        region = (region or data.get('region') or '').strip().upper()
+        outward_code = (outward_code or data.get('outward_code') or '').strip().upper()
+        
+        conditions = ["is_active = 1", "total_ratings > 0"]
+        if outward_code:
+            conditions.append("outward_code = %(outward_code)s")
+        elif region:
+            conditions.append("postcode_area = %(region)s")
         
-        # Get top rated companies (must have at least 5 ratings)
         top_companies = frappe.db.sql("""
             SELECT 
                 company_name,
                 location,
                 pincode,
+                outward_code,
+                postcode_area,
                 average_rating,
                 total_ratings,
+                bayesian_score,
                 description
             FROM `tabLogistics Company`
-            WHERE is_active = 1
-            AND total_ratings >= 5
-            ORDER BY average_rating DESC, total_ratings DESC
+            WHERE {conditions}
+            ORDER BY bayesian_score DESC
             LIMIT %(limit)s
-        """, {"limit": limit}, as_dict=True)
+        """.format(conditions=" AND ".join(conditions)), {
+            "limit": limit,
+            "region": region,
+            "outward_code": outward_code
+        }, as_dict=True)
+        
+        # Two featured 4+ star reviews per company in one query
+        from localmoves.api.rating_review import get_batched_review_aggregates
+        review_aggregates = get_batched_review_aggregates(
+            [c['company_name'] for c in top_companies],
+            preview_limit=2,
+            comments_only=True,
+            include_distribution=False,
+            min_rating=4
+        )
         
-        # Get sample reviews for each
         for company in top_companies:
-            reviews = frappe.db.sql("""
-                SELECT 
-                    rating,
-                    review_comment,
-                    full_name as user_name,
-                    rated_at
-                FROM `tabLogistics Request`
-                WHERE company_name = %(company_name)s
-                AND rating >= 4
-                AND review_comment IS NOT NULL
-                AND review_comment != ''
-                ORDER BY rated_at DESC
-                LIMIT 2
-            """, {"company_name": company['company_name']}, as_dict=True)
+            reviews = review_aggregates.get(company['company_name'], {}).get('recent_reviews', [])
             
             for review in reviews:
                 review['rated_at'] = str(review['rated_at'])
@@ -2958,11 +3062,14 @@ def get_top_rated_companies(limit=10):
             
             company['featured_reviews'] = reviews
         
+        scope = outward_code or region or "platform"
+        
         return {
             "success": True,
             "count": len(top_companies),
             "data": top_companies,
-            "message": f"Top {len(top_companies)} rated companies (minimum 5 ratings)"
+            "scope": scope,
+            "message": f"Top {len(top_companies)} rated companies ({scope})"
         }
         
     except Exception as e:
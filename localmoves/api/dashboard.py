@@ -5,6 +5,12 @@ import frappe
 from frappe import _
 from localmoves.utils.jwt_handler import get_current_user
 from localmoves.utils.config_manager import get_config, update_config
+from localmoves.utils.daily_metrics import get_metric_series, get_timeseries, parse_range, METRIC_SOURCES
+from localmoves.utils.dashboard_cache import get_dashboard_snapshot
+from localmoves.utils.pagination import get_list_page
+from localmoves.utils.read_replica import read_from_replica
+from localmoves.utils.admin_search import search
+from localmoves.utils.request_archive import count_requests_by_status
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import json
@@ -17,6 +23,10 @@ DEFAULT_SYSTEM_CONFIG = {
     "refund_policy_days": 7
 }
 
+# Admin list endpoints: sort keys every list accepts (always set, so keyset-safe)
+LIST_SORT_FIELDS = ['creation', 'modified']
+PAYMENT_LIST_FILTERS = ['company_name', 'payment_status', 'subscription_plan', 'payment_type', 'payment_method']
+
 def ignore_csrf(fn):
     """Decorator to bypass CSRF check for API endpoints"""
     @wraps(fn)
@@ -506,11 +516,16 @@ def delete_request():
 def get_all_payments():
     """Get all payments"""
     try:
-        payments = frappe.get_all('Payment',
-            fields=['*'],
-            order_by='created_at desc'
+        data = get_request_data()
+
+        payments, pagination = get_list_page('Payment', ['*'], data,
+            filter_fields=PAYMENT_LIST_FILTERS,
+            range_fields=['created_at'],
+            sort_fields=LIST_SORT_FIELDS + ['amount']
         )
-        return {'success': True, 'data': payments, 'count': len(payments)}
+        return {'success': True, 'data': payments, 'count': len(payments), 'pagination': pagination}
+    except frappe.ValidationError as e:
+        return {'success': False, 'error': str(e)}
     except Exception as e:
         frappe.log_error(f"Get Payments Error: {str(e)}")
         return {'success': False, 'error': str(e)}
@@ -1064,23 +1079,23 @@ def get_all_users():
                 'message': 'Access Denied: You do not have permission to view users'
             }
         
-        # Get filter parameters
+        # Filters, sort, cursor and page_size come from the request
         data = get_request_data()
-        filters = {}
-        
-        if data.get('role'):
-            filters['role'] = data.get('role')
-        
-        if data.get('is_active') is not None:
-            filters['is_active'] = int(data.get('is_active'))
-        
-        users = frappe.get_all('LocalMoves User',
-            fields=['name', 'full_name', 'email', 'phone', 'role', 'is_active', 'city', 'state', 'creation', 'last_login'],
-            filters=filters,
-            order_by='creation desc'
+        if data.get('is_active') not in (None, ''):
+            data['is_active'] = int(data.get('is_active'))
+        
+        users, pagination = get_list_page('LocalMoves User',
+            ['name', 'full_name', 'email', 'phone', 'role', 'is_active', 'city', 'state', 'creation', 'modified',
+             'last_login'],
+            data,
+            filter_fields=['role', 'is_active', 'city', 'state'],
+            range_fields=['creation'],
+            sort_fields=LIST_SORT_FIELDS + ['full_name', 'email']
         )
         
-        return {'success': True, 'data': users, 'count': len(users)}
+        return {'success': True, 'data': users, 'count': len(users), 'pagination': pagination}
+    except frappe.ValidationError as e:
+        return {'success': False, 'message': str(e)}
     except Exception as e:
         frappe.log_error(f"Get Users Error: {str(e)}")
         return {'success': False, 'message': str(e)}
@@ -1117,38 +1132,110 @@ def get_user():
         frappe.log_error(f"Get User Error: {str(e)}")
         return {'success': False, 'message': str(e)}
 
+# ===== ADMIN SEARCH =====
+
+@frappe.whitelist()
+@read_from_replica
+def admin_search(query=None, entities=None, limit=None):
+    """
+    Search users, companies, requests and payments at once - Admin only
+    
+    query: email, phone, name, postcode or an ID (REQ-..., PAY-...)
+    entities: optional subset of user, company, request, payment (list or comma-separated)
+    """
+    try:
+        user_info = get_user_from_token()
+        
+        if user_info["role"] != "Admin":
+            return {
+                'success': False, 
+                'message': 'Access Denied: Admin permission required'
+            }
+        
+        data = get_request_data()
+        query = query or data.get('query') or data.get('q')
+        entities = entities or data.get('entities')
+        limit = limit or data.get('limit')
+        
+        if not query or not str(query).strip():
+            return {'success': False, 'message': 'query is required'}
+        
+        if isinstance(entities, str):
+            entities = [e.strip() for e in entities.split(',') if e.strip()]
+        
+        results = search(str(query), entities=entities, limit=limit)
+        
+        return {'success': True, 'data': results, 'count': len(results)}
+    except frappe.AuthenticationError as e:
+        return {'success': False, 'message': str(e)}
+    except Exception as e:
+        frappe.log_error(f"Admin Search Error: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
 # ===== CHART DATA FUNCTIONS =====
 
 @frappe.whitelist()
-def get_user_growth_chart():
-    """Get user growth data for charts (7 days, 1 month, 1 year)"""
+@read_from_replica
+def get_metric_timeseries(metric=None, time_range=None, granularity=None, from_date=None, to_date=None,
+                          company=None, plan=None, status=None, payment_method=None, split_by=None):
+    """
+    Generic chart data from the Daily Metrics rollup, gap-filled on the server
+    
+    Parameters:
+    - metric: user_signups, subscription_payments, deposit_payments, request_payments, requests_created
+    - time_range: e.g. 7d, 30d, 12w, 12m, 1y (default 30d), or from_date / to_date
+    - granularity: day, week or month (default day)
+    - company / plan / status / payment_method: optional filters
+    - split_by: optional dimension to return one series per value
+    
+    Returns column arrays: buckets[i] pairs with series[n].count[i] / value[i]
+    """
     try:
-        # Last 7 days
-        seven_days_data = frappe.db.sql("""
-            SELECT DATE(creation) as date, COUNT(*) as count
-            FROM `tabLocalMoves User`
-            WHERE creation >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
-            GROUP BY DATE(creation)
-            ORDER BY date ASC
-        """, as_dict=True)
+        data = get_request_data()
         
-        # Last 30 days
-        month_data = frappe.db.sql("""
-            SELECT DATE(creation) as date, COUNT(*) as count
-            FROM `tabLocalMoves User`
-            WHERE creation >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-            GROUP BY DATE(creation)
-            ORDER BY date ASC
-        """, as_dict=True)
+        metric = metric or data.get('metric')
+        if not metric:
+            return {'success': False, 'message': 'metric is required', 'metrics': list(METRIC_SOURCES)}
         
-        # Last 12 months
-        year_data = frappe.db.sql("""
-            SELECT DATE_FORMAT(creation, '%Y-%m') as month, COUNT(*) as count
-            FROM `tabLocalMoves User`
-            WHERE creation >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-            GROUP BY DATE_FORMAT(creation, '%Y-%m')
-            ORDER BY month ASC
-        """, as_dict=True)
+        start, end = parse_range(
+            time_range or data.get('time_range'),
+            from_date or data.get('from_date'),
+            to_date or data.get('to_date')
+        )
+        
+        filters = {
+            'company': company or data.get('company'),
+            'plan': plan or data.get('plan'),
+            'status': status or data.get('status'),
+            'payment_method': payment_method or data.get('payment_method')
+        }
+        
+        return {
+            'success': True,
+            'data': get_timeseries(
+                metric, start, end,
+                granularity=granularity or data.get('granularity') or 'day',
+                filters=filters,
+                split_by=split_by or data.get('split_by')
+            )
+        }
+    except frappe.ValidationError as e:
+        return {'success': False, 'message': str(e)}
+    except Exception as e:
+        frappe.log_error(f"Metric Timeseries Error: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+
+@frappe.whitelist()
+@read_from_replica
+def get_user_growth_chart():
+    """Get user growth data for charts (7 days, 1 month, 1 year) from the Daily Metrics rollup"""
+    try:
+        signups = {"count": "SUM(count)"}
+        
+        seven_days_data = get_metric_series("user_signups", "7 DAY", aggregates=signups)
+        month_data = get_metric_series("user_signups", "30 DAY", aggregates=signups)
+        year_data = get_metric_series("user_signups", "12 MONTH", period="month", aggregates=signups)
         
         return {
             'success': True,
@@ -1163,38 +1250,15 @@ def get_user_growth_chart():
         return {'success': False, 'error': str(e)}
 
 @frappe.whitelist()
+@read_from_replica
 def get_revenue_chart():
     """Get revenue data for charts"""
     try:
-        # Last 7 days
-        seven_days = frappe.db.sql("""
-            SELECT DATE(paid_date) as date, SUM(amount) as revenue
-            FROM `tabPayment`
-            WHERE payment_status = 'Paid' 
-            AND paid_date >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
-            GROUP BY DATE(paid_date)
-            ORDER BY date ASC
-        """, as_dict=True)
+        revenue = {"revenue": "SUM(value)"}
         
-        # Last 30 days
-        month_data = frappe.db.sql("""
-            SELECT DATE(paid_date) as date, SUM(amount) as revenue
-            FROM `tabPayment`
-            WHERE payment_status = 'Paid'
-            AND paid_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-            GROUP BY DATE(paid_date)
-            ORDER BY date ASC
-        """, as_dict=True)
-        
-        # Last 12 months
-        year_data = frappe.db.sql("""
-            SELECT DATE_FORMAT(paid_date, '%Y-%m') as month, SUM(amount) as revenue
-            FROM `tabPayment`
-            WHERE payment_status = 'Paid'
-            AND paid_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-            GROUP BY DATE_FORMAT(paid_date, '%Y-%m')
-            ORDER BY month ASC
-        """, as_dict=True)
+        seven_days = get_metric_series("subscription_payments", "7 DAY", aggregates=revenue)
+        month_data = get_metric_series("subscription_payments", "30 DAY", aggregates=revenue)
+        year_data = get_metric_series("subscription_payments", "12 MONTH", period="month", aggregates=revenue)
         
         return {
             'success': True,
@@ -1210,44 +1274,15 @@ def get_revenue_chart():
 
 
 @frappe.whitelist()
+@read_from_replica
 def get_deposit_payment_chart():
     """Get 10% deposit payment data for charts"""
     try:
-        # Last 7 days
-        seven_days = frappe.db.sql("""
-            SELECT DATE(deposit_paid_at) as date, 
-                   SUM(deposit_amount) as revenue,
-                   COUNT(*) as transaction_count
-            FROM `tabPayment Transaction`
-            WHERE deposit_status = 'Paid' 
-            AND deposit_paid_at >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
-            GROUP BY DATE(deposit_paid_at)
-            ORDER BY date ASC
-        """, as_dict=True)
+        deposits = {"revenue": "SUM(value)", "transaction_count": "SUM(count)"}
         
-        # Last 30 days
-        month_data = frappe.db.sql("""
-            SELECT DATE(deposit_paid_at) as date, 
-                   SUM(deposit_amount) as revenue,
-                   COUNT(*) as transaction_count
-            FROM `tabPayment Transaction`
-            WHERE deposit_status = 'Paid'
-            AND deposit_paid_at >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-            GROUP BY DATE(deposit_paid_at)
-            ORDER BY date ASC
-        """, as_dict=True)
-        
-        # Last 12 months
-        year_data = frappe.db.sql("""
-            SELECT DATE_FORMAT(deposit_paid_at, '%Y-%m') as month, 
-                   SUM(deposit_amount) as revenue,
-                   COUNT(*) as transaction_count
-            FROM `tabPayment Transaction`
-            WHERE deposit_status = 'Paid'
-            AND deposit_paid_at >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-            GROUP BY DATE_FORMAT(deposit_paid_at, '%Y-%m')
-            ORDER BY month ASC
-        """, as_dict=True)
+        seven_days = get_metric_series("deposit_payments", "7 DAY", aggregates=deposits)
+        month_data = get_metric_series("deposit_payments", "30 DAY", aggregates=deposits)
+        year_data = get_metric_series("deposit_payments", "12 MONTH", period="month", aggregates=deposits)
         
         return {
             'success': True,
@@ -1262,115 +1297,174 @@ def get_deposit_payment_chart():
         return {'success': False, 'error': str(e)}
 
 
+# ===== DASHBOARD STATS AGGREGATES =====
+# One conditional-aggregation pass per table; get_dashboard_stats assembles
+# its counters from these rows instead of a COUNT/SUM query per widget.
+
+PAID_SUBSCRIPTION_PLANS = ('Basic', 'Standard', 'Premium')
+
+
+def get_company_plan_totals():
+    """Company counts per subscription plan: [{subscription_plan, company_count, active_count}]"""
+    return frappe.db.sql("""
+        SELECT
+            subscription_plan,
+            COUNT(*) as company_count,
+            SUM(CASE WHEN is_active = 1 THEN 1 ELSE 0 END) as active_count
+        FROM `tabLogistics Company`
+        GROUP BY subscription_plan
+    """, as_dict=True)
+
+
+def get_payment_status_plan_totals():
+    """Subscription payments per (status, plan): [{payment_status, subscription_plan, count, amount}]"""
+    return frappe.db.sql("""
+        SELECT
+            payment_status,
+            subscription_plan,
+            COUNT(*) as count,
+            COALESCE(SUM(amount), 0) as amount
+        FROM `tabPayment`
+        GROUP BY payment_status, subscription_plan
+    """, as_dict=True)
+
+
+def get_payment_transaction_totals():
+    """Every request-payment counter in one row"""
+    return frappe.db.sql("""
+        SELECT
+            COUNT(*) as total_count,
+            SUM(CASE WHEN deposit_status = 'Paid' THEN 1 ELSE 0 END) as deposit_paid_count,
+            COALESCE(SUM(CASE WHEN deposit_status = 'Paid' THEN deposit_amount END), 0) as deposit_paid_revenue,
+            SUM(CASE WHEN deposit_status = 'Unpaid' THEN 1 ELSE 0 END) as deposit_unpaid_count,
+            COALESCE(SUM(CASE WHEN deposit_status = 'Unpaid' THEN deposit_amount END), 0) as deposit_unpaid_amount,
+            SUM(CASE WHEN balance_status = 'Paid' THEN 1 ELSE 0 END) as balance_paid_count,
+            COALESCE(SUM(CASE WHEN balance_status = 'Paid' THEN remaining_amount END), 0) as balance_paid_revenue,
+            SUM(CASE WHEN balance_status = 'Unpaid' THEN 1 ELSE 0 END) as balance_unpaid_count,
+            COALESCE(SUM(CASE WHEN balance_status = 'Unpaid' THEN remaining_amount END), 0) as balance_unpaid_amount,
+            SUM(CASE WHEN payment_status = 'Fully Paid' THEN 1 ELSE 0 END) as fully_paid_count,
+            COALESCE(SUM(CASE WHEN payment_status = 'Fully Paid' THEN total_amount END), 0) as fully_paid_revenue
+        FROM `tabPayment Transaction`
+    """, as_dict=True)[0]
+
+
+def get_daily_deposit_totals(months=6):
+    """Paid deposits per day over the last `months` months, from the Daily Metrics rollup"""
+    rows = get_metric_series(
+        "deposit_payments", f"{int(months)} MONTH",
+        aggregates={"transaction_count": "SUM(count)", "daily_revenue": "SUM(value)"}
+    )
+    for row in rows:
+        row['payment_date'] = row.pop('date')
+    return rows
+
+
 @frappe.whitelist()
+@read_from_replica
 def get_dashboard_stats():
     """Get comprehensive dashboard statistics for admin INCLUDING PAYMENTS AND DEPOSIT ANALYTICS"""
+    return get_dashboard_snapshot("dashboard_stats", "all", "localmoves.api.dashboard.build_dashboard_stats")
+
+
+def build_dashboard_stats():
+    """Compute the get_dashboard_stats response (served through the dashboard snapshot cache)"""
     try:
         # Total counts
         total_users = frappe.db.count('LocalMoves User', {'is_active': 1})
-        total_companies = frappe.db.count('Logistics Company')
+        # Archived requests still count
+        total_requests, _by_status = count_requests_by_status()
+        
+        # Companies: totals, paid subscribers and active subscriptions by plan in one pass
+        company_rows = get_company_plan_totals()
+        total_companies = sum(int(row.company_count or 0) for row in company_rows)
         
         # PAID SUBSCRIBERS ONLY (companies with paid plans)
-        paid_subscribers = frappe.db.count('Logistics Company', {
-            'subscription_plan': ['in', ['Basic', 'Standard', 'Premium']]
-        })
+        paid_subscribers = sum(
+            int(row.company_count or 0) for row in company_rows
+            if row.subscription_plan in PAID_SUBSCRIPTION_PLANS
+        )
         
-        total_requests = frappe.db.count('Logistics Request')
+        # Active subscriptions by plan (PAID ONLY)
+        subscription_breakdown = [
+            {'subscription_plan': row.subscription_plan, 'count': int(row.active_count or 0)}
+            for row in company_rows
+            if row.subscription_plan in PAID_SUBSCRIPTION_PLANS and row.active_count
+        ]
         
         # ===== PAYMENT STATISTICS =====
-        
-        # Total payments and revenue
-        total_payments_count = frappe.db.count('Payment')
+        # One pass over tabPayment grouped by (status, plan)
+        payment_rows = get_payment_status_plan_totals()
+        
+        total_payments_count = 0
+        status_counts = {}
+        status_amounts = {}
+        plan_revenue = {}
+        for row in payment_rows:
+            count = int(row['count'] or 0)
+            total_payments_count += count
+            status_counts[row.payment_status] = status_counts.get(row.payment_status, 0) + count
+            status_amounts[row.payment_status] = status_amounts.get(row.payment_status, 0) + float(row.amount or 0)
+            
+            if row.payment_status == 'Paid' and row.subscription_plan in PAID_SUBSCRIPTION_PLANS:
+                plan_revenue[row.subscription_plan] = {
+                    'subscription_plan': row.subscription_plan,
+                    'revenue': float(row.amount or 0),
+                    'count': count
+                }
         
         # Revenue from PAID payments only
-        paid_revenue = frappe.db.sql("""
-            SELECT COALESCE(SUM(amount), 0) as total
-            FROM `tabPayment`
-            WHERE payment_status = 'Paid'
-        """, as_dict=True)[0].total or 0
+        paid_revenue = status_amounts.get('Paid', 0)
         
         # Pending revenue
-        pending_revenue = frappe.db.sql("""
-            SELECT COALESCE(SUM(amount), 0) as total
-            FROM `tabPayment`
-            WHERE payment_status = 'Pending'
-        """, as_dict=True)[0].total or 0
+        pending_revenue = status_amounts.get('Pending', 0)
         
-        # ===== REQUEST PAYMENT TRANSACTION STATISTICS (10% DEPOSITS) =====
-        
-        # Total Payment Transactions count
-        total_payment_transactions = frappe.db.count('Payment Transaction')
-        
-        # Deposit payments (10% deposits) - PAID ONLY
-        deposit_paid_count = frappe.db.count('Payment Transaction', {
-            'deposit_status': 'Paid'
-        })
-        
-        deposit_paid_revenue = frappe.db.sql("""
-            SELECT COALESCE(SUM(deposit_amount), 0) as total
-            FROM `tabPayment Transaction`
-            WHERE deposit_status = 'Paid'
-        """, as_dict=True)[0].total or 0
-        
-        # Deposit payments - UNPAID
-        deposit_unpaid_count = frappe.db.count('Payment Transaction', {
-            'deposit_status': 'Unpaid'
-        })
+        # Payment status breakdown
+        payment_status_breakdown = [
+            {'payment_status': status, 'count': count} for status, count in status_counts.items()
+        ]
         
-        deposit_unpaid_amount = frappe.db.sql("""
-            SELECT COALESCE(SUM(deposit_amount), 0) as total
-            FROM `tabPayment Transaction`
-            WHERE deposit_status = 'Unpaid'
-        """, as_dict=True)[0].total or 0
+        # Subscription plan revenue breakdown (PAID ONLY)
+        subscription_revenue_breakdown = list(plan_revenue.values())
         
-        # Balance payments (remaining 90%) - PAID
-        balance_paid_count = frappe.db.count('Payment Transaction', {
-            'balance_status': 'Paid'
-        })
+        # ===== REQUEST PAYMENT TRANSACTION STATISTICS (10% DEPOSITS) =====
+        transaction_totals = get_payment_transaction_totals()
         
-        balance_paid_revenue = frappe.db.sql("""
-            SELECT COALESCE(SUM(remaining_amount), 0) as total
-            FROM `tabPayment Transaction`
-            WHERE balance_status = 'Paid'
-        """, as_dict=True)[0].total or 0
+        total_payment_transactions = int(transaction_totals.total_count or 0)
         
-        # Balance payments - UNPAID
-        balance_unpaid_count = frappe.db.count('Payment Transaction', {
-            'balance_status': 'Unpaid'
-        })
+        # Deposit payments (10% deposits)
+        deposit_paid_count = int(transaction_totals.deposit_paid_count or 0)
+        deposit_paid_revenue = float(transaction_totals.deposit_paid_revenue or 0)
+        deposit_unpaid_count = int(transaction_totals.deposit_unpaid_count or 0)
+        deposit_unpaid_amount = float(transaction_totals.deposit_unpaid_amount or 0)
         
-        balance_unpaid_amount = frappe.db.sql("""
-            SELECT COALESCE(SUM(remaining_amount), 0) as total
-            FROM `tabPayment Transaction`
-            WHERE balance_status = 'Unpaid'
-        """, as_dict=True)[0].total or 0
+        # Balance payments (remaining 90%)
+        balance_paid_count = int(transaction_totals.balance_paid_count or 0)
+        balance_paid_revenue = float(transaction_totals.balance_paid_revenue or 0)
+        balance_unpaid_count = int(transaction_totals.balance_unpaid_count or 0)
+        balance_unpaid_amount = float(transaction_totals.balance_unpaid_amount or 0)
         
         # Fully paid transactions
-        fully_paid_count = frappe.db.count('Payment Transaction', {
-            'payment_status': 'Fully Paid'
-        })
-        
-        fully_paid_revenue = frappe.db.sql("""
-            SELECT COALESCE(SUM(total_amount), 0) as total
-            FROM `tabPayment Transaction`
-            WHERE payment_status = 'Fully Paid'
-        """, as_dict=True)[0].total or 0
+        fully_paid_count = int(transaction_totals.fully_paid_count or 0)
+        fully_paid_revenue = float(transaction_totals.fully_paid_revenue or 0)
         
         # Total request payments revenue (deposits + balance)
         total_request_payments_revenue = deposit_paid_revenue + balance_paid_revenue
         
-        # ===== BAR GRAPH DATA FOR DEPOSITS BY DATE (Last 30 Days) =====
-        deposit_trend = frappe.db.sql("""
-            SELECT 
-                DATE(deposit_paid_at) as payment_date,
-                COUNT(*) as transaction_count,
-                SUM(deposit_amount) as daily_revenue
-            FROM `tabPayment Transaction`
-            WHERE deposit_status = 'Paid'
-            AND deposit_paid_at >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-            GROUP BY DATE(deposit_paid_at)
-            ORDER BY payment_date ASC
-        """, as_dict=True)
+        # ===== BAR GRAPH DATA FOR DEPOSITS BY DATE =====
+        # One daily pass over 6 months; the 30-day and monthly series come from it
+        daily_deposits = get_daily_deposit_totals(months=6)
+        
+        thirty_days_ago = datetime.now().date() - timedelta(days=30)
+        deposit_trend = [row for row in daily_deposits if row.payment_date >= thirty_days_ago]
+        
+        # ===== MONTHLY DEPOSIT TRENDS (Last 6 Months) =====
+        monthly_totals = {}
+        for row in daily_deposits:
+            month = row.payment_date.strftime('%Y-%m')
+            totals = monthly_totals.setdefault(month, {'month': month, 'transaction_count': 0, 'monthly_revenue': 0})
+            totals['transaction_count'] += int(row.transaction_count or 0)
+            totals['monthly_revenue'] += float(row.daily_revenue or 0)
+        monthly_deposit_trend = list(monthly_totals.values())
         
         # ===== BAR GRAPH DATA FOR DEPOSITS BY COMPANY =====
         deposit_by_company = frappe.db.sql("""
@@ -1396,19 +1490,6 @@ def get_dashboard_stats():
             GROUP BY payment_status
         """, as_dict=True)
         
-        # ===== MONTHLY DEPOSIT TRENDS (Last 6 Months) =====
-        monthly_deposit_trend = frappe.db.sql("""
-            SELECT 
-                DATE_FORMAT(deposit_paid_at, '%Y-%m') as month,
-                COUNT(*) as transaction_count,
-                SUM(deposit_amount) as monthly_revenue
-            FROM `tabPayment Transaction`
-            WHERE deposit_status = 'Paid'
-            AND deposit_paid_at >= DATE_SUB(CURDATE(), INTERVAL 6 MONTH)
-            GROUP BY DATE_FORMAT(deposit_paid_at, '%Y-%m')
-            ORDER BY month ASC
-        """, as_dict=True)
-        
         # ===== DEPOSIT VS BALANCE PAYMENT COMPARISON =====
         payment_type_comparison = [
             {
@@ -1430,33 +1511,6 @@ def get_dashboard_stats():
         # Combined total revenue
         total_revenue = paid_revenue + total_request_payments_revenue
         
-        # Payment status breakdown
-        payment_status_breakdown = frappe.db.sql("""
-            SELECT payment_status, COUNT(*) as count
-            FROM `tabPayment`
-            GROUP BY payment_status
-        """, as_dict=True)
-        
-        # Subscription plan revenue breakdown (PAID ONLY)
-        subscription_revenue_breakdown = frappe.db.sql("""
-            SELECT subscription_plan, 
-                   SUM(amount) as revenue,
-                   COUNT(*) as count
-            FROM `tabPayment`
-            WHERE payment_status = 'Paid'
-            AND subscription_plan IN ('Basic', 'Standard', 'Premium')
-            GROUP BY subscription_plan
-        """, as_dict=True)
-        
-        # Active subscriptions by plan (PAID ONLY)
-        subscription_breakdown = frappe.db.sql("""
-            SELECT subscription_plan, COUNT(*) as count
-            FROM `tabLogistics Company`
-            WHERE is_active = 1
-            AND subscription_plan IN ('Basic', 'Standard', 'Premium')
-            GROUP BY subscription_plan
-        """, as_dict=True)
-        
         # Recent activity
         recent_users = frappe.get_all('LocalMoves User',
             fields=['name', 'full_name', 'email', 'role', 'creation'],
@@ -1730,44 +1784,15 @@ def get_dashboard_stats():
 # ===== PAYMENT CHARTS =====
 
 @frappe.whitelist()
+@read_from_replica
 def get_payment_revenue_chart():
     """Get payment revenue data for charts (7 days, 1 month, 1 year)"""
     try:
-        # Last 7 days
-        seven_days = frappe.db.sql("""
-            SELECT DATE(paid_date) as date, 
-                   SUM(amount) as revenue,
-                   COUNT(*) as count
-            FROM `tabPayment`
-            WHERE payment_status = 'Paid' 
-            AND paid_date >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
-            GROUP BY DATE(paid_date)
-            ORDER BY date ASC
-        """, as_dict=True)
+        revenue = {"revenue": "SUM(value)", "count": "SUM(count)"}
         
-        # Last 30 days
-        month_data = frappe.db.sql("""
-            SELECT DATE(paid_date) as date, 
-                   SUM(amount) as revenue,
-                   COUNT(*) as count
-            FROM `tabPayment`
-            WHERE payment_status = 'Paid'
-            AND paid_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-            GROUP BY DATE(paid_date)
-            ORDER BY date ASC
-        """, as_dict=True)
-        
-        # Last 12 months
-        year_data = frappe.db.sql("""
-            SELECT DATE_FORMAT(paid_date, '%Y-%m') as month, 
-                   SUM(amount) as revenue,
-                   COUNT(*) as count
-            FROM `tabPayment`
-            WHERE payment_status = 'Paid'
-            AND paid_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-            GROUP BY DATE_FORMAT(paid_date, '%Y-%m')
-            ORDER BY month ASC
-        """, as_dict=True)
+        seven_days = get_metric_series("subscription_payments", "7 DAY", aggregates=revenue)
+        month_data = get_metric_series("subscription_payments", "30 DAY", aggregates=revenue)
+        year_data = get_metric_series("subscription_payments", "12 MONTH", period="month", aggregates=revenue)
         
         return {
             'success': True,
@@ -1783,37 +1808,28 @@ def get_payment_revenue_chart():
 
 
 @frappe.whitelist()
+@read_from_replica
 def get_subscription_revenue_chart():
     """Get revenue breakdown by subscription plan over time"""
     try:
+        revenue = {"revenue": "SUM(value)", "count": "SUM(count)"}
+        by_plan = {"subscription_plan": "plan"}
+        paid_plans = "plan IN ('Basic', 'Standard', 'Premium')"
+        
         # Last 12 months by plan
-        monthly_plan_revenue = frappe.db.sql("""
-            SELECT 
-                DATE_FORMAT(paid_date, '%Y-%m') as month,
-                subscription_plan,
-                SUM(amount) as revenue,
-                COUNT(*) as count
-            FROM `tabPayment`
-            WHERE payment_status = 'Paid'
-            AND paid_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-            AND subscription_plan IN ('Basic', 'Standard', 'Premium')
-            GROUP BY DATE_FORMAT(paid_date, '%Y-%m'), subscription_plan
-            ORDER BY month ASC, subscription_plan
-        """, as_dict=True)
+        monthly_plan_revenue = get_metric_series(
+            "subscription_payments", "12 MONTH", period="month",
+            aggregates=revenue, group_by=by_plan, condition=paid_plans
+        )
         
         # Current month breakdown
-        current_month_breakdown = frappe.db.sql("""
-            SELECT 
-                subscription_plan,
-                SUM(amount) as revenue,
-                COUNT(*) as count
-            FROM `tabPayment`
-            WHERE payment_status = 'Paid'
-            AND MONTH(paid_date) = MONTH(CURDATE())
-            AND YEAR(paid_date) = YEAR(CURDATE())
-            AND subscription_plan IN ('Basic', 'Standard', 'Premium')
-            GROUP BY subscription_plan
-        """, as_dict=True)
+        current_month_breakdown = get_metric_series(
+            "subscription_payments", "1 MONTH", period="month",
+            aggregates=revenue, group_by=by_plan,
+            condition=f"{paid_plans} AND metric_date >= DATE_FORMAT(CURDATE(), '%%Y-%%m-01')"
+        )
+        for row in current_month_breakdown:
+            row.pop('month', None)
         
         return {
             'success': True,
@@ -1828,6 +1844,7 @@ def get_subscription_revenue_chart():
 
 
 @frappe.whitelist()
+@read_from_replica
 def get_payment_status_chart():
     """Get payment status distribution over time"""
     try:
@@ -1866,6 +1883,7 @@ def get_payment_status_chart():
         return {'success': False, 'error': str(e)}
 
 @frappe.whitelist()
+@read_from_replica
 def get_request_payment_chart():
     """Get request payment (deposit + balance) statistics over time"""
     try:
@@ -1909,43 +1927,32 @@ def get_request_payment_chart():
         return {'success': False, 'error': str(e)}
 
 @frappe.whitelist()
+@read_from_replica
 def get_combined_revenue_chart():
     """Get combined revenue from subscriptions and request payments"""
     try:
+        revenue = {"revenue": "SUM(value)"}
+        
         # Last 12 months combined
-        monthly_combined = frappe.db.sql("""
-            SELECT 
-                month,
-                SUM(subscription_revenue) as subscription_revenue,
-                SUM(request_payment_revenue) as request_payment_revenue,
-                SUM(total_revenue) as total_revenue
-            FROM (
-                SELECT 
-                    DATE_FORMAT(paid_date, '%Y-%m') as month,
-                    SUM(amount) as subscription_revenue,
-                    0 as request_payment_revenue,
-                    SUM(amount) as total_revenue
-                FROM `tabPayment`
-                WHERE payment_status = 'Paid'
-                AND paid_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-                GROUP BY DATE_FORMAT(paid_date, '%Y-%m')
-                
-                UNION ALL
-                
-                SELECT 
-                    DATE_FORMAT(created_at, '%Y-%m') as month,
-                    0 as subscription_revenue,
-                    SUM(CASE WHEN deposit_status = 'Paid' THEN deposit_amount ELSE 0 END) +
-                    SUM(CASE WHEN balance_status = 'Paid' THEN remaining_amount ELSE 0 END) as request_payment_revenue,
-                    SUM(CASE WHEN deposit_status = 'Paid' THEN deposit_amount ELSE 0 END) +
-                    SUM(CASE WHEN balance_status = 'Paid' THEN remaining_amount ELSE 0 END) as total_revenue
-                FROM `tabPayment Transaction`
-                WHERE created_at >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-                GROUP BY DATE_FORMAT(created_at, '%Y-%m')
-            ) combined_data
-            GROUP BY month
-            ORDER BY month ASC
-        """, as_dict=True)
+        subscription_months = {
+            row.month: float(row.revenue or 0)
+            for row in get_metric_series("subscription_payments", "12 MONTH", period="month", aggregates=revenue)
+        }
+        request_months = {
+            row.month: float(row.revenue or 0)
+            for row in get_metric_series("request_payments", "12 MONTH", period="month", aggregates=revenue)
+        }
+        
+        monthly_combined = []
+        for month in sorted(set(subscription_months) | set(request_months)):
+            subscription_revenue = subscription_months.get(month, 0)
+            request_payment_revenue = request_months.get(month, 0)
+            monthly_combined.append({
+                'month': month,
+                'subscription_revenue': subscription_revenue,
+                'request_payment_revenue': request_payment_revenue,
+                'total_revenue': subscription_revenue + request_payment_revenue
+            })
         
         return {
             'success': True,
@@ -1959,19 +1966,22 @@ def get_combined_revenue_chart():
 
 
 @frappe.whitelist()
+@read_from_replica
 def get_payment_analytics():
     """Get detailed payment analytics"""
     try:
+        # Paid subscription payments come from the Daily Metrics rollup
+        
         # Top paying companies
         top_companies = frappe.db.sql("""
             SELECT 
-                company_name,
-                COUNT(*) as payment_count,
-                SUM(amount) as total_paid,
-                MAX(paid_date) as last_payment_date
-            FROM `tabPayment`
-            WHERE payment_status = 'Paid'
-            GROUP BY company_name
+                company as company_name,
+                SUM(count) as payment_count,
+                SUM(value) as total_paid,
+                MAX(metric_date) as last_payment_date
+            FROM `tabDaily Metrics`
+            WHERE metric = 'subscription_payments'
+            GROUP BY company
             ORDER BY total_paid DESC
             LIMIT 10
         """, as_dict=True)
@@ -1980,26 +1990,26 @@ def get_payment_analytics():
         payment_methods = frappe.db.sql("""
             SELECT 
                 payment_method,
-                COUNT(*) as count,
-                SUM(amount) as total_amount
-            FROM `tabPayment`
-            WHERE payment_status = 'Paid'
-            AND payment_method IS NOT NULL
+                SUM(count) as count,
+                SUM(value) as total_amount
+            FROM `tabDaily Metrics`
+            WHERE metric = 'subscription_payments'
+            AND payment_method != ''
             GROUP BY payment_method
         """, as_dict=True)
         
         # Average payment by plan
         avg_by_plan = frappe.db.sql("""
             SELECT 
-                subscription_plan,
-                AVG(amount) as avg_amount,
-                MIN(amount) as min_amount,
-                MAX(amount) as max_amount,
-                COUNT(*) as count
-            FROM `tabPayment`
-            WHERE payment_status = 'Paid'
-            AND subscription_plan IN ('Basic', 'Standard', 'Premium')
-            GROUP BY subscription_plan
+                plan as subscription_plan,
+                SUM(value) / NULLIF(SUM(count), 0) as avg_amount,
+                MIN(min_value) as min_amount,
+                MAX(max_value) as max_amount,
+                SUM(count) as count
+            FROM `tabDaily Metrics`
+            WHERE metric = 'subscription_payments'
+            AND plan IN ('Basic', 'Standard', 'Premium')
+            GROUP BY plan
         """, as_dict=True)
         
         # MRR (Monthly Recurring Revenue) calculation
@@ -2042,32 +2052,15 @@ def get_payment_analytics():
         return {'success': False, 'error': str(e)}
 
 @frappe.whitelist()
+@read_from_replica
 def get_user_growth_chart():
-    """Get user growth data for charts (7 days, 1 month, 1 year)"""
+    """Get user growth data for charts (7 days, 1 month, 1 year) from the Daily Metrics rollup"""
     try:
-        seven_days_data = frappe.db.sql("""
-            SELECT DATE(creation) as date, COUNT(*) as count
-            FROM `tabLocalMoves User`
-            WHERE creation >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
-            GROUP BY DATE(creation)
-            ORDER BY date ASC
-        """, as_dict=True)
+        signups = {"count": "SUM(count)"}
         
-        month_data = frappe.db.sql("""
-            SELECT DATE(creation) as date, COUNT(*) as count
-            FROM `tabLocalMoves User`
-            WHERE creation >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-            GROUP BY DATE(creation)
-            ORDER BY date ASC
-        """, as_dict=True)
-        
-        year_data = frappe.db.sql("""
-            SELECT DATE_FORMAT(creation, '%Y-%m') as month, COUNT(*) as count
-            FROM `tabLocalMoves User`
-            WHERE creation >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-            GROUP BY DATE_FORMAT(creation, '%Y-%m')
-            ORDER BY month ASC
-        """, as_dict=True)
+        seven_days_data = get_metric_series("user_signups", "7 DAY", aggregates=signups)
+        month_data = get_metric_series("user_signups", "30 DAY", aggregates=signups)
+        year_data = get_metric_series("user_signups", "12 MONTH", period="month", aggregates=signups)
         
         return {
             'success': True,
@@ -2082,6 +2075,7 @@ def get_user_growth_chart():
         return {'success': False, 'error': str(e)}
 
 @frappe.whitelist()
+@read_from_replica
 def get_revenue_chart():
     """Get revenue data for charts - ALIAS for get_payment_revenue_chart"""
     return get_payment_revenue_chart()
@@ -2147,9 +2141,13 @@ def get_all_companies():
                 'message': 'Access Denied: Admin permission required'
             }
         
-        # Get all companies with ALL fields
-        companies = frappe.get_all('Logistics Company',
-            fields=[
+        # One page of companies with ALL fields
+        data = get_request_data()
+        if data.get('is_active') not in (None, ''):
+            data['is_active'] = int(data.get('is_active'))
+        
+        companies, pagination = get_list_page('Logistics Company',
+            [
                 # Basic Details
                 'name', 'company_name', 'manager_email', 'phone', 'personal_contact_name',
                 'pincode', 'location', 'address', 'description', 'services_offered',
@@ -2180,45 +2178,47 @@ def get_all_companies():
                 
                 # Subscription
                 'subscription_plan', 'subscription_start_date', 'subscription_end_date',
-                'requests_viewed_this_month', 'is_active',
+                'requests_viewed_this_month', 'quota_period', 'is_active',
                 
                 # Ratings & Reviews
                 'average_rating', 'total_ratings',
                 
                 # Timestamps
-                'created_at', 'updated_at'
+                'created_at', 'updated_at', 'creation', 'modified'
             ],
-            order_by='created_at desc'
+            data,
+            filter_fields=['subscription_plan', 'is_active', 'pincode', 'postcode_area', 'manager_email'],
+            range_fields=['creation'],
+            sort_fields=LIST_SORT_FIELDS + ['company_name', 'average_rating', 'total_ratings']
         )
         
-        # Parse JSON fields and get reviews for each company
+        # 5 latest reviews for every company in a single window query
+        from localmoves.api.rating_review import get_batched_review_aggregates
+        review_aggregates = get_batched_review_aggregates(
+            [c['company_name'] for c in companies],
+            preview_limit=5,
+            include_distribution=False
+        )
+        
+        # Parse JSON fields and attach reviews for each company
+        from localmoves.utils.view_quota import get_period_usage
         for company in companies:
             parse_company_json_fields(company)
+            company['requests_viewed_this_month'] = get_period_usage(company)
             
-            # Get recent reviews for this company
-            recent_reviews = frappe.db.sql("""
-                SELECT 
-                    name as request_id,
-                    full_name as user_name,
-                    rating,
-                    review_comment,
-                    rated_at
-                FROM `tabLogistics Request`
-                WHERE company_name = %(company_name)s
-                AND rating IS NOT NULL
-                AND rating > 0
-                ORDER BY rated_at DESC
-                LIMIT 5
-            """, {"company_name": company['company_name']}, as_dict=True)
-            
-            company['recent_reviews'] = recent_reviews
+            company['recent_reviews'] = review_aggregates.get(
+                company['company_name'], {}
+            ).get('recent_reviews', [])
         
         return {
             'success': True, 
             'data': companies, 
-            'count': len(companies)
+            'count': len(companies),
+            'pagination': pagination
         }
         
+    except frappe.ValidationError as e:
+        return {'success': False, 'error': str(e)}
     except Exception as e:
         frappe.log_error(f"Get All Companies Error: {str(e)}")
         return {'success': False, 'error': str(e)}
@@ -2909,6 +2909,43 @@ def delete_company():
         frappe.db.rollback()
         return {'success': False, 'error': str(e)}
     
+# ===== STREAMING EXPORTS =====
+
+@frappe.whitelist()
+def export_data(entity=None, format=None):
+    """
+    Stream a full table export as CSV or NDJSON - Admin only
+    
+    Parameters:
+    - entity: payments, requests, users or companies
+    - format: csv (default) or ndjson
+    - plus the entity's list filters, e.g. status, company_name, role, is_active
+    
+    Rows are read and written in chunks, so memory stays flat for any table size.
+    """
+    from localmoves.utils.export_stream import stream_export
+    
+    try:
+        user_info = get_user_from_token()
+        
+        if user_info["role"] != "Admin":
+            return {'success': False, 'message': 'Access Denied: Admin permission required'}
+        
+        data = get_request_data()
+        return stream_export(
+            entity or data.get('entity'),
+            (format or data.get('format') or 'csv').lower(),
+            filters=data
+        )
+    except frappe.AuthenticationError as e:
+        return {'success': False, 'message': str(e)}
+    except frappe.ValidationError as e:
+        return {'success': False, 'message': str(e)}
+    except Exception as e:
+        frappe.log_error(f"Export Data Error: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+
 # ===== REQUEST CRUD OPERATIONS =====
 
 @frappe.whitelist()
@@ -3376,6 +3413,7 @@ def get_user_from_token():
 
 # ✅ ADMIN DASHBOARD
 @frappe.whitelist(allow_guest=False)
+@read_from_replica
 def get_admin_dashboard():
     """Get admin dashboard statistics"""
     try:
@@ -3384,6 +3422,16 @@ def get_admin_dashboard():
         if user_info["role"] != "Admin":
             return {"success": False, "message": "Only Admins can access dashboard"}
 
+        return get_dashboard_snapshot("admin", "all", "localmoves.api.dashboard.build_admin_dashboard")
+
+    except Exception as e:
+        frappe.log_error(f"Get Admin Dashboard Error: {str(e)}")
+        return {"success": False, "message": "Failed to fetch dashboard data"}
+
+
+def build_admin_dashboard():
+    """Compute the admin dashboard response (served through the dashboard snapshot cache)"""
+    try:
         total_users = frappe.db.count("LocalMoves User")
         total_admins = frappe.db.count("LocalMoves User", {"role": "Admin"})
         total_managers = frappe.db.count("LocalMoves User", {"role": "Logistics Manager"})
@@ -3392,12 +3440,13 @@ def get_admin_dashboard():
         total_companies = frappe.db.count("Logistics Company")
         active_companies = frappe.db.count("Logistics Company", {"is_active": 1})
 
-        total_requests = frappe.db.count("Logistics Request")
-        pending_requests = frappe.db.count("Logistics Request", {"status": "Pending"})
-        assigned_requests = frappe.db.count("Logistics Request", {"status": "Assigned"})
-        in_progress_requests = frappe.db.count("Logistics Request", {"status": "In Progress"})
-        completed_requests = frappe.db.count("Logistics Request", {"status": "Completed"})
-        cancelled_requests = frappe.db.count("Logistics Request", {"status": "Cancelled"})
+        # Hot and archived requests in one grouped count
+        total_requests, by_status = count_requests_by_status()
+        pending_requests = by_status.get("Pending", 0)
+        assigned_requests = by_status.get("Assigned", 0)
+        in_progress_requests = by_status.get("In Progress", 0)
+        completed_requests = by_status.get("Completed", 0)
+        cancelled_requests = by_status.get("Cancelled", 0)
 
         recent_users = frappe.get_all(
             "LocalMoves User",
@@ -3457,6 +3506,7 @@ def get_admin_dashboard():
 
 # ✅ MANAGER DASHBOARD
 @frappe.whitelist(allow_guest=False)
+@read_from_replica
 def get_manager_dashboard():
     """Get manager dashboard statistics"""
     try:
@@ -3465,8 +3515,21 @@ def get_manager_dashboard():
         if user_info["role"] != "Logistics Manager":
             return {"success": False, "message": "Only Managers can access this dashboard"}
 
+        return get_dashboard_snapshot(
+            "manager", user_info["email"], "localmoves.api.dashboard.build_manager_dashboard",
+            manager_email=user_info["email"]
+        )
+
+    except Exception as e:
+        frappe.log_error(f"Get Manager Dashboard Error: {str(e)}")
+        return {"success": False, "message": "Failed to fetch dashboard data"}
+
+
+def build_manager_dashboard(manager_email):
+    """Compute a manager's dashboard response (served through the dashboard snapshot cache)"""
+    try:
         companies = frappe.get_all(
-            "Logistics Company", filters={"manager_email": user_info["email"]}, pluck="name"
+            "Logistics Company", filters={"manager_email": manager_email}, pluck="name"
         )
 
         if not companies:
@@ -3474,23 +3537,18 @@ def get_manager_dashboard():
 
         company_details = frappe.get_all(
             "Logistics Company",
-            filters={"manager_email": user_info["email"]},
+            filters={"manager_email": manager_email},
             fields=["company_name", "phone", "pincode", "location", "is_active", "created_at"],
         )
 
-        total_requests = frappe.db.count("Logistics Request", {"company_name": ["in", companies]})
-        assigned_requests = frappe.db.count(
-            "Logistics Request", {"company_name": ["in", companies], "status": "Assigned"}
-        )
-        accepted_requests = frappe.db.count(
-            "Logistics Request", {"company_name": ["in", companies], "status": "Accepted"}
-        )
-        in_progress = frappe.db.count(
-            "Logistics Request", {"company_name": ["in", companies], "status": "In Progress"}
-        )
-        completed = frappe.db.count(
-            "Logistics Request", {"company_name": ["in", companies], "status": "Completed"}
+        # Hot and archived requests in one grouped count
+        total_requests, by_status = count_requests_by_status(
+            "company_name IN %(companies)s", {"companies": tuple(companies)}
         )
+        assigned_requests = by_status.get("Assigned", 0)
+        accepted_requests = by_status.get("Accepted", 0)
+        in_progress = by_status.get("In Progress", 0)
+        completed = by_status.get("Completed", 0)
 
         recent_requests = frappe.get_all(
             "Logistics Request",
@@ -3532,6 +3590,7 @@ def get_manager_dashboard():
 
 # ✅ USER DASHBOARD (fixed)
 @frappe.whitelist(allow_guest=False)
+@read_from_replica
 def get_user_dashboard():
     """Get user dashboard statistics"""
     try:
@@ -3540,14 +3599,30 @@ def get_user_dashboard():
         if not user_info or "email" not in user_info:
             frappe.throw(_("Invalid or missing user information"), frappe.AuthenticationError)
 
-        email = user_info["email"]
+        return get_dashboard_snapshot(
+            "user", user_info["email"], "localmoves.api.dashboard.build_user_dashboard",
+            email=user_info["email"]
+        )
+
+    except frappe.AuthenticationError:
+        # handled automatically, but log for clarity
+        frappe.log_error("User dashboard authentication failed")
+        return {"success": False, "message": "Unauthorized access"}
+    except Exception as e:
+        frappe.log_error(f"Get User Dashboard Error: {str(e)}")
+        return {"success": False, "message": "Failed to fetch dashboard data"}
+
 
-        total_requests = frappe.db.count("Logistics Request", {"user_email": email})
-        pending_requests = frappe.db.count("Logistics Request", {"user_email": email, "status": "Pending"})
-        assigned_requests = frappe.db.count("Logistics Request", {"user_email": email, "status": "Assigned"})
-        in_progress = frappe.db.count("Logistics Request", {"user_email": email, "status": "In Progress"})
-        completed = frappe.db.count("Logistics Request", {"user_email": email, "status": "Completed"})
-        cancelled = frappe.db.count("Logistics Request", {"user_email": email, "status": "Cancelled"})
+def build_user_dashboard(email):
+    """Compute a user's dashboard response (served through the dashboard snapshot cache)"""
+    try:
+        # Hot and archived requests in one grouped count
+        total_requests, by_status = count_requests_by_status("user_email = %(email)s", {"email": email})
+        pending_requests = by_status.get("Pending", 0)
+        assigned_requests = by_status.get("Assigned", 0)
+        in_progress = by_status.get("In Progress", 0)
+        completed = by_status.get("Completed", 0)
+        cancelled = by_status.get("Cancelled", 0)
 
         recent_requests = frappe.get_all(
             "Logistics Request",
@@ -3582,10 +3657,6 @@ def get_user_dashboard():
             },
         }
 
-    except frappe.AuthenticationError:
-        # handled automatically, but log for clarity
-        frappe.log_error("User dashboard authentication failed")
-        return {"success": False, "message": "Unauthorized access"}
     except Exception as e:
         frappe.log_error(f"Get User Dashboard Error: {str(e)}")
         return {"success": False, "message": "Failed to fetch dashboard data"}
@@ -4755,6 +4826,7 @@ def search_inventory_items():
 
 
 @frappe.whitelist(allow_guest=False)
+@read_from_replica
 def get_inventory_statistics():
     """Get inventory statistics - Admin only"""
     try:
@@ -4815,6 +4887,7 @@ def get_inventory_statistics():
 # ===== RATING & REVIEW ADMIN CRUD OPERATIONS =====
 
 @frappe.whitelist(allow_guest=False)
+@read_from_replica
 def get_all_ratings_and_reviews():
     """Get all ratings and reviews across all companies - Admin only"""
     try:
@@ -4827,76 +4900,38 @@ def get_all_ratings_and_reviews():
         
         data = get_request_data()
         
-        # Optional filters
-        company_name = data.get('company_name')
-        min_rating = data.get('min_rating')
-        max_rating = data.get('max_rating')
-        status = data.get('status')
-        limit = data.get('limit', 50)
-        offset = data.get('offset', 0)
-        
-        # Build SQL query with filters
-        filters = []
-        filter_values = {'limit': limit, 'offset': offset}
-        
-        if company_name:
-            filters.append("company_name = %(company_name)s")
-            filter_values['company_name'] = company_name
-        
-        if min_rating:
-            filters.append("rating >= %(min_rating)s")
-            filter_values['min_rating'] = min_rating
-        
-        if max_rating:
-            filters.append("rating <= %(max_rating)s")
-            filter_values['max_rating'] = max_rating
-        
-        if status:
-            filters.append("status = %(status)s")
-            filter_values['status'] = status
-        
-        where_clause = " AND ".join(filters) if filters else "1=1"
-        
-        # Get all rated requests
-        reviews = frappe.db.sql(f"""
-            SELECT 
-                name as request_id,
-                company_name,
-                rating,
-                review_comment,
-                service_aspects,
-                rated_at,
-                rating_updated_at,
-                full_name as user_name,
-                user_email,
-                user_phone,
-                status,
-                completed_at,
-                pickup_city,
-                delivery_city,
-                pickup_address,
-                delivery_address,
-                estimated_cost,
-                actual_cost,
-                created_at
-            FROM `tabLogistics Request`
-            WHERE rating IS NOT NULL
-            AND rating > 0
-            AND {where_clause}
-            ORDER BY rated_at DESC
-            LIMIT %(limit)s OFFSET %(offset)s
-        """, filter_values, as_dict=True)
-        
-        # Get total count
-        count_result = frappe.db.sql(f"""
-            SELECT COUNT(*) as total
-            FROM `tabLogistics Request`
-            WHERE rating IS NOT NULL
-            AND rating > 0
-            AND {where_clause}
-        """, filter_values, as_dict=True)
-        
-        total_count = count_result[0]['total'] if count_result else 0
+        # Older clients page with limit; the page size is capped either way
+        if not data.get('page_size') and data.get('limit'):
+            data['page_size'] = data.get('limit')
+        if data.get('with_count') is None:
+            data['with_count'] = 'exact'
+        
+        # min_rating / max_rating are the rating range
+        conditions = ["rating > 0", "rated_at IS NOT NULL"]
+        values = {}
+        if data.get('min_rating'):
+            conditions.append("rating >= %(min_rating)s")
+            values['min_rating'] = data.get('min_rating')
+        if data.get('max_rating'):
+            conditions.append("rating <= %(max_rating)s")
+            values['max_rating'] = data.get('max_rating')
+        
+        reviews, pagination = get_list_page('Logistics Request',
+            [
+                'name as request_id', 'company_name', 'rating', 'review_comment',
+                'service_aspects', 'rated_at', 'rating_updated_at', 'full_name as user_name',
+                'user_email', 'user_phone', 'status', 'completed_at', 'pickup_city',
+                'delivery_city', 'pickup_address', 'delivery_address', 'estimated_cost',
+                'actual_cost', 'created_at'
+            ],
+            data,
+            filter_fields=['company_name', 'status', 'user_email'],
+            range_fields=['rated_at'],
+            sort_fields=['rated_at', 'rating'],
+            conditions=conditions,
+            values=values,
+            key_alias='request_id'
+        )
         
         # Parse service aspects JSON
         for review in reviews:
@@ -4931,13 +4966,7 @@ def get_all_ratings_and_reviews():
         return {
             'success': True,
             'data': reviews,
-            'pagination': {
-                'total': total_count,
-                'limit': limit,
-                'offset': offset,
-                'current_page': (offset // limit) + 1 if limit > 0 else 1,
-                'total_pages': (total_count + limit - 1) // limit if limit > 0 else 1
-            },
+            'pagination': pagination,
             'statistics': {
                 'total_reviews': stats['total_reviews'],
                 'average_rating': round(stats['avg_rating'], 2) if stats['avg_rating'] else 0,
@@ -4948,6 +4977,8 @@ def get_all_ratings_and_reviews():
                 'rating_distribution': rating_dist
             }
         }
+    except frappe.ValidationError as e:
+        return {'success': False, 'error': str(e)}
     except Exception as e:
         frappe.log_error(f"Get All Reviews Error: {str(e)}")
         return {'success': False, 'error': str(e)}
@@ -5158,6 +5189,7 @@ def admin_delete_review():
 
 
 @frappe.whitelist(allow_guest=False)
+@read_from_replica
 def get_reviews_by_company():
     """Get all reviews for a specific company - Admin only"""
     try:
@@ -5225,6 +5257,7 @@ def get_reviews_by_company():
 
 
 @frappe.whitelist(allow_guest=False)
+@read_from_replica
 def get_reviews_by_user():
     """Get all reviews submitted by a specific user - Admin only"""
     try:
@@ -5372,6 +5405,7 @@ def bulk_delete_reviews():
 
 
 @frappe.whitelist(allow_guest=False)
+@read_from_replica
 def get_review_statistics():
     """Get comprehensive review statistics - Admin only"""
     try:
@@ -5485,6 +5519,7 @@ def get_review_statistics():
 
 
 @frappe.whitelist(allow_guest=False)
+@read_from_replica
 def search_reviews():
     """Search reviews by various criteria - Admin only"""
     try:
@@ -5588,6 +5623,7 @@ def search_reviews():
 
 
 @frappe.whitelist(allow_guest=False)
+@read_from_replica
 def get_review_statistics():
     """Get comprehensive review statistics - Admin only"""
     try:
@@ -5760,20 +5796,20 @@ def get_all_contact_submissions():
             }
         
         data = get_request_data()
-        filters = {}
-        
-        if data.get('status'):
-            filters['status'] = data.get('status')
         
-        contacts = frappe.get_all('Contact Us',
-            fields=['name', 'name_of_sender', 'email', 'message', 'status', 
-                    'admin_response', 'created_at', 'responded_at'],
-            filters=filters,
-            order_by='created_at desc'
+        contacts, pagination = get_list_page('Contact Us',
+            ['name', 'name_of_sender', 'email', 'message', 'status', 
+             'admin_response', 'created_at', 'responded_at', 'creation', 'modified'],
+            data,
+            filter_fields=['status', 'email'],
+            range_fields=['creation'],
+            sort_fields=LIST_SORT_FIELDS
         )
         
-        return {'success': True, 'data': contacts, 'count': len(contacts)}
+        return {'success': True, 'data': contacts, 'count': len(contacts), 'pagination': pagination}
         
+    except frappe.ValidationError as e:
+        return {'success': False, 'error': str(e)}
     except Exception as e:
         frappe.log_error(f"Get Contact Submissions Error: {str(e)}")
         return {'success': False, 'error': str(e)}
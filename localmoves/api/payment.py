@@ -5,6 +5,8 @@ from dateutil.relativedelta import relativedelta
 import json
 import jwt
 import traceback
+from localmoves.utils.view_quota import get_period_usage
+from localmoves.utils.pagination import get_list_page, build_list_filters
 
 # Your JWT configuration
 JWT_SECRET = "my_secret_key"
@@ -610,6 +612,9 @@ def get_payment_detail():
 
 
 # Get All Payments (Admin)
+PAYMENT_LIST_FILTERS = ["company_name", "payment_status", "subscription_plan", "payment_type", "payment_method"]
+
+
 @frappe.whitelist(allow_guest=True)
 def get_all_payments():
     """Get all payments (Admin only)"""
@@ -621,43 +626,50 @@ def get_all_payments():
         
         data = get_json_data() or {}
         
-        filters = {}
-        if data.get("company_name"):
-            filters["company_name"] = data.get("company_name")
-        if data.get("payment_status"):
-            filters["payment_status"] = data.get("payment_status")
-        if data.get("subscription_plan"):
-            filters["subscription_plan"] = data.get("subscription_plan")
-        
-        payments = frappe.get_all(
+        payments, pagination = get_list_page(
             "Payment",
-            filters=filters,
-            fields=[
+            [
                 "name", "company_name", "manager_email", "payment_type",
                 "subscription_plan", "amount", "currency", "payment_status",
                 "payment_method", "payment_date", "due_date", "paid_date",
                 "billing_period_start", "billing_period_end", "invoice_number",
-                "receipt_number", "created_at"
+                "receipt_number", "created_at", "creation", "modified"
             ],
-            order_by="created_at desc"
+            data,
+            filter_fields=PAYMENT_LIST_FILTERS,
+            range_fields=["created_at"],
+            sort_fields=["creation", "modified", "amount"]
         )
         
-        total_revenue = sum([p.amount for p in payments if p.payment_status == "Paid"])
-        pending_amount = sum([p.amount for p in payments if p.payment_status == "Pending"])
+        # Statistics over every matching payment, not just this page
+        conditions, values = build_list_filters(data, PAYMENT_LIST_FILTERS, ["created_at"])
+        stats = frappe.db.sql(f"""
+            SELECT
+                COUNT(*) AS total_payments,
+                COALESCE(SUM(CASE WHEN payment_status = 'Paid' THEN amount END), 0) AS total_revenue,
+                COALESCE(SUM(CASE WHEN payment_status = 'Pending' THEN amount END), 0) AS pending_amount,
+                COALESCE(SUM(payment_status = 'Paid'), 0) AS paid_count,
+                COALESCE(SUM(payment_status = 'Pending'), 0) AS pending_count
+            FROM `tabPayment`
+            WHERE {" AND ".join(conditions) or "1=1"}
+        """, values, as_dict=True)[0]
         
         return {
             "success": True,
             "count": len(payments),
             "statistics": {
-                "total_payments": len(payments),
-                "total_revenue": total_revenue,
-                "pending_amount": pending_amount,
-                "paid_count": len([p for p in payments if p.payment_status == "Paid"]),
-                "pending_count": len([p for p in payments if p.payment_status == "Pending"])
+                "total_payments": stats.total_payments,
+                "total_revenue": stats.total_revenue,
+                "pending_amount": stats.pending_amount,
+                "paid_count": int(stats.paid_count),
+                "pending_count": int(stats.pending_count)
             },
-            "data": payments
+            "data": payments,
+            "pagination": pagination
         }
         
+    except frappe.ValidationError as e:
+        return {"success": False, "message": str(e)}
     except frappe.AuthenticationError as e:
         return {"success": False, "message": str(e)}
     except Exception as e:
@@ -728,7 +740,7 @@ def get_subscription_status():
             filters={"manager_email": user_info.get("email", "")},
             fields=[
                 "company_name", "subscription_plan", "subscription_start_date",
-                "subscription_end_date", "is_active", "requests_viewed_this_month"
+                "subscription_end_date", "is_active", "requests_viewed_this_month", "quota_period"
             ]
         )
         
@@ -751,7 +763,7 @@ def get_subscription_status():
                 "start_date": str(company.get("subscription_start_date")) if company.get("subscription_start_date") else None,
                 "end_date": str(company.get("subscription_end_date")) if company.get("subscription_end_date") else None,
                 "days_remaining": days_remaining,
-                "requests_used": company.get("requests_viewed_this_month", 0),
+                "requests_used": get_period_usage(company),
                 "request_limit": plan_details["features"]["request_limit"],
                 "features": plan_details["features"]
             },
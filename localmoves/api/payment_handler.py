@@ -2,6 +2,7 @@ import json
 import frappe
 from frappe import _
 from datetime import datetime
+from localmoves.utils.pagination import get_list_page, build_list_filters
 
 
 
@@ -244,6 +245,8 @@ def get_payment_history():
 
 # ==================== ADMIN: GET ALL PAYMENTS ====================
 
+ADMIN_PAYMENT_FILTERS = ["payment_status", "payment_method", "company_name", "deposit_status", "balance_status"]
+
 @frappe.whitelist(allow_guest=True)
 def admin_get_all_payments():
     """Admin: Get all payment transactions"""
@@ -254,40 +257,43 @@ def admin_get_all_payments():
             return {"success": False, "message": "Admin access required"}
         
         data = frappe.request.get_json() or {}
-        filters = {}
-        
-        # Filter options
-        if data.get('payment_status'):
-            filters['payment_status'] = data['payment_status']
-        
-        if data.get('payment_gateway'):
-            filters['payment_gateway'] = data['payment_gateway']
         
-        if data.get('company_name'):
-            filters['company_name'] = data['company_name']
+        # Payment Transaction has no gateway column; the method is the gateway
+        if data.get('payment_gateway') and not data.get('payment_method'):
+            data['payment_method'] = data['payment_gateway']
         
-        payments = frappe.get_all(
-            "Payment Transaction",
-            filters=filters,
-            fields="*",
-            order_by="created_at desc"
+        payments, pagination = get_list_page(
+            "Payment Transaction", ["*"], data,
+            filter_fields=ADMIN_PAYMENT_FILTERS,
+            range_fields=["created_at"],
+            sort_fields=["creation", "modified", "total_amount"]
         )
         
-        # Calculate totals
-        total_collected = sum(p.get('deposit_amount', 0) for p in payments if p.get('payment_status') == 'Verified')
-        total_pending = sum(p.get('remaining_amount', 0) for p in payments if p.get('payment_status') == 'Verified')
+        # Totals over every matching transaction, not just this page
+        conditions, values = build_list_filters(data, ADMIN_PAYMENT_FILTERS, ["created_at"])
+        totals = frappe.db.sql(f"""
+            SELECT
+                COUNT(*) AS total_transactions,
+                COALESCE(SUM(CASE WHEN payment_status = 'Verified' THEN deposit_amount END), 0) AS total_collected,
+                COALESCE(SUM(CASE WHEN payment_status = 'Verified' THEN remaining_amount END), 0) AS total_pending
+            FROM `tabPayment Transaction`
+            WHERE {" AND ".join(conditions) or "1=1"}
+        """, values, as_dict=True)[0]
         
         return {
             "success": True,
             "count": len(payments),
             "data": payments,
+            "pagination": pagination,
             "summary": {
-                "total_deposit_collected": total_collected,
-                "total_remaining_pending": total_pending,
-                "total_transactions": len(payments)
+                "total_deposit_collected": totals.total_collected,
+                "total_remaining_pending": totals.total_pending,
+                "total_transactions": totals.total_transactions
             }
         }
         
+    except frappe.ValidationError as e:
+        return {"success": False, "message": str(e)}
     except Exception as e:
         frappe.log_error(f"Admin Get Payments Error: {str(e)}")
         return {"success": False, "message": "Failed to fetch payments"}
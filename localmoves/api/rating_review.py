@@ -4,9 +4,11 @@
 
 import frappe
 from frappe import _
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 import traceback
+from localmoves.utils.request_archive import requests_source, wants_archived
+from localmoves.utils.read_replica import read_from_replica
 
 
 # ==================== RATING & REVIEW CONFIGURATION ====================
@@ -15,9 +17,18 @@ RATING_CONFIG = {
     "min_rating": 1,
     "max_rating": 5,
     "allowed_statuses_for_rating": ["Assigned", "Accepted", "In Progress", "Completed"],
-    "review_max_length": 1000
+    "review_max_length": 1000,
+    "service_aspects": ["punctuality", "professionalism", "care_of_items", "communication", "value_for_money"],
+    # Leaderboard score = (prior_weight * prior_mean + rating_sum) / (prior_weight + total_ratings)
+    "bayesian_prior_mean": 4.0,
+    "bayesian_prior_weight": 10
 }
 
+REVIEW_COLUMNS = [
+    "name", "rating", "review_comment", "service_aspects", "rated_at", "rating_updated_at",
+    "full_name", "user_email", "status", "completed_at", "pickup_city", "delivery_city"
+]
+
 
 # ==================== HELPER FUNCTIONS ====================
 
@@ -166,12 +177,14 @@ def submit_rating_and_review():
         if not request_doc.company_name:
             return {"success": False, "message": "Request has no company assigned"}
         
-        # Step 8: Check if already rated
-        if hasattr(request_doc, 'rating') and request_doc.rating:
+        # Step 8: Check if already rated, against the locked row so a
+        # concurrent submit cannot add the same review to the totals twice
+        current = lock_request_rating(request_id)
+        if current.rating:
             return {
                 "success": False,
                 "message": "You have already rated this request. You can update it instead.",
-                "existing_rating": request_doc.rating
+                "existing_rating": current.rating
             }
         
         # Step 9: Update request with rating
@@ -180,10 +193,14 @@ def submit_rating_and_review():
         request_doc.db_set('service_aspects', json.dumps(service_aspects), update_modified=False)
         request_doc.db_set('rated_at', datetime.now(), update_modified=False)
         
-        frappe.db.commit()
+        # Step 10: Add this review to the company's running totals (same transaction)
+        apply_company_rating_delta(
+            request_doc.company_name,
+            new_rating=rating,
+            new_aspects=service_aspects
+        )
         
-        # Step 10: Update company's average rating
-        update_company_average_rating(request_doc.company_name)
+        frappe.db.commit()
         
         return {
             "success": True,
@@ -244,10 +261,17 @@ def update_rating_and_review():
         if request_doc.user_email != user_email:
             return {"success": False, "message": "You can only update your own ratings"}
         
+        # Old values come from the locked row, so concurrent updates apply
+        # their deltas one after the other
+        current = lock_request_rating(request_id)
+        
         # Check if rated before
-        if not hasattr(request_doc, 'rating') or not request_doc.rating:
+        if not current.rating:
             return {"success": False, "message": "Request has not been rated yet. Use submit_rating_and_review instead."}
         
+        old_rating = current.rating
+        old_aspects = parse_service_aspects(current.service_aspects)
+        
         # Update rating
         if rating:
             try:
@@ -276,17 +300,23 @@ def update_rating_and_review():
         
         request_doc.db_set('rating_updated_at', datetime.now(), update_modified=False)
         
-        frappe.db.commit()
+        # Swap the old review for the new one in the company's running totals
+        apply_company_rating_delta(
+            request_doc.company_name,
+            old_rating=old_rating,
+            new_rating=rating or old_rating,
+            old_aspects=old_aspects,
+            new_aspects=service_aspects or old_aspects
+        )
         
-        # Recalculate company average
-        update_company_average_rating(request_doc.company_name)
+        frappe.db.commit()
         
         return {
             "success": True,
             "message": "Rating and review updated successfully!",
             "data": {
                 "request_id": request_id,
-                "rating": rating or request_doc.rating,
+                "rating": rating or old_rating,
                 "review_comment": review_comment if review_comment is not None else request_doc.review_comment
             }
         }
@@ -332,7 +362,10 @@ def delete_rating_and_review():
         if request_doc.user_email != user_email:
             return {"success": False, "message": "You can only delete your own ratings"}
         
-        company_name = request_doc.company_name
+        current = lock_request_rating(request_id)
+        company_name = current.company_name
+        old_rating = current.rating
+        old_aspects = parse_service_aspects(current.service_aspects)
         
         # Clear rating fields
         request_doc.db_set('rating', None, update_modified=False)
@@ -341,11 +374,15 @@ def delete_rating_and_review():
         request_doc.db_set('rated_at', None, update_modified=False)
         request_doc.db_set('rating_updated_at', None, update_modified=False)
         
-        frappe.db.commit()
-        
-        # Recalculate company average
+        # Remove this review from the company's running totals
         if company_name:
-            update_company_average_rating(company_name)
+            apply_company_rating_delta(
+                company_name,
+                old_rating=old_rating,
+                old_aspects=old_aspects
+            )
+        
+        frappe.db.commit()
         
         return {
             "success": True,
@@ -361,7 +398,8 @@ def delete_rating_and_review():
 # ==================== GET COMPANY RATINGS & REVIEWS ====================
 
 @frappe.whitelist(allow_guest=True)
-def get_company_ratings_and_reviews(company_name=None, limit=None, offset=0):
+@read_from_replica
+def get_company_ratings_and_reviews(company_name=None, limit=None, offset=0, include_archived=None):
     """
     Get all ratings and reviews for a company
     
@@ -369,6 +407,7 @@ def get_company_ratings_and_reviews(company_name=None, limit=None, offset=0):
     - company_name: Company name
     - limit: Number of reviews to return (optional)
     - offset: Pagination offset (optional)
+    - include_archived: Also page through reviews on archived requests (optional)
     """
     try:
         data = get_json_data()
@@ -376,6 +415,7 @@ def get_company_ratings_and_reviews(company_name=None, limit=None, offset=0):
         company_name = company_name or safe_get_dict_value(data, "company_name")
         limit = limit or safe_get_dict_value(data, "limit", 20)
         offset = offset or safe_get_dict_value(data, "offset", 0)
+        include_archived = wants_archived(include_archived or safe_get_dict_value(data, "include_archived"))
         
         if not company_name:
             return {"success": False, "message": "company_name is required"}
@@ -387,7 +427,12 @@ def get_company_ratings_and_reviews(company_name=None, limit=None, offset=0):
         company = frappe.get_doc("Logistics Company", company_name)
         
         # Get all rated requests for this company
-        rated_requests = frappe.db.sql("""
+        source = requests_source(
+            REVIEW_COLUMNS,
+            where="company_name = %(company_name)s AND rating IS NOT NULL AND rating > 0",
+            include_archived=include_archived
+        )
+        rated_requests = frappe.db.sql(f"""
             SELECT 
                 name as request_id,
                 rating,
@@ -400,11 +445,9 @@ def get_company_ratings_and_reviews(company_name=None, limit=None, offset=0):
                 status,
                 completed_at,
                 pickup_city,
-                delivery_city
-            FROM `tabLogistics Request`
-            WHERE company_name = %(company_name)s
-            AND rating IS NOT NULL
-            AND rating > 0
+                delivery_city,
+                archived
+            FROM {source}
             ORDER BY rated_at DESC
             LIMIT %(limit)s OFFSET %(offset)s
         """, {
@@ -413,14 +456,15 @@ def get_company_ratings_and_reviews(company_name=None, limit=None, offset=0):
             "offset": offset
         }, as_dict=True)
         
-        # Get total count
-        total_count = frappe.db.sql("""
-            SELECT COUNT(*) as count
-            FROM `tabLogistics Request`
-            WHERE company_name = %(company_name)s
-            AND rating IS NOT NULL
-            AND rating > 0
-        """, {"company_name": company_name}, as_dict=True)[0]['count']
+        # Running totals on the company row cover every review, archived or not
+        rating_summary = get_company_rating_summary(company)
+        if include_archived:
+            total_count = rating_summary["total_ratings"]
+        else:
+            # Same rows the page is drawn from
+            total_count = frappe.db.sql(f"""
+                SELECT COUNT(*) FROM {source}
+            """, {"company_name": company_name})[0][0]
         
         # Parse service aspects JSON
         for review in rated_requests:
@@ -440,43 +484,10 @@ def get_company_ratings_and_reviews(company_name=None, limit=None, offset=0):
                 if review.get(date_field):
                     review[date_field] = str(review[date_field])
         
-        # Calculate rating distribution
-        rating_distribution = frappe.db.sql("""
-            SELECT 
-                rating,
-                COUNT(*) as count
-            FROM `tabLogistics Request`
-            WHERE company_name = %(company_name)s
-            AND rating IS NOT NULL
-            AND rating > 0
-            GROUP BY rating
-            ORDER BY rating DESC
-        """, {"company_name": company_name}, as_dict=True)
-        
-        # Calculate average for each service aspect
-        service_aspect_averages = {}
-        if rated_requests:
-            aspects = ['punctuality', 'professionalism', 'care_of_items', 'communication', 'value_for_money']
-            for aspect in aspects:
-                total = 0
-                count = 0
-                for review in rated_requests:
-                    if review.get('service_aspects') and isinstance(review['service_aspects'], dict):
-                        if aspect in review['service_aspects']:
-                            total += review['service_aspects'][aspect]
-                            count += 1
-                if count > 0:
-                    service_aspect_averages[aspect] = round(total / count, 2)
-        
         return {
             "success": True,
             "company_name": company_name,
-            "rating_summary": {
-                "average_rating": getattr(company, 'average_rating', 0),
-                "total_ratings": getattr(company, 'total_ratings', 0),
-                "rating_distribution": {str(r['rating']): r['count'] for r in rating_distribution},
-                "service_aspect_averages": service_aspect_averages
-            },
+            "rating_summary": rating_summary,
             "reviews": {
                 "total_count": total_count,
                 "current_page": int(offset / limit) + 1 if limit > 0 else 1,
@@ -493,8 +504,9 @@ def get_company_ratings_and_reviews(company_name=None, limit=None, offset=0):
 # ==================== GET MY RATINGS ====================
 
 @frappe.whitelist(allow_guest=True)
-def get_my_ratings():
-    """Get all ratings submitted by the current user"""
+@read_from_replica
+def get_my_ratings(include_archived=None):
+    """Get all ratings submitted by the current user (include_archived adds archived requests)"""
     try:
         user_info = get_user_from_token()
         
@@ -502,8 +514,14 @@ def get_my_ratings():
             return {"success": False, "message": "Authentication failed"}
         
         user_email = safe_get_dict_value(user_info, "email")
-        
-        my_ratings = frappe.db.sql("""
+        include_archived = wants_archived(include_archived or safe_get_dict_value(get_json_data(), "include_archived"))
+        
+        source = requests_source(
+            REVIEW_COLUMNS + ["company_name"],
+            where="user_email = %(user_email)s AND rating IS NOT NULL AND rating > 0",
+            include_archived=include_archived
+        )
+        my_ratings = frappe.db.sql(f"""
             SELECT 
                 name as request_id,
                 company_name,
@@ -515,11 +533,9 @@ def get_my_ratings():
                 status,
                 completed_at,
                 pickup_city,
-                delivery_city
-            FROM `tabLogistics Request`
-            WHERE user_email = %(user_email)s
-            AND rating IS NOT NULL
-            AND rating > 0
+                delivery_city,
+                archived
+            FROM {source}
             ORDER BY rated_at DESC
         """, {"user_email": user_email}, as_dict=True)
         
@@ -615,37 +631,303 @@ def get_pending_ratings():
         return {"success": False, "message": f"Failed to fetch pending ratings: {str(e)}"}
 
 
-# ==================== HELPER FUNCTION: UPDATE COMPANY AVERAGE ====================
+# ==================== HELPER FUNCTION: BATCHED REVIEW AGGREGATES ====================
 
-def update_company_average_rating(company_name):
-    """Calculate and update company's average rating"""
-    try:
-        # Calculate average rating
-        result = frappe.db.sql("""
-            SELECT 
-                AVG(rating) as avg_rating,
-                COUNT(*) as total_ratings
+def get_batched_review_aggregates(company_names, preview_limit=3, comments_only=False,
+                                  include_distribution=True, min_rating=None):
+    """
+    Rating distribution and latest review previews for many companies at once.
+
+    Runs one GROUP BY over the candidate set and one ROW_NUMBER() window query
+    for the previews, so a result page costs two queries regardless of size.
+
+    Returns:
+        dict: {company_name: {"rating_distribution": {...}, "recent_reviews": [...]}}
+    """
+    names = tuple({name for name in (company_names or []) if name})
+    aggregates = {name: {"rating_distribution": {}, "recent_reviews": []} for name in names}
+
+    if not names:
+        return aggregates
+
+    if include_distribution:
+        distribution_rows = frappe.db.sql("""
+            SELECT
+                company_name,
+                rating,
+                COUNT(*) as count
             FROM `tabLogistics Request`
-            WHERE company_name = %(company_name)s
+            WHERE company_name IN %(company_names)s
             AND rating IS NOT NULL
             AND rating > 0
-        """, {"company_name": company_name}, as_dict=True)
+            GROUP BY company_name, rating
+            ORDER BY company_name, rating DESC
+        """, {"company_names": names}, as_dict=True)
+
+        for row in distribution_rows:
+            aggregates[row['company_name']]["rating_distribution"][str(row['rating'])] = row['count']
+
+    if preview_limit and int(preview_limit) > 0:
+        review_filter = """
+                AND review_comment IS NOT NULL
+                AND review_comment != ''""" if comments_only else ""
+        if min_rating:
+            review_filter += """
+                AND rating >= %(min_rating)s"""
+
+        preview_rows = frappe.db.sql("""
+            SELECT
+                request_id,
+                company_name,
+                user_name,
+                rating,
+                review_comment,
+                rated_at
+            FROM (
+                SELECT
+                    name as request_id,
+                    company_name,
+                    full_name as user_name,
+                    rating,
+                    review_comment,
+                    rated_at,
+                    ROW_NUMBER() OVER (PARTITION BY company_name ORDER BY rated_at DESC) as row_num
+                FROM `tabLogistics Request`
+                WHERE company_name IN %(company_names)s
+                AND rating IS NOT NULL
+                AND rating > 0{review_filter}
+            ) ranked
+            WHERE row_num <= %(preview_limit)s
+            ORDER BY company_name, rated_at DESC
+        """.format(review_filter=review_filter), {
+            "company_names": names,
+            "preview_limit": int(preview_limit),
+            "min_rating": min_rating
+        }, as_dict=True)
+
+        for row in preview_rows:
+            aggregates[row.pop('company_name')]["recent_reviews"].append(row)
+
+    return aggregates
+
+
+# ==================== HELPER FUNCTIONS: COMPANY RATING TOTALS ====================
+# Logistics Company keeps running totals (rating_sum, rating_N_count and
+# aspect_<name>_sum / aspect_<name>_count) so summaries never re-scan requests.
+
+def parse_service_aspects(service_aspects):
+    """Return {aspect: float} for the known aspects that carry a numeric score"""
+    if not service_aspects:
+        return {}
+    
+    if isinstance(service_aspects, str):
+        try:
+            service_aspects = json.loads(service_aspects)
+        except (ValueError, TypeError):
+            return {}
+    
+    if not isinstance(service_aspects, dict):
+        return {}
+    
+    parsed = {}
+    for aspect in RATING_CONFIG["service_aspects"]:
+        try:
+            if service_aspects.get(aspect) is not None:
+                parsed[aspect] = float(service_aspects[aspect])
+        except (ValueError, TypeError):
+            continue
+    
+    return parsed
+
+
+def lock_request_rating(request_id):
+    """
+    Lock the request row until commit and return its current review fields.
+    
+    The locking read sees the latest committed rating (not the transaction's
+    snapshot), so two requests racing on one review compute their deltas in turn.
+    """
+    return frappe.db.sql("""
+        SELECT company_name, rating, service_aspects
+        FROM `tabLogistics Request`
+        WHERE name = %s
+        FOR UPDATE
+    """, request_id, as_dict=True)[0]
+
+
+def apply_company_rating_delta(company_name, old_rating=None, new_rating=None,
+                               old_aspects=None, new_aspects=None):
+    """
+    Move one review's contribution on the company row from old to new values.
+    
+    Pass only new_* for a submit, both for an update and only old_* for a delete.
+    Everything is applied in a single UPDATE, so concurrent reviews cannot lose
+    increments. The caller owns the commit.
+    """
+    old_rating = int(old_rating or 0)
+    new_rating = int(new_rating or 0)
+    old_aspects = parse_service_aspects(old_aspects)
+    new_aspects = parse_service_aspects(new_aspects)
+    
+    count_delta = (1 if new_rating > 0 else 0) - (1 if old_rating > 0 else 0)
+    sum_delta = new_rating - old_rating
+    
+    params = {
+        "company_name": company_name,
+        "count_delta": count_delta,
+        "sum_delta": sum_delta,
+        "prior_mean": RATING_CONFIG["bayesian_prior_mean"],
+        "prior_weight": RATING_CONFIG["bayesian_prior_weight"]
+    }
+    
+    # Derived scores are listed first so they only read pre-update column values
+    assignments = [
+        "average_rating = IFNULL(ROUND((IFNULL(rating_sum, 0) + %(sum_delta)s) / "
+        "NULLIF(IFNULL(total_ratings, 0) + %(count_delta)s, 0), 2), 0)",
+        "bayesian_score = ROUND((%(prior_weight)s * %(prior_mean)s + IFNULL(rating_sum, 0) + %(sum_delta)s) / "
+        "(%(prior_weight)s + IFNULL(total_ratings, 0) + %(count_delta)s), 4)",
+        "total_ratings = IFNULL(total_ratings, 0) + %(count_delta)s",
+        "rating_sum = IFNULL(rating_sum, 0) + %(sum_delta)s"
+    ]
+    
+    for star in range(RATING_CONFIG["min_rating"], RATING_CONFIG["max_rating"] + 1):
+        star_delta = (1 if new_rating == star else 0) - (1 if old_rating == star else 0)
+        if star_delta:
+            params[f"rating_{star}_delta"] = star_delta
+            assignments.append(
+                f"rating_{star}_count = IFNULL(rating_{star}_count, 0) + %(rating_{star}_delta)s"
+            )
+    
+    for aspect in RATING_CONFIG["service_aspects"]:
+        aspect_sum_delta = new_aspects.get(aspect, 0) - old_aspects.get(aspect, 0)
+        aspect_count_delta = (1 if aspect in new_aspects else 0) - (1 if aspect in old_aspects else 0)
+        if aspect_sum_delta or aspect_count_delta:
+            params[f"{aspect}_sum_delta"] = aspect_sum_delta
+            params[f"{aspect}_count_delta"] = aspect_count_delta
+            assignments.append(
+                f"aspect_{aspect}_sum = IFNULL(aspect_{aspect}_sum, 0) + %({aspect}_sum_delta)s"
+            )
+            assignments.append(
+                f"aspect_{aspect}_count = IFNULL(aspect_{aspect}_count, 0) + %({aspect}_count_delta)s"
+            )
+    
+    if not count_delta and not sum_delta and len(assignments) == 4:
+        return False
+    
+    frappe.db.sql("""
+        UPDATE `tabLogistics Company`
+        SET {assignments}
+        WHERE name = %(company_name)s
+    """.format(assignments=",\n            ".join(assignments)), params)
+    
+    return True
+
+
+def get_company_rating_summary(company):
+    """Build the rating summary from the running totals on a company doc or dict"""
+    def value(field):
+        if isinstance(company, dict):
+            return company.get(field) or 0
+        return getattr(company, field, 0) or 0
+    
+    rating_distribution = {}
+    for star in range(RATING_CONFIG["max_rating"], RATING_CONFIG["min_rating"] - 1, -1):
+        rating_distribution[str(star)] = int(value(f"rating_{star}_count"))
+    
+    service_aspect_averages = {}
+    for aspect in RATING_CONFIG["service_aspects"]:
+        aspect_count = int(value(f"aspect_{aspect}_count"))
+        if aspect_count > 0:
+            service_aspect_averages[aspect] = round(float(value(f"aspect_{aspect}_sum")) / aspect_count, 2)
+    
+    return {
+        "average_rating": value("average_rating"),
+        "total_ratings": int(value("total_ratings")),
+        "rating_distribution": rating_distribution,
+        "service_aspect_averages": service_aspect_averages
+    }
+
+
+def rebuild_company_rating_totals(company_name=None):
+    """
+    Recompute every rating counter from Logistics Request in one set-based UPDATE.
+    
+    Rebuilds a single company when company_name is given, otherwise all of them.
+    Archived requests are included. Companies without ratings are reset to zero.
+    The caller owns the commit.
+    """
+    star_columns = ",\n                ".join(
+        f"SUM(CASE WHEN rating = {star} THEN 1 ELSE 0 END) as rating_{star}_count"
+        for star in range(RATING_CONFIG["min_rating"], RATING_CONFIG["max_rating"] + 1)
+    )
+    aspect_columns = ",\n                ".join(
+        f"SUM(JSON_VALUE(service_aspects, '$.{aspect}')) as aspect_{aspect}_sum,\n"
+        f"                COUNT(JSON_VALUE(service_aspects, '$.{aspect}')) as aspect_{aspect}_count"
+        for aspect in RATING_CONFIG["service_aspects"]
+    )
+    
+    counter_fields = ["total_ratings", "rating_sum"]
+    counter_fields += [f"rating_{star}_count" for star in range(RATING_CONFIG["min_rating"], RATING_CONFIG["max_rating"] + 1)]
+    for aspect in RATING_CONFIG["service_aspects"]:
+        counter_fields += [f"aspect_{aspect}_sum", f"aspect_{aspect}_count"]
+    
+    assignments = [
+        "c.average_rating = IFNULL(ROUND(r.rating_sum / NULLIF(r.total_ratings, 0), 2), 0)",
+        "c.bayesian_score = ROUND((%(prior_weight)s * %(prior_mean)s + IFNULL(r.rating_sum, 0)) / "
+        "(%(prior_weight)s + IFNULL(r.total_ratings, 0)), 4)"
+    ]
+    assignments += [f"c.{field} = IFNULL(r.{field}, 0)" for field in counter_fields]
+    
+    request_filter = "rating IS NOT NULL AND rating > 0 AND company_name IS NOT NULL"
+    if company_name:
+        request_filter += " AND company_name = %(company_name)s"
+    company_filter = "WHERE c.name = %(company_name)s" if company_name else ""
+    source = requests_source(
+        ["company_name", "rating", "service_aspects"],
+        where=request_filter,
+        include_archived=True
+    )
+    
+    frappe.db.sql("""
+        UPDATE `tabLogistics Company` c
+        LEFT JOIN (
+            SELECT
+                company_name,
+                COUNT(*) as total_ratings,
+                SUM(rating) as rating_sum,
+                {star_columns},
+                {aspect_columns}
+            FROM {source}
+            GROUP BY company_name
+        ) r ON r.company_name = c.name
+        SET {assignments}
+        {company_filter}
+    """.format(
+        star_columns=star_columns,
+        aspect_columns=aspect_columns,
+        source=source,
+        assignments=",\n            ".join(assignments),
+        company_filter=company_filter
+    ), {
+        "company_name": company_name,
+        "prior_mean": RATING_CONFIG["bayesian_prior_mean"],
+        "prior_weight": RATING_CONFIG["bayesian_prior_weight"]
+    })
+
+
+def update_company_average_rating(company_name):
+    """Fully recalculate a company's average rating and rating totals"""
+    try:
+        rebuild_company_rating_totals(company_name)
+        frappe.db.commit()
         
-        if result and result[0]:
-            avg_rating = round(result[0]['avg_rating'], 2) if result[0]['avg_rating'] else 0
-            total_ratings = result[0]['total_ratings']
-            
-            # Update company
-            company = frappe.get_doc("Logistics Company", company_name)
-            company.db_set('average_rating', avg_rating, update_modified=False)
-            company.db_set('total_ratings', total_ratings, update_modified=False)
-            
-            frappe.db.commit()
-            
-            print(f"Updated {company_name}: avg={avg_rating}, total={total_ratings}")
-            return True
+        totals = frappe.db.get_value(
+            "Logistics Company", company_name,
+            ["average_rating", "total_ratings"], as_dict=True
+        ) or {}
         
-        return False
+        print(f"Updated {company_name}: avg={totals.get('average_rating')}, total={totals.get('total_ratings')}")
+        return bool(totals)
         
     except Exception as e:
         print(f"Update Company Average Error: {str(e)}\n{traceback.format_exc()}")
@@ -654,10 +936,61 @@ def update_company_average_rating(company_name):
 
 # ==================== BULK RECALCULATE ALL COMPANY RATINGS ====================
 
+RATING_REBUILD_JOB_ID = "localmoves_rebuild_company_ratings"
+RATING_REBUILD_STATUS_KEY = "localmoves_rating_rebuild_status"
+
+
+def set_rating_rebuild_status(status, progress, **extra):
+    """Store the rebuild progress report in cache and push it to listening admins"""
+    report = {
+        "status": status,
+        "progress": progress,
+        "updated_at": str(datetime.now())
+    }
+    report.update(extra)
+    
+    frappe.cache().set_value(RATING_REBUILD_STATUS_KEY, report, expires_in_sec=24 * 60 * 60)
+    frappe.publish_realtime("rating_rebuild_progress", report)
+    
+    return report
+
+
+def run_company_ratings_rebuild():
+    """Background job: rebuild rating totals for every company in one set-based UPDATE"""
+    started_at = datetime.now()
+    
+    try:
+        total_companies = frappe.db.count("Logistics Company")
+        set_rating_rebuild_status("running", 10, total_companies=total_companies, started_at=str(started_at))
+        
+        rebuild_company_rating_totals()
+        frappe.db.commit()
+        
+        rated_companies = frappe.db.count("Logistics Company", {"total_ratings": [">", 0]})
+        duration = round((datetime.now() - started_at).total_seconds(), 2)
+        
+        set_rating_rebuild_status(
+            "completed", 100,
+            total_companies=total_companies,
+            rated_companies=rated_companies,
+            started_at=str(started_at),
+            duration_seconds=duration
+        )
+        
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(f"Rating Rebuild Error: {str(e)}\n{traceback.format_exc()}", "Rating Rebuild")
+        set_rating_rebuild_status("failed", 100, started_at=str(started_at), error=str(e))
+
+
 @frappe.whitelist(allow_guest=True)
 def recalculate_all_company_ratings():
     """
     Admin function to recalculate ratings for all companies
+    
+    Queues a background rebuild and returns immediately. Poll
+    get_rating_recalculation_status (or listen for the rating_rebuild_progress
+    realtime event) for the progress report.
     """
     try:
         user_info = get_user_from_token()
@@ -669,23 +1002,58 @@ def recalculate_all_company_ratings():
         if safe_get_dict_value(user_info, "role") != "Admin":
             return {"success": False, "message": "Only admins can recalculate ratings"}
         
-        # Get all companies
-        companies = frappe.get_all("Logistics Company", fields=["company_name"])
+        # A report stuck for 15 minutes means the worker died; allow a new run
+        current = frappe.cache().get_value(RATING_REBUILD_STATUS_KEY) or {}
+        is_fresh = current.get("updated_at") and \
+            datetime.now() - datetime.fromisoformat(current["updated_at"]) < timedelta(minutes=15)
+        if current.get("status") in ("queued", "running") and is_fresh:
+            return {
+                "success": True,
+                "message": "Rating recalculation is already in progress",
+                "job": current
+            }
+        
+        report = set_rating_rebuild_status("queued", 0)
         
-        updated_count = 0
-        for company in companies:
-            if update_company_average_rating(company['company_name']):
-                updated_count += 1
+        frappe.enqueue(
+            "localmoves.api.rating_review.run_company_ratings_rebuild",
+            queue="long",
+            job_id=RATING_REBUILD_JOB_ID,
+            deduplicate=True,
+            enqueue_after_commit=True
+        )
         
         return {
             "success": True,
-            "message": f"Recalculated ratings for {updated_count} companies",
-            "total_companies": len(companies)
+            "message": "Rating recalculation queued",
+            "job": report
         }
         
     except Exception as e:
         print(f"Recalculate Ratings Error: {str(e)}\n{traceback.format_exc()}")
         return {"success": False, "message": f"Failed to recalculate: {str(e)}"}
+
+
+@frappe.whitelist(allow_guest=True)
+def get_rating_recalculation_status():
+    """Admin function to read the progress report of the last rating recalculation"""
+    try:
+        user_info = get_user_from_token()
+        
+        if not user_info or not isinstance(user_info, dict):
+            return {"success": False, "message": "Authentication failed"}
+        
+        if safe_get_dict_value(user_info, "role") != "Admin":
+            return {"success": False, "message": "Only admins can view recalculation status"}
+        
+        return {
+            "success": True,
+            "job": frappe.cache().get_value(RATING_REBUILD_STATUS_KEY) or {"status": "idle", "progress": 0}
+        }
+        
+    except Exception as e:
+        print(f"Recalculation Status Error: {str(e)}\n{traceback.format_exc()}")
+        return {"success": False, "message": f"Failed to fetch status: {str(e)}"}
     
 
 
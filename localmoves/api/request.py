@@ -2,8 +2,15 @@ import json
 import frappe
 from frappe import _
 from localmoves.utils.jwt_handler import get_current_user
-from datetime import datetime
+from datetime import datetime, timedelta
 from localmoves.api.request_pricing import calculate_comprehensive_price
+from localmoves.utils import view_quota
+from localmoves.utils.pagination import get_page_size, encode_cursor, decode_cursor
+from localmoves.utils.request_archive import requests_source, wants_archived
+from localmoves.utils.request_tombstones import get_request_owners, record_request_exits, get_removed_requests
+from localmoves.localmoves.doctype.logistics_request.logistics_request import (
+    get_status_transition_error, get_statuses_allowed_into
+)
 
 
 
@@ -117,18 +124,62 @@ def get_json_data():
         frappe.log_error(f"get_json_data error: {str(e)}")
         return {}  # Always return empty dict on error
 
-def reset_monthly_view_counts():
-    """Reset view counts for all companies at month start (call via scheduler)"""
-    try:
-        frappe.db.sql("""
-            UPDATE `tabLogistics Company`
-            SET requests_viewed_this_month = 0
-        """)
-        frappe.db.commit()
-        return {"success": True, "message": "Monthly view counts reset"}
-    except Exception as e:
-        frappe.log_error(f"Reset view counts error: {str(e)}")
-        return {"success": False, "message": str(e)}
+# Company fields needed to evaluate subscription and quota without loading the full document
+COMPANY_QUOTA_FIELDS = [
+    "company_name", "subscription_plan", "requests_viewed_this_month",
+    "pincode", "is_active", "subscription_end_date"
+]
+
+def evaluate_subscription(company):
+    """Subscription status from an already-loaded company row (frappe._dict) or document"""
+    if not getattr(company, 'is_active', False):
+        return {"active": False, "reason": "inactive", "message": "Company account is inactive"}
+    
+    end_date = getattr(company, 'subscription_end_date', None)
+    if end_date:
+        today = datetime.now().date()
+        if end_date < today:
+            return {
+                "active": False, 
+                "reason": "expired", 
+                "message": "Subscription has expired",
+                "expired_date": str(end_date)
+            }
+    
+    return {
+        "active": True,
+        "plan": getattr(company, 'subscription_plan', None) or 'Basic',
+        "end_date": str(end_date) if end_date else None
+    }
+
+def evaluate_view_limit(company, subscription_check=None):
+    """View limit from an already-loaded company row (frappe._dict) or document"""
+    subscription_check = subscription_check or evaluate_subscription(company)
+    
+    if not safe_get_dict_value(subscription_check, "active", False):
+        return {
+            "allowed": False, "remaining": 0, "limit": 0, "viewed": 0,
+            "subscription_status": subscription_check
+        }
+    
+    plan = getattr(company, 'subscription_plan', None) or 'Basic'
+    limit = PLAN_LIMITS.get(plan, 10)
+    
+    if limit == -1:
+        return {
+            "allowed": True, "remaining": -1, "limit": -1, "viewed": 0,
+            "subscription_status": subscription_check
+        }
+    
+    viewed = getattr(company, 'requests_viewed_this_month', 0) or 0
+    
+    return {
+        "allowed": viewed < limit,
+        "remaining": max(0, limit - viewed),
+        "limit": limit,
+        "viewed": viewed,
+        "subscription_status": subscription_check
+    }
 
 def check_subscription_active(company_name):
     """Check if company has an active subscription"""
@@ -136,30 +187,11 @@ def check_subscription_active(company_name):
         if not company_name:
             return {"active": False, "reason": "no_company", "message": "No company specified"}
         
-        if not frappe.db.exists("Logistics Company", company_name):
+        company = view_quota.get_quota_company(company_name)
+        if not company:
             return {"active": False, "reason": "not_found", "message": f"Company '{company_name}' not found"}
         
-        company = frappe.get_doc("Logistics Company", company_name)
-        
-        if not getattr(company, 'is_active', False):
-            return {"active": False, "reason": "inactive", "message": "Company account is inactive"}
-        
-        end_date = getattr(company, 'subscription_end_date', None)
-        if end_date:
-            today = datetime.now().date()
-            if end_date < today:
-                return {
-                    "active": False, 
-                    "reason": "expired", 
-                    "message": "Subscription has expired",
-                    "expired_date": str(end_date)
-                }
-        
-        return {
-            "active": True,
-            "plan": getattr(company, 'subscription_plan', 'Basic'),
-            "end_date": str(end_date) if end_date else None
-        }
+        return evaluate_subscription(company)
         
     except Exception as e:
         frappe.log_error(f"check_subscription_active error: {str(e)}")
@@ -174,39 +206,14 @@ def check_view_limit(company_name):
                 "subscription_status": {"active": False, "reason": "no_company"}
             }
         
-        if not frappe.db.exists("Logistics Company", company_name):
+        company = view_quota.get_quota_company(company_name)
+        if not company:
             return {
                 "allowed": False, "remaining": 0, "limit": 10, "viewed": 0,
                 "subscription_status": {"active": False, "reason": "not_found"}
             }
         
-        company = frappe.get_doc("Logistics Company", company_name)
-        subscription_check = check_subscription_active(company_name)
-        
-        if not safe_get_dict_value(subscription_check, "active", False):
-            return {
-                "allowed": False, "remaining": 0, "limit": 0, "viewed": 0,
-                "subscription_status": subscription_check
-            }
-        
-        plan = getattr(company, 'subscription_plan', 'Basic')
-        limit = PLAN_LIMITS.get(plan, 10)
-        
-        if limit == -1:
-            return {
-                "allowed": True, "remaining": -1, "limit": -1, "viewed": 0,
-                "subscription_status": subscription_check
-            }
-        
-        viewed = getattr(company, 'requests_viewed_this_month', 0) or 0
-        
-        return {
-            "allowed": viewed < limit,
-            "remaining": max(0, limit - viewed),
-            "limit": limit,
-            "viewed": viewed,
-            "subscription_status": subscription_check
-        }
+        return evaluate_view_limit(company)
         
     except Exception as e:
         frappe.log_error(f"check_view_limit error: {str(e)}")
@@ -216,17 +223,62 @@ def check_view_limit(company_name):
         }
 
 def increment_view_count(company_name):
-    """Increment the view count for a company"""
+    """Record one request against the company's monthly quota without enforcing the limit"""
     try:
-        if company_name and frappe.db.exists("Logistics Company", company_name):
-            company = frappe.get_doc("Logistics Company", company_name)
-            current_count = getattr(company, 'requests_viewed_this_month', 0) or 0
-            company.requests_viewed_this_month = current_count + 1
-            company.save(ignore_permissions=True)
-            frappe.db.commit()
+        if company_name:
+            view_quota.add_usage(company_name)
     except Exception as e:
         frappe.log_error(f"increment_view_count error: {str(e)}")
 
+def claim_pending_request(request_id, company_name, pincode=None, estimated_cost=None):
+    """
+    Assign a Pending, unassigned request to a company (compare-and-set).
+    
+    Returns the assignment time, or None if another company got there first
+    or the request is not claimable. The caller commits.
+    """
+    now = datetime.now()
+    values = {
+        "request_id": request_id,
+        "company_name": company_name,
+        "pincode": pincode,
+        "now": now
+    }
+    
+    cost_clause = ""
+    if estimated_cost:
+        try:
+            values["estimated_cost"] = float(estimated_cost)
+            cost_clause = ", estimated_cost = %(estimated_cost)s"
+        except (ValueError, TypeError):
+            pass
+    
+    # The claim clears previously_assigned_to; that company loses the request
+    previous_owners = get_request_owners([request_id])
+    
+    frappe.db.sql(f"""
+        UPDATE `tabLogistics Request`
+        SET company_name = %(company_name)s,
+            status = 'Assigned',
+            assigned_date = %(now)s,
+            updated_at = %(now)s,
+            previously_assigned_to = NULL{cost_clause}
+        WHERE name = %(request_id)s
+        AND status = 'Pending'
+        AND (company_name IS NULL OR company_name = '')
+        {"AND pickup_pincode = %(pincode)s" if pincode else ""}
+    """, values)
+    
+    if frappe.db._cursor.rowcount != 1:
+        return None
+    
+    record_request_exits(
+        ((name, owner) for name, owner in previous_owners.items() if owner != company_name),
+        removed_at=now
+    )
+    clear_request_statistics(company_name)
+    return now
+
 def unassign_request_from_company(request_id, original_company=None):
     """Unassign a request and mark who it belonged to"""
     try:
@@ -245,6 +297,85 @@ def unassign_request_from_company(request_id, original_company=None):
         frappe.log_error(f"Unassign request error: {str(e)}")
         return False
 
+# Only live assignments count toward (and are released by) the plan limit;
+# In Progress, Completed and Cancelled jobs keep their company
+LIVE_ASSIGNMENT_STATUSES = ("Assigned", "Accepted")
+
+def get_over_limit_request_names(company_name, plan_limit):
+    """Live assignments a company holds beyond its plan limit, oldest assignments kept first"""
+    if plan_limit == -1:
+        return []
+    
+    return frappe.db.sql_list("""
+        SELECT name
+        FROM `tabLogistics Request`
+        WHERE company_name = %(company_name)s
+        AND status IN %(statuses)s
+        ORDER BY assigned_date ASC, created_at ASC
+        LIMIT 18446744073709551615 OFFSET %(plan_limit)s
+    """, {"company_name": company_name, "plan_limit": plan_limit, "statuses": LIVE_ASSIGNMENT_STATUSES})
+
+def reconcile_over_limit_requests(company_name):
+    """
+    Release requests a company holds beyond its plan limit (background job).
+    
+    Released requests go back to Pending with previously_assigned_to set so
+    the company can reclaim them after upgrading.
+    """
+    company = frappe.db.get_value("Logistics Company", company_name, COMPANY_QUOTA_FIELDS, as_dict=True)
+    if not company:
+        return 0
+    
+    limit_check = evaluate_view_limit(company)
+    if not safe_get_dict_value(limit_check["subscription_status"], "active", False):
+        return 0
+    
+    over_limit = get_over_limit_request_names(company_name, limit_check["limit"])
+    if not over_limit:
+        return 0
+    
+    # previously_assigned_to moves to this company; whoever held it before loses the request
+    now = datetime.now()
+    previous_owners = get_request_owners(over_limit)
+    record_request_exits(
+        ((name, owner) for name, owner in previous_owners.items() if owner != company_name),
+        removed_at=now
+    )
+    
+    frappe.db.sql("""
+        UPDATE `tabLogistics Request`
+        SET previously_assigned_to = %(company_name)s,
+            company_name = NULL,
+            status = 'Pending',
+            assigned_date = NULL,
+            updated_at = %(now)s
+        WHERE name IN %(names)s
+        AND company_name = %(company_name)s
+        AND status IN %(statuses)s
+    """, {
+        "company_name": company_name,
+        "names": tuple(over_limit),
+        "statuses": LIVE_ASSIGNMENT_STATUSES,
+        "now": now
+    })
+    released = frappe.db._cursor.rowcount
+    frappe.db.commit()
+    clear_request_statistics(company_name)
+    
+    frappe.logger().info(f"Released {released} over-limit requests from {company_name}")
+    return released
+
+def enqueue_over_limit_reconciliation(company_name, after_commit=True):
+    """Queue reconcile_over_limit_requests once per company"""
+    frappe.enqueue(
+        "localmoves.api.request.reconcile_over_limit_requests",
+        queue="short",
+        job_id=f"reconcile_over_limit::{company_name}",
+        deduplicate=True,
+        enqueue_after_commit=after_commit,
+        company_name=company_name
+    )
+
 # Get Manager Requests
 # @frappe.whitelist(allow_guest=True)
 # def get_manager_requests():
@@ -427,55 +558,68 @@ def unassign_request_from_company(request_id, original_company=None):
 # Get Manager Requests - FIXED to include pending-for-company in blurred
 # Get Manager Requests - COMPLETE FIX with exclusion logic
 # Add this new function to calculate request statistics
+REQUEST_STATS_CACHE_TTL = 300
+
+def get_request_stats_cache_key(company_name):
+    return f"request_stats::{company_name}"
+
+def clear_request_statistics(*company_names):
+    """Drop cached statistics after a company's requests change status, owner or amounts"""
+    for company_name in company_names:
+        if company_name:
+            frappe.cache().delete_value(get_request_stats_cache_key(company_name))
+
 def calculate_request_statistics(company_name):
     """Calculate statistics for pending, confirmed, and completed requests with average prices"""
     try:
-        # Get all requests for this company
-        all_requests = frappe.get_all(
-            "Logistics Request",
-            filters={"company_name": company_name},
-            fields=["status", "remaining_amount", "total_amount", "estimated_cost"]
+        cache_key = get_request_stats_cache_key(company_name)
+        stats = frappe.cache().get_value(cache_key)
+        if stats:
+            return stats
+        
+        # One row per status; uses the (company_name, status) index. An amount
+        # falls back to total_amount / estimated_cost when remaining_amount is 0.
+        # Archived requests still count towards the company's totals
+        source = requests_source(
+            ["status", "remaining_amount", "total_amount", "estimated_cost"],
+            where="company_name = %(company_name)s",
+            include_archived=True
         )
+        rows = frappe.db.sql(f"""
+            SELECT
+                status,
+                COUNT(*) AS request_count,
+                SUM(COALESCE(NULLIF(remaining_amount, 0), NULLIF(total_amount, 0), estimated_cost, 0)) AS amount_total
+            FROM {source}
+            GROUP BY status
+        """, {"company_name": company_name}, as_dict=True)
         
-        # Initialize counters
         stats = {
             "pending_count": 0,
             "confirmed_count": 0,
             "completed_count": 0,
-            "total_requests": len(all_requests),
+            "total_requests": 0,
             "overall_avg_remaining": 0
         }
+        amount_total = 0
         
-        # Categorize requests
-        pending_amounts = []
-        confirmed_amounts = []
-        completed_amounts = []
-        all_amounts = []
-        
-        for req in all_requests:
-            status = req.get('status', '').lower()
-            remaining = float(req.get('remaining_amount') or 0)
+        for row in rows:
+            status = (row.status or '').lower()
+            count = int(row.request_count or 0)
             
-            # If remaining_amount is 0, use total_amount or estimated_cost
-            if remaining == 0:
-                remaining = float(req.get('total_amount') or req.get('estimated_cost') or 0)
+            stats['total_requests'] += count
+            amount_total += float(row.amount_total or 0)
             
-            all_amounts.append(remaining)
-            
-            # Categorize by status
             if status in ['pending']:
-                stats['pending_count'] += 1
-                pending_amounts.append(remaining)
+                stats['pending_count'] += count
             elif status in ['assigned', 'accepted', 'in progress']:
-                stats['confirmed_count'] += 1
-                confirmed_amounts.append(remaining)
+                stats['confirmed_count'] += count
             elif status in ['completed']:
-                stats['completed_count'] += 1
-                completed_amounts.append(remaining)
+                stats['completed_count'] += count
         
-        # Calculate averages
-        stats['overall_avg_remaining'] = round(sum(all_amounts) / len(all_amounts), 2) if all_amounts else 0
+        stats['overall_avg_remaining'] = round(amount_total / stats['total_requests'], 2) if stats['total_requests'] else 0
         
+        frappe.cache().set_value(cache_key, stats, expires_in_sec=REQUEST_STATS_CACHE_TTL)
         return stats
         
     except Exception as e:
@@ -489,11 +633,205 @@ def calculate_request_statistics(company_name):
         }
 
 
+# Incremental sync for request lists
+# Rows newer than this are left for the next poll so a transaction that
+# stamped updated_at earlier but commits later is not skipped
+SYNC_SETTLE_SECONDS = 5
+
+SYNC_FIELDS = [
+    "name", "pickup_pincode", "delivery_pincode", "pickup_city",
+    "delivery_city", "item_description", "status", "priority",
+    "company_name", "previously_assigned_to", "estimated_cost", "actual_cost",
+    "created_at", "updated_at", "delivery_date", "assigned_date",
+    "user_email", "full_name", "phone", "pickup_address", "delivery_address",
+    "special_instructions", "remaining_amount", "total_amount", "payment_status"
+]
+
+def get_sync_watermark():
+    return datetime.now() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+
+def get_sync_token(watermark=None):
+    """Token for a client that has just loaded the full list"""
+    return encode_cursor([str(watermark or get_sync_watermark()), ""])
+
+def get_request_changes(scope_condition, params, since, page_size=None):
+    """
+    Requests matching scope_condition whose updated_at moved past the `since` token.
+    
+    Keyset on (updated_at, name) up to the settle watermark. Returns
+    (rows, removed, sync) where sync carries next_since and has_more;
+    removed lists {name, status} from the Request Tombstones in the same
+    window and scope (deleted, archived, or taken away from this company).
+    """
+    page_size = get_page_size(page_size, default=100)
+    after = decode_cursor(since, 2)
+    watermark = get_sync_watermark()
+    
+    values = dict(params, watermark=watermark, limit=page_size + 1,
+                  after_ts=after[0], after_name=after[1])
+    
+    rows = frappe.db.sql(f"""
+        SELECT {", ".join(SYNC_FIELDS)}
+        FROM `tabLogistics Request`
+        WHERE ({scope_condition})
+        AND (updated_at > %(after_ts)s OR (updated_at = %(after_ts)s AND name > %(after_name)s))
+        AND updated_at <= %(watermark)s
+        ORDER BY updated_at ASC, name ASC
+        LIMIT %(limit)s
+    """, values, as_dict=True)
+    
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    window_end = rows[-1].updated_at if has_more else watermark
+    
+    # A request that is back in scope in this window is sent as it is now
+    changed_names = {row.name for row in rows}
+    removed = [
+        row for row in get_removed_requests(scope_condition, params, after[0], window_end)
+        if row.name not in changed_names
+    ]
+    
+    next_since = encode_cursor([str(rows[-1].updated_at), rows[-1].name]) if has_more else get_sync_token(watermark)
+    
+    return rows, removed, {"next_since": next_since, "has_more": has_more}
+
+HIDDEN_VALUE = "*** HIDDEN ***"
+
+def blur_over_limit_request(req, subscription_plan):
+    """Hide an assigned request that is beyond the company's plan limit"""
+    req["is_blurred"] = True
+    req["blur_reason"] = f"Request limit exceeded. Upgrade to {('Premium' if subscription_plan == 'Standard' else 'Standard or Premium')} to reclaim."
+    req["item_description"] = "*** BLURRED - Upgrade Plan ***"
+    req["user_email"] = HIDDEN_VALUE
+    req["user_name"] = HIDDEN_VALUE
+    req["user_phone"] = HIDDEN_VALUE
+    req["pickup_address"] = HIDDEN_VALUE
+    req["delivery_address"] = HIDDEN_VALUE
+    req["special_instructions"] = HIDDEN_VALUE
+    req["company_name"] = None
+    return req
+
+def hide_available_contact(req):
+    """Customer contact on an available request, for a company that cannot accept it yet"""
+    for field in ("user_email", "pickup_address", "delivery_address"):
+        if field in req:
+            req[field] = HIDDEN_VALUE
+    return req
+
+def get_visible_assigned_names(company_name, plan_limit):
+    """
+    The live assignments within the plan limit (same rule and order as
+    get_over_limit_request_names); other statuses are never blurred
+    """
+    return set(frappe.db.sql_list("""
+        SELECT name
+        FROM `tabLogistics Request`
+        WHERE company_name = %(company_name)s
+        AND status IN %(statuses)s
+        ORDER BY assigned_date ASC, created_at ASC
+        LIMIT %(limit)s
+    """, {"company_name": company_name, "limit": plan_limit, "statuses": LIVE_ASSIGNMENT_STATUSES}))
+
+def get_manager_request_changes(company, since, page_size=None, subscription_check=None, limit_check=None):
+    """
+    Delta for get_manager_requests: every changed request is returned in the
+    section it now belongs to, or as a tombstone if it left this manager's view.
+    
+    The subscription and view-limit rules of the full list apply: without an
+    active subscription nothing assigned is shown, requests beyond the plan
+    limit come back blurred, and customer contact on available requests is
+    hidden while the company cannot accept more.
+    """
+    company_name = company.get("company_name")
+    pincode = company.get("pincode")
+    subscription_plan = company.get("subscription_plan") or "Basic"
+    
+    active = safe_get_dict_value(subscription_check, "active", False)
+    plan_limit = safe_get_dict_value(limit_check, "limit", 0)
+    can_accept = safe_get_dict_value(limit_check, "allowed", False)
+    
+    rows, removed, sync = get_request_changes(
+        "company_name = %(company_name)s OR previously_assigned_to = %(company_name)s OR pickup_pincode = %(pincode)s",
+        {"company_name": company_name, "pincode": pincode},
+        since, page_size
+    )
+    
+    visible_names = None
+    if active and plan_limit != -1 and any(
+        row.company_name == company_name and row.status in LIVE_ASSIGNMENT_STATUSES for row in rows
+    ):
+        visible_names = get_visible_assigned_names(company_name, plan_limit)
+    
+    changes = {"assigned": [], "blurred": [], "available": [], "pending_for_you": [], "removed": []}
+    
+    for row in rows:
+        unassigned = row.status == "Pending" and not row.company_name
+        
+        if row.company_name == company_name and active:
+            if (visible_names is not None and row.status in LIVE_ASSIGNMENT_STATUSES
+                    and row.name not in visible_names):
+                changes["blurred"].append(blur_over_limit_request(dict(row), subscription_plan))
+            else:
+                changes["assigned"].append(row)
+        elif active and unassigned and row.previously_assigned_to == company_name and not row.assigned_date:
+            # Mirrors the blurred "requested you while at capacity" entries
+            changes["pending_for_you"].append({
+                "name": row.name, "pickup_pincode": row.pickup_pincode,
+                "delivery_pincode": row.delivery_pincode, "pickup_city": row.pickup_city,
+                "delivery_city": row.delivery_city, "status": row.status,
+                "priority": row.priority, "created_at": str(row.created_at),
+                "delivery_date": str(row.delivery_date) if row.delivery_date else None,
+                "updated_at": str(row.updated_at), "is_blurred": True,
+                "was_requested_for_you": True
+            })
+        elif unassigned and row.pickup_pincode == pincode:
+            available = {
+                field: row.get(field) for field in [
+                    "name", "pickup_pincode", "delivery_pincode", "pickup_city",
+                    "delivery_city", "status", "priority", "created_at",
+                    "delivery_date", "item_description", "user_email",
+                    "pickup_address", "delivery_address", "updated_at"
+                ]
+            }
+            changes["available"].append(available if can_accept else hide_available_contact(available))
+        else:
+            # Taken by another company, cancelled, released from this one,
+            # or not shown while the subscription is inactive
+            changes["removed"].append({"name": row.name, "status": row.status, "updated_at": str(row.updated_at)})
+    
+    changes["removed"].extend(removed)
+    
+    return {
+        "success": True,
+        "delta": True,
+        "subscription_info": {
+            "plan": subscription_plan,
+            "active": active,
+            "limit": plan_limit,
+            "remaining": safe_get_dict_value(limit_check, "remaining", 0),
+            "reason": safe_get_dict_value(subscription_check, "reason")
+        },
+        "changes": changes,
+        "count": len(rows) + len(removed),
+        "sync": sync
+    }
+
+
 # MODIFIED get_manager_requests with statistics
 @frappe.whitelist(allow_guest=True)
-def get_manager_requests():
-    """Get requests for manager's company with subscription limits and statistics"""
+def get_manager_requests(since=None, page_size=None):
+    """
+    Get requests for manager's company with subscription limits and statistics
+    
+    Pass the sync.next_since token from the previous response as `since` to
+    receive only the requests that changed after it (see get_manager_request_changes).
+    """
     try:
+        data = get_json_data()
+        since = since or data.get("since")
+        # Taken before reading so changes made while we read are in the next delta
+        sync_watermark = get_sync_watermark()
+        
         user_info = get_user_from_token()
         if safe_get_dict_value(user_info, "role") != "Logistics Manager":
             return {"success": False, "message": "Only Logistics Managers can access this"}
@@ -501,8 +839,7 @@ def get_manager_requests():
         companies = frappe.get_all(
             "Logistics Company",
             filters={"manager_email": safe_get_dict_value(user_info, "email")},
-            fields=["company_name", "subscription_plan", "requests_viewed_this_month", 
-                   "pincode", "is_active", "subscription_end_date"]
+            fields=COMPANY_QUOTA_FIELDS
         )
         
         if not companies:
@@ -513,7 +850,17 @@ def get_manager_requests():
         subscription_plan = safe_get_dict_value(company, "subscription_plan", "Basic")
         pincode = safe_get_dict_value(company, "pincode")
         
-        subscription_check = check_subscription_active(company_name)
+        # Plan, subscription and usage come from the quota hash; usage in the
+        # company row lags behind until the next flush
+        quota_company = view_quota.get_quota_company(company_name) or company
+        subscription_check = evaluate_subscription(quota_company)
+        limit_check = evaluate_view_limit(quota_company, subscription_check)
+        
+        if since:
+            return get_manager_request_changes(
+                company, since, page_size or data.get("page_size"),
+                subscription_check=subscription_check, limit_check=limit_check
+            )
         
         # 🆕 CALCULATE STATISTICS
         request_stats = calculate_request_statistics(company_name)
@@ -535,6 +882,8 @@ def get_manager_requests():
                 ],
                 order_by="created_at desc"
             )
+            for req in all_available_requests:
+                hide_available_contact(req)
             
             return {
                 "success": False,
@@ -559,7 +908,6 @@ def get_manager_requests():
                 }
             }
         
-        limit_check = check_view_limit(company_name)
         plan_limit = safe_get_dict_value(limit_check, "limit", 10)
         
         # Get all ASSIGNED requests
@@ -580,29 +928,29 @@ def get_manager_requests():
         visible_requests = []
         blurred_requests = []
         
-        # Split assigned requests into visible and blurred based on plan limit
+        # Split assigned requests into visible and blurred based on plan limit.
+        # Only live assignments count (as in reconcile_over_limit_requests);
+        # In Progress, Completed and Cancelled jobs always stay visible
         if plan_limit == -1:
             visible_requests = all_assigned_requests
         else:
-            visible_requests = all_assigned_requests[:plan_limit]
-            blurred_requests_temp = all_assigned_requests[plan_limit:]
+            blurred_requests_temp = []
+            live_count = 0
+            for req in all_assigned_requests:
+                if req.status in LIVE_ASSIGNMENT_STATUSES:
+                    live_count += 1
+                    if live_count > plan_limit:
+                        blurred_requests_temp.append(req)
+                        continue
+                visible_requests.append(req)
+            
+            # Blur requests that exceed the limit; releasing them back to the
+            # pool is a write, so it runs in the background, not on this read
+            if blurred_requests_temp:
+                enqueue_over_limit_reconciliation(company_name, after_commit=False)
             
-            # Unassign and blur requests that exceed the limit
             for req in blurred_requests_temp:
-                unassign_request_from_company(req["name"], original_company=company_name)
-                
-                req["is_blurred"] = True
-                req["blur_reason"] = f"Request limit exceeded. Upgrade to {('Premium' if subscription_plan == 'Standard' else 'Standard or Premium')} to reclaim."
-                req["item_description"] = "*** BLURRED - Upgrade Plan ***"
-                req["user_email"] = "*** HIDDEN ***"
-                req["user_name"] = "*** HIDDEN ***"
-                req["user_phone"] = "*** HIDDEN ***"
-                req["pickup_address"] = "*** HIDDEN ***"
-                req["delivery_address"] = "*** HIDDEN ***"
-                req["special_instructions"] = "*** HIDDEN ***"
-                req["company_name"] = None
-                
-                blurred_requests.append(req)
+                blurred_requests.append(blur_over_limit_request(req, subscription_plan))
         
         # Add requests that were created for this company but couldn't be assigned
         has_tracking_field = frappe.db.has_column("Logistics Request", "previously_assigned_to")
@@ -656,8 +1004,8 @@ def get_manager_requests():
                 "name", "pickup_pincode", "delivery_pincode", "pickup_city",
                 "delivery_city", "status", "priority", "created_at",
                 "delivery_date", "item_description", "user_email",
-                "pickup_address", "delivery_address"
-            ],
+                "pickup_address", "delivery_address", "assigned_date"
+            ] + (["previously_assigned_to"] if has_tracking_field else []),
             order_by="created_at desc"
         )
         
@@ -670,9 +1018,8 @@ def get_manager_requests():
                 if req["name"] in blurred_request_ids:
                     continue
                 
-                req_doc = frappe.get_doc("Logistics Request", req["name"])
-                prev_assigned = getattr(req_doc, 'previously_assigned_to', None)
-                assigned_date = getattr(req_doc, 'assigned_date', None)
+                prev_assigned = req.pop("previously_assigned_to", None)
+                assigned_date = req.pop("assigned_date", None)
                 
                 if prev_assigned == company_name and assigned_date:
                     reclaimable_requests.append(req)
@@ -680,10 +1027,14 @@ def get_manager_requests():
                     other_available_requests.append(req)
         else:
             for req in all_available_requests:
+                req.pop("assigned_date", None)
                 if req["name"] not in blurred_request_ids:
                     other_available_requests.append(req)
         
         all_available = other_available_requests + reclaimable_requests
+        if not safe_get_dict_value(limit_check, "allowed", False):
+            for req in all_available:
+                hide_available_contact(req)
         
         return {
             "success": True,
@@ -717,7 +1068,8 @@ def get_manager_requests():
                 "data": reclaimable_requests,
                 "message": f"🎯 {len(reclaimable_requests)} of your previous requests are still available! You can reclaim them if you have capacity." if reclaimable_requests else None,
                 "can_reclaim": safe_get_dict_value(limit_check, "remaining", 0) > 0
-            }
+            },
+            "sync": {"next_since": get_sync_token(sync_watermark)}
         }
     except frappe.AuthenticationError as e:
         return {"success": False, "message": str(e)}
@@ -867,6 +1219,9 @@ def get_manager_requests():
 @frappe.whitelist(allow_guest=True)
 def accept_available_request():
     """Manager accepts an available request - SQL VERSION"""
+    company_name = None
+    quota_held = False
+    
     try:
         # Authentication
         user_info = get_user_from_token()
@@ -895,7 +1250,7 @@ def accept_available_request():
         companies = frappe.get_all(
             "Logistics Company",
             filters={"manager_email": user_email},
-            fields=["company_name", "subscription_plan", "requests_viewed_this_month", "pincode", "is_active"]
+            fields=COMPANY_QUOTA_FIELDS
         )
         
         if not companies:
@@ -909,7 +1264,8 @@ def accept_available_request():
             return {"success": False, "message": "Invalid company data"}
         
         # Check subscription
-        subscription_check = check_subscription_active(company_name)
+        limit_check = evaluate_view_limit(view_quota.get_quota_company(company_name) or company_data)
+        subscription_check = limit_check["subscription_status"]
         if not subscription_check.get("active", False):
             return {
                 "success": False,
@@ -917,11 +1273,8 @@ def accept_available_request():
                 "subscription_expired": True
             }
         
-        # Check request exists
-        if not frappe.db.exists("Logistics Request", request_id):
-            return {"success": False, "message": "Request not found"}
-        
-        # Get request info using SQL
+        # Read once for validation messages; the conditional UPDATEs below are
+        # what actually guard against concurrent accepts
         request_info = frappe.db.get_value(
             "Logistics Request",
             request_id,
@@ -942,15 +1295,17 @@ def accept_available_request():
         if request_info.get("company_name"):
             return {"success": False, "message": "Request already assigned"}
         
-        # Check subscription limit
-        limit_check = check_view_limit(company_name)
-        if not limit_check.get("allowed", False):
-            was_previously_theirs = request_info.get("previously_assigned_to") == company_name
-            
+        plan_limit = limit_check.get("limit", 0)
+        was_reclaimed = request_info.get("previously_assigned_to") == company_name
+        
+        # Take quota first (atomic in Redis) so a company at its limit never
+        # touches the request row
+        used = view_quota.consume_quota(company_name)
+        if used is None:
             message = (
                 f"You still don't have capacity. Upgrade to reclaim."
-                if was_previously_theirs
-                else f"Plan limit reached ({limit_check.get('limit', 0)} requests/month). Upgrade to accept more."
+                if was_reclaimed
+                else f"Plan limit reached ({plan_limit} requests/month). Upgrade to accept more."
             )
             
             return {
@@ -958,42 +1313,18 @@ def accept_available_request():
                 "message": message,
                 "limit_exceeded": True
             }
-        
-        # UPDATE REQUEST USING SQL (Bypasses versioning)
-        now = datetime.now()
-        
-        update_values = {
-            "company_name": company_name,
-            "status": "Assigned",
-            "assigned_date": now,
-            "updated_at": now,
-            "previously_assigned_to": None
-        }
-        
-        if estimated_cost:
-            try:
-                update_values["estimated_cost"] = float(estimated_cost)
-            except:
-                pass
-        
-        # Build SQL update
-        set_clause = ", ".join([f"`{k}` = %({k})s" for k in update_values.keys()])
-        
-        frappe.db.sql(f"""
-            UPDATE `tabLogistics Request`
-            SET {set_clause}
-            WHERE name = %(request_id)s
-        """, {**update_values, "request_id": request_id})
-        
-        # Increment view count
-        increment_view_count(company_name)
+        quota_held = True
+        
+        now = claim_pending_request(request_id, company_name, company_pincode, estimated_cost)
+        if not now:
+            # Someone else accepted it between our read and the UPDATE
+            frappe.db.rollback()
+            quota_held = False
+            view_quota.release_quota(company_name)
+            return {"success": False, "message": "Request already assigned"}
         
         frappe.db.commit()
-        
-        # Get updated usage
-        updated_limit_check = check_view_limit(company_name)
-        
-        was_reclaimed = request_info.get("previously_assigned_to") == company_name
+        quota_held = False
         
         return {
             "success": True,
@@ -1005,14 +1336,20 @@ def accept_available_request():
                 "assigned_date": str(now)
             },
             "updated_usage": {
-                "used": updated_limit_check.get('viewed', 0),
-                "limit": updated_limit_check.get('limit', 0),
-                "remaining": updated_limit_check.get('remaining', 0)
+                "used": used if plan_limit != -1 else 0,
+                "limit": plan_limit,
+                "remaining": max(0, plan_limit - used) if plan_limit != -1 else -1
             }
         }
         
     except Exception as e:
         frappe.db.rollback()
+        if company_name and quota_held:
+            # The claim was rolled back; so is the view it consumed
+            try:
+                view_quota.release_quota(company_name)
+            except Exception as release_error:
+                frappe.log_error(f"Accept request quota release error: {str(release_error)}")
         return {"success": False, "message": f"Failed: {str(e)[:100]}"}
 
 @frappe.whitelist(allow_guest=True)
@@ -1070,25 +1407,16 @@ def bulk_reclaim_requests():
         failed_count = 0
         
         for req in previously_theirs:
-            try:
-                request_doc = frappe.get_doc("Logistics Request", req["name"])
-                
-                if getattr(request_doc, 'status', None) != "Pending" or getattr(request_doc, 'company_name', None):
-                    failed_count += 1
-                    continue
-                
-                request_doc.company_name = company_name
-                request_doc.status = "Assigned"
-                request_doc.assigned_date = datetime.now()
-                if hasattr(request_doc, 'previously_assigned_to'):
-                    request_doc.previously_assigned_to = None
-                request_doc.save(ignore_permissions=True)
-                
-                increment_view_count(company_name)
+            if view_quota.consume_quota(company_name) is None:
+                # Quota ran out (e.g. a concurrent accept); leave the rest pending
+                failed_count += len(previously_theirs) - reclaimed_count - failed_count
+                break
+            
+            if claim_pending_request(req["name"], company_name):
                 reclaimed_count += 1
-                
-            except Exception as e:
-                frappe.log_error(f"Reclaim error for {req['name']}: {str(e)}")
+            else:
+                # Taken by another company meanwhile; give the quota back
+                view_quota.release_quota(company_name)
                 failed_count += 1
         
         frappe.db.commit()
@@ -1106,6 +1434,244 @@ def bulk_reclaim_requests():
         frappe.db.rollback()
         return {"success": False, "message": str(e)}
 
+# Batch Accept / Decline
+BATCH_RESPONSE_LIMIT = 100
+
+@frappe.whitelist(allow_guest=True)
+def batch_respond_to_requests():
+    """
+    Accept and/or decline several requests in one call (Logistics Manager)
+    
+    Body:
+    {
+        "accept": ["REQ-001", {"request_id": "REQ-002", "estimated_cost": 450}],
+        "decline": ["REQ-003"]
+    }
+    
+    Accepts are a single compare-and-set UPDATE over the requested IDs, limited to
+    the quota reserved up front, so concurrent managers can never both win a
+    request. Declines release Assigned requests back to the pincode pool and
+    return their quota. Everything commits together; each ID gets its own outcome.
+    If anything fails before the commit, the quota reserved for accepts is
+    handed back along with the rollback.
+    """
+    company_name = None
+    held_quota = 0
+    
+    try:
+        user_info = get_user_from_token()
+        if safe_get_dict_value(user_info, "role") != "Logistics Manager":
+            return {"success": False, "message": "Only Logistics Managers can respond to requests"}
+        
+        data = get_json_data()
+        
+        accept_costs = {}
+        for item in data.get("accept") or []:
+            if isinstance(item, dict):
+                if item.get("request_id"):
+                    accept_costs[item["request_id"]] = item.get("estimated_cost")
+            elif item:
+                accept_costs[str(item)] = None
+        
+        decline_ids = list(dict.fromkeys(str(i) for i in (data.get("decline") or []) if i))
+        decline_ids = [i for i in decline_ids if i not in accept_costs]
+        accept_ids = list(accept_costs)
+        
+        if not accept_ids and not decline_ids:
+            return {"success": False, "message": "Provide request IDs to accept or decline"}
+        
+        if len(accept_ids) + len(decline_ids) > BATCH_RESPONSE_LIMIT:
+            return {"success": False, "message": f"At most {BATCH_RESPONSE_LIMIT} requests per batch"}
+        
+        companies = frappe.get_all(
+            "Logistics Company",
+            filters={"manager_email": safe_get_dict_value(user_info, "email")},
+            fields=COMPANY_QUOTA_FIELDS
+        )
+        if not companies:
+            return {"success": False, "message": "No company found for this manager"}
+        
+        company = companies[0]
+        company_name = company.company_name
+        now = datetime.now()
+        outcomes = {}
+        
+        # ---- Accept ----
+        if accept_ids:
+            limit_check = evaluate_view_limit(view_quota.get_quota_company(company_name) or company)
+            if not limit_check["subscription_status"].get("active", False):
+                return {
+                    "success": False,
+                    "message": limit_check["subscription_status"].get("message", "Subscription issue"),
+                    "subscription_expired": True
+                }
+            
+            # Reserve quota once for as many as the plan still allows
+            reserved = len(accept_ids) if limit_check["limit"] == -1 else min(len(accept_ids), limit_check["remaining"])
+            while reserved > 0 and view_quota.consume_quota(company_name, reserved) is None:
+                # Another accept took some quota meanwhile; retry with what is left
+                quota = view_quota.load_quota(company_name) or {"limit": 0, "used": 0}
+                reserved = min(reserved - 1, quota["limit"] - quota["used"])
+            held_quota = max(reserved, 0)
+            
+            claimed = set()
+            if reserved > 0:
+                values = {
+                    "company_name": company_name,
+                    "pincode": company.pincode,
+                    "now": now,
+                    "names": tuple(accept_ids),
+                    "limit": reserved
+                }
+                
+                cost_clause = ""
+                costs = {}
+                for request_id, cost in accept_costs.items():
+                    try:
+                        if cost:
+                            costs[request_id] = float(cost)
+                    except (ValueError, TypeError):
+                        pass
+                
+                if costs:
+                    cases = []
+                    for i, (request_id, cost) in enumerate(costs.items()):
+                        values[f"cost_name_{i}"] = request_id
+                        values[f"cost_{i}"] = cost
+                        cases.append(f"WHEN %(cost_name_{i})s THEN %(cost_{i})s")
+                    cost_clause = f", estimated_cost = CASE name {' '.join(cases)} ELSE estimated_cost END"
+                
+                # Cleared by the claim below; tombstoned for the requests we get
+                previous_owners = get_request_owners(accept_ids)
+                
+                frappe.db.sql(f"""
+                    UPDATE `tabLogistics Request`
+                    SET company_name = %(company_name)s,
+                        status = 'Assigned',
+                        assigned_date = %(now)s,
+                        updated_at = %(now)s,
+                        previously_assigned_to = NULL{cost_clause}
+                    WHERE name IN %(names)s
+                    AND status = 'Pending'
+                    AND (company_name IS NULL OR company_name = '')
+                    AND pickup_pincode = %(pincode)s
+                    ORDER BY created_at ASC
+                    LIMIT %(limit)s
+                """, values)
+            
+            current = {
+                row.name: row for row in frappe.db.sql("""
+                    SELECT name, status, company_name, pickup_pincode, assigned_date
+                    FROM `tabLogistics Request`
+                    WHERE name IN %(names)s
+                """, {"names": tuple(accept_ids)}, as_dict=True)
+            }
+            
+            for request_id in accept_ids:
+                row = current.get(request_id)
+                if not row:
+                    outcomes[request_id] = {"action": "accept", "success": False, "reason": "not_found"}
+                elif row.company_name == company_name and row.assigned_date == now:
+                    claimed.add(request_id)
+                    outcomes[request_id] = {"action": "accept", "success": True, "status": "Assigned"}
+                elif row.company_name:
+                    reason = "already_yours" if row.company_name == company_name else "already_assigned"
+                    outcomes[request_id] = {"action": "accept", "success": False, "reason": reason}
+                elif row.pickup_pincode != company.pincode:
+                    outcomes[request_id] = {"action": "accept", "success": False, "reason": "not_in_service_area"}
+                elif row.status != "Pending":
+                    outcomes[request_id] = {"action": "accept", "success": False, "reason": "not_pending", "status": row.status}
+                else:
+                    outcomes[request_id] = {"action": "accept", "success": False, "reason": "limit_exceeded"}
+            
+            if claimed:
+                record_request_exits(
+                    ((name, owner) for name, owner in previous_owners.items()
+                     if name in claimed and owner != company_name),
+                    removed_at=now
+                )
+            
+            # Hand back quota reserved for requests we did not get
+            if reserved > len(claimed):
+                view_quota.release_quota(company_name, reserved - len(claimed))
+            held_quota = len(claimed)
+        
+        # ---- Decline ----
+        if decline_ids:
+            previous_owners = get_request_owners(decline_ids)
+            
+            frappe.db.sql("""
+                UPDATE `tabLogistics Request`
+                SET company_name = NULL,
+                    status = 'Pending',
+                    assigned_date = NULL,
+                    previously_assigned_to = NULL,
+                    updated_at = %(now)s
+                WHERE name IN %(names)s
+                AND company_name = %(company_name)s
+                AND status = 'Assigned'
+            """, {"names": tuple(decline_ids), "company_name": company_name, "now": now})
+            
+            current = {
+                row.name: row for row in frappe.db.sql("""
+                    SELECT name, status, company_name, updated_at
+                    FROM `tabLogistics Request`
+                    WHERE name IN %(names)s
+                """, {"names": tuple(decline_ids)}, as_dict=True)
+            }
+            
+            for request_id in decline_ids:
+                row = current.get(request_id)
+                if not row:
+                    outcomes[request_id] = {"action": "decline", "success": False, "reason": "not_found"}
+                elif not row.company_name and row.status == "Pending" and row.updated_at == now:
+                    outcomes[request_id] = {"action": "decline", "success": True, "status": "Pending"}
+                    # Back in the pool: this company (unless it serves the pincode) and
+                    # the cleared previous owner no longer see it
+                    record_request_exits(
+                        [(request_id, company_name), (request_id, previous_owners.get(request_id))],
+                        removed_at=now
+                    )
+                elif row.company_name != company_name:
+                    outcomes[request_id] = {"action": "decline", "success": False, "reason": "not_assigned_to_you"}
+                else:
+                    outcomes[request_id] = {"action": "decline", "success": False, "reason": "not_declinable", "status": row.status}
+        
+        frappe.db.commit()
+        held_quota = 0
+        clear_request_statistics(company_name)
+        
+        # Declined requests return their views only once the release is committed
+        declined = sum(1 for o in outcomes.values() if o["success"] and o["action"] == "decline")
+        if declined:
+            view_quota.release_quota(company_name, declined)
+        
+        succeeded = sum(1 for o in outcomes.values() if o["success"])
+        
+        return {
+            "success": True,
+            "message": f"{succeeded} of {len(outcomes)} requests processed",
+            "results": [dict(request_id=request_id, **outcome) for request_id, outcome in outcomes.items()],
+            "summary": {
+                "accepted": sum(1 for o in outcomes.values() if o["success"] and o["action"] == "accept"),
+                "declined": sum(1 for o in outcomes.values() if o["success"] and o["action"] == "decline"),
+                "failed": len(outcomes) - succeeded
+            }
+        }
+        
+    except frappe.AuthenticationError as e:
+        return {"success": False, "message": str(e)}
+    except Exception as e:
+        frappe.db.rollback()
+        if company_name and held_quota:
+            # The accepts were rolled back; so is the quota they consumed
+            try:
+                view_quota.release_quota(company_name, held_quota)
+            except Exception as release_error:
+                frappe.log_error(f"Batch respond quota release error: {str(release_error)}")
+        frappe.log_error(f"Batch Respond To Requests Error: {str(e)}")
+        return {"success": False, "message": f"Failed to process batch: {str(e)[:100]}"}
+
 # View Request Detail
 @frappe.whitelist(allow_guest=True)
 def get_request_detail():
@@ -1219,10 +1785,10 @@ def update_request_status():
         if not (is_admin or is_manager):
             return {"success": False, "message": "You don't have permission to update this request"}
         
-        # Validate status
-        valid_statuses = ["Pending", "Assigned", "Accepted", "In Progress", "Completed", "Cancelled", "Rejected"]
-        if status not in valid_statuses:
-            return {"success": False, "message": f"Invalid status: {status}"}
+        # Validate status move against the request state machine
+        transition_error = get_status_transition_error(request_info.get("status"), status)
+        if transition_error:
+            return {"success": False, "message": transition_error}
         
         # CRITICAL FIX: Use direct SQL update to bypass versioning
         update_dict = {
@@ -1255,6 +1821,7 @@ def update_request_status():
         
         frappe.db.sql(sql, update_dict)
         frappe.db.commit()
+        clear_request_statistics(company_name)
         
         return {
             "success": True,
@@ -1274,6 +1841,171 @@ def update_request_status():
         frappe.db.rollback()
         return {"success": False, "message": error_msg[:100]}
     
+# Bulk Update Request Status
+BULK_STATUS_LIMIT = 100
+
+@frappe.whitelist(allow_guest=True)
+def bulk_update_request_status():
+    """
+    Move several requests to one status (Manager/Admin), e.g. mark today's jobs In Progress
+    
+    Body: {"request_ids": ["REQ-001", "REQ-002"], "status": "Completed"}
+    
+    Transitions are checked in memory against the request state machine and the
+    valid ones are written in a single UPDATE. The UPDATE is guarded on the
+    statuses allowed into the target, so a request that changed meanwhile is
+    reported instead of being moved.
+    
+    Moving to Pending unassigns the request (as unassign_request_from_company
+    does) and cancelling returns the company's view quota (as cancel_request does).
+    """
+    try:
+        user_info = get_user_from_token()
+        user_role = safe_get_dict_value(user_info, "role")
+        user_email = safe_get_dict_value(user_info, "email")
+        
+        if user_role not in ("Admin", "Logistics Manager"):
+            return {"success": False, "message": "You don't have permission to update requests"}
+        
+        data = get_json_data()
+        status = data.get("status")
+        request_ids = list(dict.fromkeys(str(i) for i in (data.get("request_ids") or []) if i))
+        
+        if not request_ids:
+            return {"success": False, "message": "Missing request_ids"}
+        if not status:
+            return {"success": False, "message": "Missing status"}
+        if len(request_ids) > BULK_STATUS_LIMIT:
+            return {"success": False, "message": f"At most {BULK_STATUS_LIMIT} requests per update"}
+        
+        manager_company = None
+        if user_role == "Logistics Manager":
+            companies = frappe.get_all(
+                "Logistics Company",
+                filters={"manager_email": user_email},
+                fields=COMPANY_QUOTA_FIELDS
+            )
+            if not companies:
+                return {"success": False, "message": "No company found for this manager"}
+            
+            manager_company = companies[0]
+            subscription_check = evaluate_subscription(
+                view_quota.get_quota_company(manager_company.company_name) or manager_company
+            )
+            if not subscription_check.get("active", False):
+                return {
+                    "success": False,
+                    "message": subscription_check.get("message", "Subscription inactive"),
+                    "subscription_expired": True
+                }
+        
+        current = {
+            row.name: row for row in frappe.db.sql("""
+                SELECT name, status, company_name, previously_assigned_to
+                FROM `tabLogistics Request`
+                WHERE name IN %(names)s
+            """, {"names": tuple(request_ids)}, as_dict=True)
+        }
+        
+        results = {}
+        to_update = []
+        for request_id in request_ids:
+            row = current.get(request_id)
+            if not row:
+                results[request_id] = {"success": False, "message": "Request not found"}
+            elif manager_company and row.company_name != manager_company.company_name:
+                results[request_id] = {"success": False, "message": "Request is not assigned to your company"}
+            else:
+                error = get_status_transition_error(row.status, status)
+                if error:
+                    results[request_id] = {"success": False, "message": error, "status": row.status}
+                else:
+                    to_update.append(request_id)
+        
+        if to_update:
+            now = datetime.now()
+            
+            # Back to Pending means back in the pool, remembering who had it
+            unassign_sql = """
+                    previously_assigned_to = IF(company_name IS NULL OR company_name = '',
+                        previously_assigned_to, company_name),
+                    company_name = NULL,
+                    assigned_date = NULL,""" if status == "Pending" else ""
+            
+            frappe.db.sql(f"""
+                UPDATE `tabLogistics Request`
+                SET status = %(status)s,{unassign_sql}
+                    updated_at = %(now)s,
+                    completed_at = CASE
+                        WHEN %(status)s = 'Completed' AND completed_at IS NULL THEN %(now)s
+                        ELSE completed_at
+                    END
+                WHERE name IN %(names)s
+                AND status IN %(from_statuses)s
+            """, {
+                "status": status,
+                "now": now,
+                "names": tuple(to_update),
+                "from_statuses": tuple(get_statuses_allowed_into(status))
+            })
+            
+            if frappe.db._cursor.rowcount == len(to_update):
+                updated = set(to_update)
+            else:
+                # Something moved under us; see which rows carry our write
+                updated = set(frappe.get_all(
+                    "Logistics Request",
+                    filters={"name": ["in", to_update], "status": status, "updated_at": now},
+                    pluck="name"
+                ))
+            
+            for request_id in to_update:
+                if request_id in updated:
+                    results[request_id] = {"success": True, "status": status}
+                else:
+                    results[request_id] = {"success": False, "message": "Request status changed, please refresh"}
+            
+            if status == "Pending":
+                # The assigned company becomes previously_assigned_to; the one before it drops out
+                record_request_exits(
+                    ((request_id, current[request_id].previously_assigned_to) for request_id in updated
+                     if current[request_id].company_name
+                     and current[request_id].previously_assigned_to != current[request_id].company_name),
+                    removed_at=now
+                )
+            
+            frappe.db.commit()
+            clear_request_statistics(*{current[r].company_name for r in updated})
+            
+            if status == "Cancelled":
+                released = {}
+                for request_id in updated:
+                    row = current[request_id]
+                    if row.company_name and row.status != "Cancelled":
+                        released[row.company_name] = released.get(row.company_name, 0) + 1
+                
+                for company_name, count in released.items():
+                    try:
+                        view_quota.release_quota(company_name, count)
+                    except Exception as e:
+                        frappe.log_error(f"Decrement view count error on bulk cancel: {str(e)}")
+        
+        updated_count = sum(1 for r in results.values() if r["success"])
+        
+        return {
+            "success": True,
+            "message": f"{updated_count} of {len(request_ids)} requests updated to {status}",
+            "results": [dict(request_id=request_id, **results[request_id]) for request_id in request_ids],
+            "summary": {"updated": updated_count, "failed": len(request_ids) - updated_count}
+        }
+        
+    except frappe.AuthenticationError as e:
+        return {"success": False, "message": str(e)}
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(f"Bulk Update Request Status Error: {str(e)}")
+        return {"success": False, "message": f"Failed to update requests: {str(e)[:100]}"}
+
 # get_single_request_detail
 @frappe.whitelist(allow_guest=True)
 def get_single_request_detail():
@@ -1631,26 +2363,71 @@ def get_single_request_detail():
 
 # Get My Requests
 @frappe.whitelist(allow_guest=True)
-def get_my_requests():
-    """Get all requests of logged-in user"""
+def get_my_requests(since=None, page_size=None, include_archived=None):
+    """
+    Get all requests of logged-in user
+    
+    With `since` (sync.next_since from the previous response) only requests
+    changed after that point are returned, plus tombstones for deleted ones.
+    With `include_archived` the full list also carries archived (long-finished)
+    requests, flagged archived=1.
+    """
     try:
+        data = get_json_data()
+        since = since or data.get("since")
+        include_archived = wants_archived(include_archived or data.get("include_archived"))
+        sync_watermark = get_sync_watermark()
+        
         user_info = get_user_from_token()
+        user_email = safe_get_dict_value(user_info, "email")
         
-        requests = frappe.get_all(
-            "Logistics Request",
-            filters={"user_email": safe_get_dict_value(user_info, "email")},
-            fields=[
-                "name", "pickup_pincode", "delivery_pincode", "pickup_city",
-                "delivery_city", "item_description", "status", "priority",
-                "company_name", "estimated_cost", "actual_cost", "created_at",
-                "delivery_date",
-            ],
-            order_by="created_at desc",
-        )
+        fields = [
+            "name", "pickup_pincode", "delivery_pincode", "pickup_city",
+            "delivery_city", "item_description", "status", "priority",
+            "company_name", "estimated_cost", "actual_cost", "created_at",
+            "delivery_date",
+        ]
+        
+        if since:
+            rows, removed, sync = get_request_changes(
+                "user_email = %(user_email)s", {"user_email": user_email},
+                since, page_size or data.get("page_size")
+            )
+            changed = [{field: row.get(field) for field in fields + ["updated_at"]} for row in rows]
+            
+            return {
+                "success": True,
+                "delta": True,
+                "count": len(changed),
+                "data": changed,
+                "removed": removed,
+                "sync": sync
+            }
         
-        return {"success": True, "count": len(requests), "data": requests}
+        if include_archived:
+            source = requests_source(fields, where="user_email = %(user_email)s", include_archived=True)
+            requests = frappe.db.sql(f"""
+                SELECT * FROM {source}
+                ORDER BY created_at DESC
+            """, {"user_email": user_email}, as_dict=True)
+        else:
+            requests = frappe.get_all(
+                "Logistics Request",
+                filters={"user_email": user_email},
+                fields=fields,
+                order_by="created_at desc",
+            )
+        
+        return {
+            "success": True,
+            "count": len(requests),
+            "data": requests,
+            "sync": {"next_since": get_sync_token(sync_watermark)}
+        }
     except frappe.AuthenticationError as e:
         return {"success": False, "message": str(e)}
+    except frappe.ValidationError as e:
+        return {"success": False, "message": str(e)}
     except Exception as e:
         frappe.log_error(f"Get My Requests Error: {str(e)}")
         return {"success": False, "message": "Failed to fetch requests"}
@@ -1706,7 +2483,13 @@ def assign_request_to_company():
         
         request_doc.save(ignore_permissions=True)
         
-        increment_view_count(company_name)
+        if view_quota.consume_quota(company_name) is None:
+            frappe.db.rollback()
+            return {
+                "success": False,
+                "message": f"{company_name} has reached their plan limit. They need to upgrade.",
+                "limit_info": check_view_limit(company_name)
+            }
         
         frappe.db.commit()
         
@@ -1749,10 +2532,7 @@ def cancel_request():
         
         if getattr(request_doc, 'company_name', None):
             try:
-                company = frappe.get_doc("Logistics Company", getattr(request_doc, 'company_name'))
-                if getattr(company, 'requests_viewed_this_month', 0) > 0:
-                    company.requests_viewed_this_month = getattr(company, 'requests_viewed_this_month', 0) - 1
-                    company.save(ignore_permissions=True)
+                view_quota.release_quota(getattr(request_doc, 'company_name'))
             except Exception as e:
                 frappe.log_error(f"Decrement view count error on cancel: {str(e)}")
         
@@ -1773,6 +2553,75 @@ def cancel_request():
         frappe.db.rollback()
         return {"success": False, "message": f"Failed to cancel request: {str(e)}"}
 
+# Manager feed events
+MANAGER_FEED_EVENT = "manager_request_feed"
+
+def publish_new_request_event(request_doc):
+    """
+    Push a compact "new request" event to the companies serving its pickup pincode.
+    
+    Sent to each company manager's user room (user:<manager_email>). Managers
+    connect to socket.io with their JWT as `Authorization: Bearer <token>`;
+    the socket server resolves it through frappe.realtime.get_user_info,
+    which localmoves overrides (utils.overrides.get_socket_user_info) to
+    accept the JWT, and joins the socket to that room. The client keeps its
+    feed current from these deltas, falling back to get_manager_requests
+    only when it reconnects.
+    Call after commit: subscribers should never see a request that rolled back.
+    """
+    try:
+        payload = {
+            "event": "request_created",
+            "request_id": request_doc.name,
+            "status": request_doc.status,
+            "priority": getattr(request_doc, 'priority', None),
+            "pickup_pincode": request_doc.pickup_pincode,
+            "pickup_city": getattr(request_doc, 'pickup_city', None),
+            "delivery_pincode": getattr(request_doc, 'delivery_pincode', None),
+            "delivery_city": getattr(request_doc, 'delivery_city', None),
+            "delivery_date": str(request_doc.delivery_date) if getattr(request_doc, 'delivery_date', None) else None,
+            "created_at": str(getattr(request_doc, 'created_at', None) or datetime.now())
+        }
+        
+        assigned_to = getattr(request_doc, 'company_name', None)
+        requested_for = getattr(request_doc, 'previously_assigned_to', None)
+        
+        if assigned_to:
+            # Only the assigned company sees it; it is not in anyone's available list
+            recipients = [assigned_to]
+        else:
+            recipients = frappe.get_all(
+                "Logistics Company",
+                filters={"pincode": request_doc.pickup_pincode, "is_active": 1},
+                pluck="name"
+            )
+            if requested_for and requested_for not in recipients:
+                recipients.append(requested_for)
+        
+        managers = dict(frappe.get_all(
+            "Logistics Company",
+            filters={"name": ["in", recipients]},
+            fields=["name", "manager_email"],
+            as_list=True
+        )) if recipients else {}
+        
+        for company_name in recipients:
+            if not managers.get(company_name):
+                continue
+            
+            frappe.publish_realtime(
+                MANAGER_FEED_EVENT,
+                {
+                    **payload,
+                    "feed": "visible" if company_name == assigned_to else (
+                        "blurred" if company_name == requested_for else "available"
+                    )
+                },
+                user=managers[company_name]
+            )
+    except Exception as e:
+        frappe.log_error(f"Publish manager feed event error: {str(e)}")
+
 # Get Subscription Info for Manager
 @frappe.whitelist(allow_guest=True)
 def get_quick_subscription_info():
@@ -1809,10 +2658,10 @@ def get_quick_subscription_info():
                 "reason": safe_get_dict_value(subscription_check, "reason") if not safe_get_dict_value(subscription_check, "active", False) else None
             },
             "usage": {
-                "used": safe_get_dict_value(company, "requests_viewed_this_month", 0),
+                "used": safe_get_dict_value(limit_check, "viewed", 0),
                 "limit": safe_get_dict_value(limit_check, "limit", 10),
                 "remaining": safe_get_dict_value(limit_check, "remaining", 0),
-                "percentage": round((safe_get_dict_value(company, "requests_viewed_this_month", 0) / safe_get_dict_value(limit_check, "limit", 10) * 100), 2) if safe_get_dict_value(limit_check, "limit", 10) != -1 else 0
+                "percentage": round((safe_get_dict_value(limit_check, "viewed", 0) / safe_get_dict_value(limit_check, "limit", 10) * 100), 2) if safe_get_dict_value(limit_check, "limit", 10) not in (-1, 0) else 0
             }
         }
     except frappe.AuthenticationError as e:
@@ -1928,6 +2777,8 @@ def create_request():
             increment_view_count(final_company_name)
 
         frappe.db.commit()
+        
+        publish_new_request_event(request_doc)
 
         # 🔥 SEND CONFIRMATION EMAIL WITH ROUTE MAP
        
@@ -2412,6 +3263,8 @@ def create_request_with_detailed_pricing():
         
         frappe.db.commit()
         
+        publish_new_request_event(request_doc)
+        
         # Send confirmation email
         # try:
         #     send_request_confirmation_email(
@@ -2705,7 +3558,7 @@ def search_companies_with_detailed_pricing(pincode=None, request_data=None):
             
             # Add subscription info
             plan = company.get('subscription_plan', 'Free')
-            viewed = int(company.get('requests_viewed_this_month', 0) or 0)
+            viewed = view_quota.get_period_usage(company)
             from localmoves.api.company import PLAN_LIMITS
             limit = PLAN_LIMITS.get(plan, 5)
             
@@ -2742,7 +3595,7 @@ def check_company_can_view_requests(company):
     from localmoves.api.company import PLAN_LIMITS
     
     plan = company.get('subscription_plan', 'Free')
-    viewed_count = int(company.get('requests_viewed_this_month', 0) or 0)
+    viewed_count = view_quota.get_period_usage(company)
     limit = PLAN_LIMITS.get(plan, 5)
     
     if limit == -1:
@@ -14,10 +14,13 @@ from localmoves.api.request import (
     check_view_limit,
     increment_view_count,
     send_request_confirmation_email,
-    generate_item_description
+    generate_item_description,
+    publish_new_request_event,
+    clear_request_statistics
 )
 from localmoves.api.request_pricing import calculate_comprehensive_price
 from localmoves.api.company import search_companies_with_cost
+from localmoves.utils.daily_metrics import queue_metric_refresh
 
 
 # ==================== HELPER FUNCTIONS ====================
@@ -122,13 +125,18 @@ def create_payment_transaction(request_id, company_name, payment_amounts, user_i
 def update_request_with_payment(request_doc, payment_doc):
     """Link payment transaction to request"""
     try:
-        request_doc.db_set('payment_id', payment_doc.name, update_modified=False)
-        request_doc.db_set('payment_status', "Pending", update_modified=False)
-        request_doc.db_set('total_amount', payment_doc.total_amount, update_modified=False)
-        request_doc.db_set('deposit_paid', 0, update_modified=False)
-        request_doc.db_set('remaining_amount', payment_doc.total_amount, update_modified=False)
+        # updated_at moves with the payment fields so sync clients pick them up
+        request_doc.db_set({
+            'payment_id': payment_doc.name,
+            'payment_status': "Pending",
+            'total_amount': payment_doc.total_amount,
+            'deposit_paid': 0,
+            'remaining_amount': payment_doc.total_amount,
+            'updated_at': datetime.now()
+        }, update_modified=False)
        
         frappe.db.commit()
+        clear_request_statistics(request_doc.company_name)
        
     except Exception as e:
         print(f"Update Request with Payment Error: {str(e)}")
@@ -382,10 +390,14 @@ def create_request_with_payment():
                 payment_doc.db_set('gateway_response', json.dumps(gateway_response), update_modified=False)
            
             # Update request
-            request_doc.db_set('payment_status', "Deposit Paid", update_modified=False)
-            request_doc.db_set('deposit_paid', payment_doc.deposit_amount, update_modified=False)
-            request_doc.db_set('remaining_amount', payment_doc.remaining_amount, update_modified=False)
-            request_doc.db_set('payment_verified_at', datetime.now(), update_modified=False)
+            now = datetime.now()
+            request_doc.db_set({
+                'payment_status': "Deposit Paid",
+                'deposit_paid': payment_doc.deposit_amount,
+                'remaining_amount': payment_doc.remaining_amount,
+                'payment_verified_at': now,
+                'updated_at': now
+            }, update_modified=False)
         else:
             update_request_with_payment(request_doc, payment_doc)
        
@@ -394,6 +406,9 @@ def create_request_with_payment():
             increment_view_count(final_company_name)
        
         frappe.db.commit()
+        clear_request_statistics(request_doc.company_name)
+       
+        publish_new_request_event(request_doc)
        
         # Step 7: Send confirmation emails
         try:
@@ -527,12 +542,22 @@ def process_full_payment():
         payment_doc.db_set('fully_paid_at', datetime.now(), update_modified=False)
        
         # Update linked request
+        request_doc = None
         if payment_doc.request_id:
             request_doc = frappe.get_doc("Logistics Request", payment_doc.request_id)
-            request_doc.db_set('payment_status', "Fully Paid", update_modified=False)
-            request_doc.db_set('remaining_amount', 0, update_modified=False)
+            request_doc.db_set({
+                'payment_status': "Fully Paid",
+                'remaining_amount': 0,
+                'updated_at': datetime.now()
+            }, update_modified=False)
+       
+        # db_set skips doc_events; the rollup day is the transaction's created_at,
+        # usually older than the hourly refresh window
+        queue_metric_refresh(payment_doc)
        
         frappe.db.commit()
+        if request_doc:
+            clear_request_statistics(request_doc.company_name)
        
         return {
             "success": True,
@@ -17,20 +17,44 @@ before_request = ["localmoves.utils.jwt_auth.validate_jwt_before_request"]
 # ✅ Scheduler
 scheduler_events = {
     "cron": {
-        "1 0 1 * *": [
-            "localmoves.api.request.reset_monthly_view_counts"
+        "*/5 * * * *": [
+            "localmoves.utils.view_quota.flush_view_quota_counts"
         ]
     },
+    "hourly": [
+        "localmoves.utils.daily_metrics.refresh_recent_daily_metrics",
+    ],
     "daily": [
         "localmoves.localmoves.doctype.payment.payment.check_subscription_expiry",
+        "localmoves.utils.request_archive.archive_finished_requests",
     ],
     "monthly": [
-        "localmoves.api.request.reset_monthly_view_counts",
         "localmoves.localmoves.doctype.payment.payment.auto_generate_monthly_invoices"
     ]
 }
 
 
+# ✅ Keep the Daily Metrics rollup in step with its source doctypes
+doc_events = {
+    "LocalMoves User": {
+        "on_update": "localmoves.utils.daily_metrics.queue_metric_refresh",
+        "on_trash": "localmoves.utils.daily_metrics.queue_metric_refresh"
+    },
+    "Payment": {
+        "on_update": "localmoves.utils.daily_metrics.queue_metric_refresh",
+        "on_trash": "localmoves.utils.daily_metrics.queue_metric_refresh"
+    },
+    "Payment Transaction": {
+        "on_update": "localmoves.utils.daily_metrics.queue_metric_refresh",
+        "on_trash": "localmoves.utils.daily_metrics.queue_metric_refresh"
+    },
+    "Logistics Request": {
+        "on_update": "localmoves.utils.daily_metrics.queue_metric_refresh",
+        "on_trash": "localmoves.utils.daily_metrics.queue_metric_refresh"
+    }
+}
+
+
 # ✅ CSRF bypass for REST APIs
 ignore_csrf_check_for = [
     "localmoves.api.auth.*",
@@ -147,6 +171,10 @@ override_whitelisted_methods = {
     "localmoves.api.payment.cancel_payment": "localmoves.api.payment.cancel_payment",
     "localmoves.api.payment.get_subscription_status": "localmoves.api.payment.get_subscription_status",
     "localmoves.api.payment.process_payment": "localmoves.api.payment.process_payment",
+
+
+    # Realtime: let JWT clients authenticate their socket.io connection
+    "frappe.realtime.get_user_info": "localmoves.utils.overrides.get_socket_user_info",
 }
 
 
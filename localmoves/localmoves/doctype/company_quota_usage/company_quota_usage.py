@@ -0,0 +1,15 @@
+import frappe
+from frappe.model.document import Document
+
+
+
+
+class CompanyQuotaUsage(Document):
+    pass
+
+
+
+
+def on_doctype_update():
+    """Period lookups for a company's usage history"""
+    frappe.db.add_index("Company Quota Usage", ["company", "period"])
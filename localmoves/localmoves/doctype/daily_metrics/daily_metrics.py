@@ -0,0 +1,15 @@
+import frappe
+from frappe.model.document import Document
+
+
+
+
+class DailyMetrics(Document):
+    pass
+
+
+
+
+def on_doctype_update():
+    """Range scans per metric for the admin charts"""
+    frappe.db.add_index("Daily Metrics", ["metric", "metric_date"])
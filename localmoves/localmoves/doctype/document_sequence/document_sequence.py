@@ -0,0 +1,8 @@
+import frappe
+from frappe.model.document import Document
+
+
+
+
+class DocumentSequence(Document):
+    pass
@@ -15,4 +15,10 @@ class LocalMovesUser(Document):
         if self.has_value_changed("password") and self.password:
             if not self.password.startswith("pbkdf2:sha256:"):
                 self.password = hash_password(self.password)
-                
\ No newline at end of file
+                
+
+
+def on_doctype_update():
+    """FULLTEXT index for admin search (see localmoves.utils.admin_search)"""
+    from localmoves.utils.admin_search import ensure_search_indexes
+    ensure_search_indexes("LocalMoves User")
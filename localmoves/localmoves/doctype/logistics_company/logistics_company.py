@@ -1,6 +1,7 @@
 import frappe
 from frappe.model.document import Document
 from datetime import datetime
+from functools import partial
 import json
 
 class LogisticsCompany(Document):
@@ -91,6 +92,7 @@ class LogisticsCompany(Document):
             frappe.throw("Invalid pincode format")
         
         self.pincode = pincode
+        self.outward_code, self.postcode_area = get_postcode_parts(pincode)
     
     def validate_pricing(self):
         """Ensure pricing fields are non-negative"""
@@ -302,12 +304,71 @@ class LogisticsCompany(Document):
             frappe.logger().info(
                 f"Company {self.company_name} subscription changed to {self.subscription_plan}"
             )
+            
+            # A downgrade can leave more assigned requests than the new plan
+            # allows; release the excess outside this transaction
+            from localmoves.api.request import enqueue_over_limit_reconciliation
+            enqueue_over_limit_reconciliation(self.name)
+        
+        # Keep the Redis view quota in step with plan and usage changes, once
+        # the save is committed: a rolled-back save must not touch the live quota
+        from localmoves.utils import view_quota
+        if any(self.has_value_changed(f) for f in ('subscription_plan', 'is_active', 'subscription_end_date')):
+            frappe.db.after_commit.add(partial(view_quota.refresh_quota_plan, frappe._dict(
+                name=self.name,
+                subscription_plan=self.subscription_plan,
+                is_active=self.is_active,
+                subscription_end_date=self.subscription_end_date
+            )))
+        
+        if self.has_value_changed('requests_viewed_this_month'):
+            frappe.db.after_commit.add(partial(
+                view_quota.reset_quota_usage, self.name, self.requests_viewed_this_month
+            ))
     
     def on_trash(self):
         """Before delete hook"""
         frappe.logger().info(f"Company {self.company_name} is being deleted")
 
 
+def get_postcode_parts(pincode):
+    """
+    Split a UK postcode into (outward_code, postcode_area).
+    
+    "SW1A 1AA" -> ("SW1A", "SW"). The inward code is always three characters,
+    so postcodes without a space are split three characters from the end.
+    """
+    pincode = str(pincode or "").strip().upper()
+    if not pincode:
+        return None, None
+    
+    if " " in pincode:
+        outward_code = pincode.split()[0]
+    else:
+        outward_code = pincode[:-3] if len(pincode) > 4 else pincode
+    
+    postcode_area = ""
+    for char in outward_code:
+        if not char.isalpha():
+            break
+        postcode_area += char
+    
+    return outward_code, postcode_area or None
+
+
+def on_doctype_update():
+    """Composite indexes for the top-rated leaderboard (global, per region, per outward code)"""
+    frappe.db.add_index("Logistics Company", ["is_active", "bayesian_score"])
+    frappe.db.add_index("Logistics Company", ["is_active", "postcode_area", "bayesian_score"])
+    frappe.db.add_index("Logistics Company", ["is_active", "outward_code", "bayesian_score"])
+    
+    from localmoves.utils.query_indexes import ensure_hot_query_indexes
+    ensure_hot_query_indexes("Logistics Company")
+    
+    from localmoves.utils.admin_search import ensure_search_indexes
+    ensure_search_indexes("Logistics Company")
+
+
 # ==================== Scheduled Task ====================
 
 def reset_all_monthly_counters():
@@ -2,6 +2,43 @@ import frappe
 from frappe.model.document import Document
 from datetime import datetime
 
+
+REQUEST_STATUSES = ("Pending", "Assigned", "Accepted", "In Progress", "Completed", "Cancelled", "Rejected")
+
+# Allowed status moves; anything not listed (other than staying put) is rejected.
+# Completed is final and Cancelled can only be reopened as Pending; every other
+# move stays open for admin corrections and the manager flow.
+STATUS_TRANSITIONS = {
+    status: set(REQUEST_STATUSES) - {status} for status in REQUEST_STATUSES
+}
+STATUS_TRANSITIONS["Completed"] = set()
+STATUS_TRANSITIONS["Cancelled"] = {"Pending"}
+
+
+def get_status_transition_error(old_status, new_status):
+    """Return why old_status -> new_status is not allowed, or None if it is"""
+    if new_status not in STATUS_TRANSITIONS:
+        return f"Invalid status: {new_status}"
+    
+    if not old_status or old_status == new_status:
+        return None
+    
+    if new_status in STATUS_TRANSITIONS.get(old_status, set()):
+        return None
+    
+    if old_status == "Completed":
+        return "Cannot change status from Completed to another status"
+    if old_status == "Cancelled":
+        return "Cannot change status from Cancelled (except back to Pending)"
+    
+    return f"Cannot change status from {old_status} to {new_status}"
+
+
+def get_statuses_allowed_into(new_status):
+    """Statuses a request may currently have to move to new_status"""
+    return {new_status} | {old for old, targets in STATUS_TRANSITIONS.items() if new_status in targets}
+
+
 class LogisticsRequest(Document):
     def before_insert(self):
         """Set initial timestamps"""
@@ -29,23 +66,62 @@ class LogisticsRequest(Document):
             self._validate_status_transition()
     
     def _validate_status_transition(self):
-        """Validate that status transitions are logical"""
-        # Get old status from database
-        if self.name and frappe.db.exists("Logistics Request", self.name):
-            old_doc = frappe.get_doc("Logistics Request", self.name)
-            old_status = old_doc.status
-            new_status = self.status
-            
-            # Cannot revert from Completed
-            if old_status == "Completed" and new_status != "Completed":
-                frappe.throw("Cannot change status from Completed to another status")
-            
-            # Cannot revert from Cancelled (except to Pending for admin corrections)
-            if old_status == "Cancelled" and new_status not in ["Cancelled", "Pending"]:
-                frappe.throw("Cannot change status from Cancelled (except back to Pending)")
+        """Validate the status move against STATUS_TRANSITIONS"""
+        # save() has already loaded the stored document; only fall back to one column
+        before = self.get_doc_before_save()
+        if before:
+            old_status = before.status
+        else:
+            old_status = frappe.db.get_value("Logistics Request", self.name, "status")
+        
+        error = get_status_transition_error(old_status, self.status)
+        if error:
+            frappe.throw(error)
+    
+    def on_update(self):
+        """Drop cached company statistics when status, owner or amounts change"""
+        before = self.get_doc_before_save()
+        if before:
+            self._record_company_exits(before)
+        
+        if before and not any(
+            self.has_value_changed(f)
+            for f in ("status", "company_name", "remaining_amount", "total_amount", "estimated_cost")
+        ):
+            return
+        
+        from localmoves.api.request import clear_request_statistics
+        clear_request_statistics(self.company_name, before.company_name if before else None)
+    
+    def _record_company_exits(self, before):
+        """Tombstone companies that no longer see the request after a reassignment"""
+        owners_before = {before.company_name, before.previously_assigned_to}
+        owners_now = {self.company_name, self.previously_assigned_to}
+        
+        lost = {owner for owner in owners_before - owners_now if owner}
+        if lost:
+            from localmoves.utils.request_tombstones import record_request_exits
+            record_request_exits(((self.name, owner) for owner in lost), removed_at=self.updated_at)
+    
+    def after_delete(self):
+        """Deleted requests drop out of the company's statistics and every delta sync"""
+        from localmoves.api.request import clear_request_statistics
+        clear_request_statistics(self.company_name)
+        
+        from localmoves.utils.request_tombstones import insert_tombstones
+        insert_tombstones([self.as_dict()], "Deleted")
     
     def on_trash(self):
         """Triggered before the document is deleted"""
         # Prevent deletion of completed requests
         if self.status == "Completed":
-            frappe.throw("Cannot delete completed requests. You can cancel them instead.")
\ No newline at end of file
+            frappe.throw("Cannot delete completed requests. You can cancel them instead.")
+
+
+def on_doctype_update():
+    """Hot request query indexes (localmoves.utils.query_indexes) and admin search FULLTEXT index"""
+    from localmoves.utils.query_indexes import ensure_hot_query_indexes
+    ensure_hot_query_indexes("Logistics Request")
+    
+    from localmoves.utils.admin_search import ensure_search_indexes
+    ensure_search_indexes("Logistics Request")
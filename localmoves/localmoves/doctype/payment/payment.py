@@ -2,6 +2,12 @@ import frappe
 from frappe.model.document import Document
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
+from localmoves.utils.document_sequence import next_number, reserve_numbers
+
+
+INVOICE_PREFIX = "INV"
+RECEIPT_PREFIX = "REC"
+
 
 class Payment(Document):
     def before_insert(self):
@@ -89,50 +95,12 @@ class Payment(Document):
                 frappe.log_error(f"Update company subscription error: {str(e)}")
     
     def generate_invoice_number(self):
-        """Generate unique invoice number"""
-        prefix = "INV"
-        year = datetime.now().strftime("%Y")
-        month = datetime.now().strftime("%m")
-        
-        # Get last invoice number for this month
-        last_invoice = frappe.db.sql("""
-            SELECT invoice_number 
-            FROM `tabPayment` 
-            WHERE invoice_number LIKE %s 
-            ORDER BY creation DESC 
-            LIMIT 1
-        """, f"{prefix}-{year}{month}-%")
-        
-        if last_invoice and last_invoice[0][0]:
-            last_num = int(last_invoice[0][0].split("-")[-1])
-            new_num = last_num + 1
-        else:
-            new_num = 1
-        
-        return f"{prefix}-{year}{month}-{new_num:04d}"
+        """Next invoice number for this month (INV-YYYYMM-NNNN)"""
+        return next_number(INVOICE_PREFIX, seed_from=("Payment", "invoice_number"))
     
     def generate_receipt_number(self):
-        """Generate unique receipt number"""
-        prefix = "REC"
-        year = datetime.now().strftime("%Y")
-        month = datetime.now().strftime("%m")
-        
-        # Get last receipt number for this month
-        last_receipt = frappe.db.sql("""
-            SELECT receipt_number 
-            FROM `tabPayment` 
-            WHERE receipt_number LIKE %s 
-            ORDER BY creation DESC 
-            LIMIT 1
-        """, f"{prefix}-{year}{month}-%")
-        
-        if last_receipt and last_receipt[0][0]:
-            last_num = int(last_receipt[0][0].split("-")[-1])
-            new_num = last_num + 1
-        else:
-            new_num = 1
-        
-        return f"{prefix}-{year}{month}-{new_num:04d}"
+        """Next receipt number for this month (REC-YYYYMM-NNNN)"""
+        return next_number(RECEIPT_PREFIX, seed_from=("Payment", "receipt_number"))
     
     def on_trash(self):
         """Triggered before the document is deleted"""
@@ -214,30 +182,43 @@ def auto_generate_monthly_invoices():
             "Premium": 14999
         }
         
-        for company in active_companies:
-            # Check if invoice already exists for this month
-            existing = frappe.db.exists("Payment", {
+        # Skip companies already invoiced for this month
+        to_invoice = [
+            company for company in active_companies
+            if not frappe.db.exists("Payment", {
                 "company_name": company.company_name,
                 "billing_period_start": today.replace(day=1),
                 "payment_type": "Subscription"
             })
-            
-            if not existing:
-                # Create new payment invoice
-                payment = frappe.get_doc({
-                    "doctype": "Payment",
-                    "company_name": company.company_name,
-                    "payment_type": "Subscription",
-                    "subscription_plan": company.subscription_plan,
-                    "amount": plan_prices.get(company.subscription_plan, 999),
-                    "currency": "INR",
-                    "payment_status": "Pending",
-                    "billing_period_start": today.replace(day=1),
-                    "billing_period_end": (today.replace(day=1) + relativedelta(months=1)) - timedelta(days=1),
-                    "due_date": today + timedelta(days=7),  # 7 days to pay
-                    "description": f"Monthly subscription for {company.subscription_plan} plan"
-                })
-                payment.insert(ignore_permissions=True)
+        ]
+        
+        if not to_invoice:
+            return
+        
+        # One block of invoice numbers for the whole run; commit so the
+        # sequence row is not locked while the invoices are inserted
+        invoice_numbers = reserve_numbers(
+            INVOICE_PREFIX, len(to_invoice), seed_from=("Payment", "invoice_number")
+        )
+        frappe.db.commit()
+        
+        for company, invoice_number in zip(to_invoice, invoice_numbers):
+            # Create new payment invoice
+            payment = frappe.get_doc({
+                "doctype": "Payment",
+                "invoice_number": invoice_number,
+                "company_name": company.company_name,
+                "payment_type": "Subscription",
+                "subscription_plan": company.subscription_plan,
+                "amount": plan_prices.get(company.subscription_plan, 999),
+                "currency": "INR",
+                "payment_status": "Pending",
+                "billing_period_start": today.replace(day=1),
+                "billing_period_end": (today.replace(day=1) + relativedelta(months=1)) - timedelta(days=1),
+                "due_date": today + timedelta(days=7),  # 7 days to pay
+                "description": f"Monthly subscription for {company.subscription_plan} plan"
+            })
+            payment.insert(ignore_permissions=True)
         
         frappe.db.commit()
         
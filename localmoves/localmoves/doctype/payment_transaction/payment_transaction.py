@@ -1,4 +1,14 @@
+import frappe
 from frappe.model.document import Document
 
 class PaymentTransaction(Document):
     pass
+
+
+def on_doctype_update():
+    """Deposit revenue index (localmoves.utils.query_indexes) and admin search FULLTEXT index"""
+    from localmoves.utils.query_indexes import ensure_hot_query_indexes
+    ensure_hot_query_indexes("Payment Transaction")
+    
+    from localmoves.utils.admin_search import ensure_search_indexes
+    ensure_search_indexes("Payment Transaction")
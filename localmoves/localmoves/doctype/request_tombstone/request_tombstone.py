@@ -0,0 +1,16 @@
+import frappe
+from frappe.model.document import Document
+
+
+
+
+class RequestTombstone(Document):
+    pass
+
+
+
+
+def on_doctype_update():
+    """(scope, removed_at) indexes read by get_request_changes"""
+    from localmoves.utils.query_indexes import ensure_hot_query_indexes
+    ensure_hot_query_indexes("Request Tombstone")
@@ -22,3 +22,10 @@ class SchoolHoliday(Document):
         """Update timestamp"""
         self.updated_at = datetime.now()
 
+
+
+
+def on_doctype_update():
+    """Date-range lookup index (see localmoves.utils.query_indexes)"""
+    from localmoves.utils.query_indexes import ensure_hot_query_indexes
+    ensure_hot_query_indexes("School Holiday")
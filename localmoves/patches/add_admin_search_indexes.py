@@ -0,0 +1,16 @@
+"""
+Patch: Add the FULLTEXT indexes behind admin search
+Run automatically on: bench migrate
+"""
+
+import frappe
+
+
+def execute():
+    """Create the admin_search FULLTEXT index on every searched table"""
+    from localmoves.utils.admin_search import ensure_search_indexes
+    
+    ensure_search_indexes()
+    frappe.db.commit()
+    
+    print("✅ Admin Search Index Patch: Indexes created")
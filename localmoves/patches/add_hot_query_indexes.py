@@ -0,0 +1,22 @@
+"""
+Patch: Add composite indexes for the hot Logistics Request, Company, Payment Transaction and School Holiday queries
+Run automatically on: bench migrate
+"""
+
+import frappe
+
+
+def execute():
+    """Create the indexes listed in localmoves.utils.query_indexes"""
+    # Picks up search_index on user_email / previously_assigned_to
+    frappe.reload_doc("localmoves", "doctype", "logistics_request")
+    
+    from localmoves.utils.query_indexes import ensure_hot_query_indexes, verify_hot_query_indexes
+    
+    ensure_hot_query_indexes()
+    frappe.db.commit()
+    
+    # Report only; a small table may legitimately be scanned
+    verify_hot_query_indexes(raise_on_full_scan=False)
+    
+    print("✅ Hot Query Index Patch: Composite indexes created")
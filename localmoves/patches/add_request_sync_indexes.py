@@ -0,0 +1,16 @@
+"""
+Patch: Add (scope, updated_at) indexes used by incremental request sync
+Run automatically on: bench migrate
+"""
+
+import frappe
+
+
+def execute():
+    """Create the Logistics Request indexes added for get_request_changes"""
+    from localmoves.utils.query_indexes import ensure_hot_query_indexes
+    
+    ensure_hot_query_indexes("Logistics Request")
+    frappe.db.commit()
+    
+    print("✅ Request Sync Index Patch: Indexes created")
@@ -0,0 +1,30 @@
+"""
+Patch: Populate outward code, postcode area and Bayesian score on Logistics Company
+Run automatically on: bench migrate
+"""
+
+import frappe
+
+
+def execute():
+    """Seed the top-rated leaderboard columns for existing companies"""
+    frappe.reload_doc("localmoves", "doctype", "logistics_company")
+    
+    from localmoves.localmoves.doctype.logistics_company.logistics_company import get_postcode_parts
+    from localmoves.api.rating_review import rebuild_company_rating_totals
+    
+    companies = frappe.get_all("Logistics Company", fields=["name", "pincode"])
+    
+    for company in companies:
+        outward_code, postcode_area = get_postcode_parts(company.pincode)
+        frappe.db.set_value(
+            "Logistics Company", company.name,
+            {"outward_code": outward_code, "postcode_area": postcode_area},
+            update_modified=False
+        )
+    
+    # Recomputes bayesian_score alongside the other rating totals
+    rebuild_company_rating_totals()
+    frappe.db.commit()
+    
+    print(f"✅ Company Leaderboard Patch: Updated {len(companies)} companies")
@@ -0,0 +1,38 @@
+"""
+Patch: Move this month's request usage into period-keyed Company Quota Usage rows
+Run automatically on: bench migrate
+"""
+
+import frappe
+
+
+def execute():
+    """Seed the current period from requests_viewed_this_month so usage is not reset mid-month"""
+    frappe.reload_doc("localmoves", "doctype", "company_quota_usage")
+    frappe.reload_doc("localmoves", "doctype", "logistics_company")
+    
+    from localmoves.utils.view_quota import current_period, DIRTY_KEY
+    
+    period = current_period()
+    now = frappe.utils.now()
+    
+    frappe.db.sql("""
+        INSERT IGNORE INTO `tabCompany Quota Usage`
+            (name, creation, modified, owner, modified_by, docstatus, idx,
+             company, period, subscription_plan, requests_used)
+        SELECT CONCAT(name, '-', %(period)s), %(now)s, %(now)s, 'Administrator', 'Administrator', 0, 0,
+               name, %(period)s, subscription_plan, IFNULL(requests_viewed_this_month, 0)
+        FROM `tabLogistics Company`
+    """, {"period": period, "now": now})
+    
+    frappe.db.sql("""
+        UPDATE `tabLogistics Company` SET quota_period = %s
+    """, period)
+    
+    # Quota hashes written before usage was period-keyed are no longer read
+    frappe.cache().delete_value(DIRTY_KEY)
+    frappe.cache().delete_keys("view_quota:")
+    
+    frappe.db.commit()
+    
+    print(f"✅ Company Quota Usage Patch: Seeded period {period}")
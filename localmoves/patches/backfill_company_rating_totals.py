@@ -0,0 +1,18 @@
+"""
+Patch: Backfill rating histograms and aspect totals on Logistics Company
+Run automatically on: bench migrate
+"""
+
+import frappe
+
+
+def execute():
+    """Seed the incrementally maintained rating counters from existing reviews"""
+    frappe.reload_doc("localmoves", "doctype", "logistics_company")
+    
+    from localmoves.api.rating_review import rebuild_company_rating_totals
+    
+    rebuild_company_rating_totals()
+    frappe.db.commit()
+    
+    print("✅ Company Rating Totals Patch: Rebuilt rating counters for all companies")
@@ -0,0 +1,19 @@
+"""
+Patch: Build the Daily Metrics rollup from the full history of its source tables
+Run automatically on: bench migrate
+"""
+
+import frappe
+
+
+def execute():
+    """Populate Daily Metrics so the admin charts have history from day one"""
+    from localmoves.utils.daily_metrics import rebuild_daily_metrics
+    
+    frappe.reload_doc("localmoves", "doctype", "daily_metrics")
+    
+    rebuild_daily_metrics()
+    frappe.db.commit()
+    
+    count = frappe.db.count("Daily Metrics")
+    print(f"✅ Daily Metrics Patch: {count} rollup rows built")
@@ -0,0 +1,21 @@
+"""
+Patch: Seed this month's invoice and receipt sequences from issued numbers
+Run automatically on: bench migrate
+"""
+
+import frappe
+
+
+def execute():
+    """Create the INV / REC Document Sequence rows so numbering continues mid-month"""
+    frappe.reload_doc("localmoves", "doctype", "document_sequence")
+    
+    from localmoves.utils.document_sequence import ensure_sequence, get_period
+    from localmoves.localmoves.doctype.payment.payment import INVOICE_PREFIX, RECEIPT_PREFIX
+    
+    period = get_period()
+    ensure_sequence(INVOICE_PREFIX, period, seed_from=("Payment", "invoice_number"))
+    ensure_sequence(RECEIPT_PREFIX, period, seed_from=("Payment", "receipt_number"))
+    frappe.db.commit()
+    
+    print(f"✅ Document Sequence Patch: Seeded period {period}")
@@ -0,0 +1,18 @@
+"""
+Patch: Create the Logistics Request archive table and its (status, updated_at) index
+Run automatically on: bench migrate
+"""
+
+import frappe
+
+
+def execute():
+    """Create the archive used by the daily request archival job"""
+    from localmoves.utils.query_indexes import ensure_hot_query_indexes
+    from localmoves.utils.request_archive import ensure_archive_table
+    
+    ensure_hot_query_indexes("Logistics Request")
+    ensure_archive_table()
+    frappe.db.commit()
+    
+    print("✅ Request Archive Patch: Archive table created")
@@ -0,0 +1,44 @@
+"""
+Patch: Move archive markers out of Deleted Document into Request Tombstone
+Run automatically on: bench migrate
+"""
+
+import frappe
+
+
+def execute():
+    """Replace the Deleted Document rows archiving used to write with Archived tombstones"""
+    frappe.reload_doc("localmoves", "doctype", "request_tombstone")
+    
+    from localmoves.utils.request_archive import ARCHIVE_DOCTYPE, ARCHIVE_TABLE, archive_table_exists
+    from localmoves.utils.request_tombstones import insert_tombstones
+    
+    markers = frappe.db.sql("""
+        SELECT name, deleted_name, creation
+        FROM `tabDeleted Document`
+        WHERE deleted_doctype = 'Logistics Request'
+        AND data LIKE %(marker)s
+    """, {"marker": f'%"archived_to": "{ARCHIVE_DOCTYPE}"%'}, as_dict=True)
+    
+    if not markers:
+        return
+    
+    if archive_table_exists():
+        archived = {
+            row.name: row for row in frappe.db.sql(f"""
+                SELECT name, company_name, previously_assigned_to, user_email, pickup_pincode
+                FROM `{ARCHIVE_TABLE}`
+                WHERE name IN %(names)s
+            """, {"names": tuple(m.deleted_name for m in markers)}, as_dict=True)
+        }
+        for marker in markers:
+            if marker.deleted_name in archived:
+                insert_tombstones([archived[marker.deleted_name]], "Archived", marker.creation)
+    
+    frappe.db.sql("""
+        DELETE FROM `tabDeleted Document`
+        WHERE name IN %(names)s
+    """, {"names": tuple(m.name for m in markers)})
+    frappe.db.commit()
+    
+    print(f"✅ Archive Tombstone Patch: {len(markers)} markers moved to Request Tombstone")
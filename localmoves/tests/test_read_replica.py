@@ -0,0 +1,94 @@
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from localmoves.utils import read_replica
+from localmoves.utils.read_replica import HEALTH_CACHE_KEY, replica_connection
+
+
+class TestReadReplica(FrappeTestCase):
+    """Routing between primary and a mocked replica connection"""
+
+    def setUp(self):
+        frappe.cache().delete_value(HEALTH_CACHE_KEY)
+        self.primary = frappe.local.db
+        self.replica = MagicMock(name="replica")
+
+    def tearDown(self):
+        frappe.local.db = self.primary
+        for attr in ("primary_db", "replica_db"):
+            if hasattr(frappe.local, attr):
+                delattr(frappe.local, attr)
+        frappe.cache().delete_value(HEALTH_CACHE_KEY)
+
+    def connect_replica(self):
+        frappe.local.primary_db = frappe.local.db
+        frappe.local.replica_db = self.replica
+        frappe.local.db = self.replica
+        return True
+
+    def slave_status(self, lag):
+        self.replica.sql.return_value = [] if lag == "none" else [{"Seconds_Behind_Master": lag}]
+
+    def route(self, conf=None):
+        """(used replica, db inside the block, read_only flag inside the block)"""
+        conf = {"read_from_replica": 1} if conf is None else conf
+        with patch.dict(frappe.conf, conf), patch.object(frappe, "connect_replica", side_effect=self.connect_replica):
+            with replica_connection() as using_replica:
+                return using_replica, frappe.local.db, frappe.flags.read_only
+
+    def test_not_configured_stays_on_primary(self):
+        with patch.dict(frappe.conf, {"read_from_replica": 0}):
+            with patch.object(frappe, "connect_replica") as connect:
+                with replica_connection() as using_replica:
+                    self.assertFalse(using_replica)
+                connect.assert_not_called()
+        self.assertIs(frappe.local.db, self.primary)
+
+    def test_unreachable_replica_stays_on_primary(self):
+        with patch.dict(frappe.conf, {"read_from_replica": 1}):
+            with patch.object(frappe, "connect_replica", side_effect=Exception("connection refused")):
+                with replica_connection() as using_replica:
+                    self.assertFalse(using_replica)
+                    self.assertIs(frappe.local.db, self.primary)
+
+    def test_not_replicating_falls_back(self):
+        self.slave_status("none")
+        using_replica, db, _ = self.route()
+        self.assertFalse(using_replica)
+        self.assertIs(db, self.primary)
+        self.assertEqual(frappe.cache().get_value(HEALTH_CACHE_KEY)["reason"], "replica is not replicating")
+
+    def test_lag_over_limit_falls_back(self):
+        self.slave_status(read_replica.REPLICA_MAX_LAG_SECONDS + 1)
+        using_replica, db, _ = self.route()
+        self.assertFalse(using_replica)
+        self.assertIs(db, self.primary)
+        self.replica.close.assert_called_once()
+
+    def test_missing_grant_falls_back_with_reason(self):
+        self.replica.sql.side_effect = Exception(read_replica.ER_SPECIFIC_ACCESS_DENIED, "Access denied")
+        using_replica, db, _ = self.route()
+        self.assertFalse(using_replica)
+        self.assertIn("SLAVE MONITOR", frappe.cache().get_value(HEALTH_CACHE_KEY)["reason"])
+
+    def test_unhealthy_result_is_cached(self):
+        self.slave_status("none")
+        self.route()
+        with patch.dict(frappe.conf, {"read_from_replica": 1}):
+            with patch.object(frappe, "connect_replica") as connect:
+                with replica_connection() as using_replica:
+                    self.assertFalse(using_replica)
+                connect.assert_not_called()
+
+    def test_healthy_replica_is_read_only(self):
+        self.slave_status(0)
+        frappe.flags.read_only = False
+        using_replica, db, read_only = self.route()
+        self.assertTrue(using_replica)
+        self.assertIs(db, self.replica)
+        self.assertTrue(read_only)
+        # Back on the primary with writes allowed again
+        self.assertIs(frappe.local.db, self.primary)
+        self.assertFalse(frappe.flags.read_only)
@@ -0,0 +1,239 @@
+"""
+Admin Search - one ranked lookup across users, companies, requests and payments
+
+Each searched table carries a FULLTEXT index (admin_search) over the columns
+an admin types in: names, emails, phones, postcodes, cities and references.
+InnoDB keeps those indexes current on commit, so no hooks are needed.
+
+search() runs a single UNION ALL query:
+  - a MATCH ... AGAINST branch per entity, every word required and matched
+    as a prefix (so "SW1A" finds "SW1A 1AA")
+  - an ID branch per entity (name prefix, e.g. "REQ-0012"), ranked above any
+    text match, with exact IDs ranked highest
+  - for a query that is a phone number, a phone branch per entity that
+    compares digits only, so "07700 900123", "+44 7700-900123" and
+    "447700900123" all find each other
+Rows hit by both branches are merged and the mixed result is ordered by
+score.
+"""
+
+
+import re
+import frappe
+from localmoves.utils.pagination import get_page_size
+
+
+SEARCH_INDEX_NAME = "admin_search"
+
+# InnoDB defaults: shorter words and stopwords are never indexed, so
+# requiring them would match nothing
+FT_MIN_TOKEN_SIZE = 3
+FT_STOPWORDS = {
+    "about", "are", "com", "for", "from", "how", "that", "the", "this",
+    "und", "was", "what", "when", "where", "who", "will", "with", "www"
+}
+
+ID_EXACT_SCORE = 200
+ID_PREFIX_SCORE = 100
+PHONE_SCORE = 100
+
+# Fewer digits would match a slice of almost every number
+PHONE_MIN_DIGITS = 6
+PHONE_QUERY = re.compile(r"[\d\s+\-().]+")
+PHONE_PUNCTUATION = (" ", "+", "-", "(", ")", ".")
+
+# entity: doctype, FULLTEXT columns, result column expressions, indexed
+# columns that are also matched exactly, phone columns matched on digits
+SEARCH_ENTITIES = {
+    "user": {
+        "doctype": "LocalMoves User",
+        "columns": ["email", "full_name", "phone", "pincode", "city"],
+        "result": {"title": "full_name", "subtitle": "role", "email": "email",
+                   "phone": "phone", "postcode": "pincode"},
+        "exact": [],
+        "phone": ["phone"],
+    },
+    "company": {
+        "doctype": "Logistics Company",
+        "columns": ["company_name", "manager_email", "personal_contact_name", "phone",
+                    "pincode", "location"],
+        "result": {"title": "company_name", "subtitle": "subscription_plan", "email": "manager_email",
+                   "phone": "phone", "postcode": "pincode"},
+        "exact": [],
+        "phone": ["phone"],
+    },
+    "request": {
+        "doctype": "Logistics Request",
+        "columns": ["full_name", "user_email", "email", "phone", "pickup_pincode",
+                    "delivery_pincode", "pickup_city", "delivery_city"],
+        "result": {"title": "full_name", "subtitle": "status", "email": "user_email",
+                   "phone": "phone", "postcode": "pickup_pincode"},
+        "exact": ["user_email"],
+        "phone": ["phone"],
+    },
+    "payment": {
+        "doctype": "Payment Transaction",
+        "columns": ["request_id", "user_email", "company_name", "deposit_transaction_ref",
+                    "balance_transaction_ref"],
+        "result": {"title": "request_id", "subtitle": "payment_status", "email": "user_email",
+                   "phone": "NULL", "postcode": "NULL"},
+        "exact": [],
+        "phone": [],
+    },
+}
+
+RESULT_COLUMNS = ["title", "subtitle", "email", "phone", "postcode"]
+
+
+def ensure_search_indexes(doctype=None):
+    """Create (or rebuild when its columns changed) the FULLTEXT index for one doctype or all"""
+    for spec in SEARCH_ENTITIES.values():
+        if doctype and spec["doctype"] != doctype:
+            continue
+
+        table = f"tab{spec['doctype']}"
+        existing = [
+            row.Column_name for row in frappe.db.sql(f"""
+                SHOW INDEX FROM `{table}` WHERE Key_name = %(key)s
+            """, {"key": SEARCH_INDEX_NAME}, as_dict=True)
+        ]
+
+        if set(existing) == set(spec["columns"]):
+            continue
+
+        if existing:
+            frappe.db.sql_ddl(f"ALTER TABLE `{table}` DROP INDEX `{SEARCH_INDEX_NAME}`")
+
+        column_sql = ", ".join(f"`{column}`" for column in spec["columns"])
+        frappe.db.sql_ddl(f"ALTER TABLE `{table}` ADD FULLTEXT INDEX `{SEARCH_INDEX_NAME}` ({column_sql})")
+
+
+def get_search_terms(query):
+    """Boolean-mode AGAINST string: every indexable word required, as a prefix"""
+    words = [
+        word for word in re.findall(r"\w+", query.lower())
+        if len(word) >= FT_MIN_TOKEN_SIZE and word not in FT_STOPWORDS
+    ]
+    return " ".join(f"+{word}*" for word in words)
+
+
+def get_phone_digits(query):
+    """
+    National digits of a phone-number query (no leading 0 or 44), or None.
+
+    Stored numbers are compared with LIKE '%digits%', so both 07... and
+    +44 7... forms contain them.
+    """
+    if not PHONE_QUERY.fullmatch(query):
+        return None
+
+    digits = re.sub(r"\D", "", query)
+    if len(digits) < PHONE_MIN_DIGITS:
+        return None
+
+    if digits.startswith("0"):
+        digits = digits[1:]
+    elif digits.startswith("44") and len(digits) >= 12:
+        digits = digits[2:]
+
+    return digits
+
+
+def _digits_sql(column):
+    sql = f"`{column}`"
+    for char in PHONE_PUNCTUATION:
+        sql = f"REPLACE({sql}, '{char}', '')"
+    return sql
+
+
+def _result_sql(entity, spec):
+    columns = ", ".join(f"{spec['result'][column]} AS {column}" for column in RESULT_COLUMNS)
+    return f"'{entity}' AS entity, name, {columns}, creation AS created"
+
+
+def _text_branch(entity, spec):
+    match_sql = f"MATCH({', '.join(f'`{c}`' for c in spec['columns'])}) AGAINST (%(terms)s IN BOOLEAN MODE)"
+    return f"""(
+        SELECT {_result_sql(entity, spec)}, {match_sql} AS score
+        FROM `tab{spec['doctype']}`
+        WHERE {match_sql}
+        ORDER BY score DESC
+        LIMIT %(limit)s
+    )"""
+
+
+def _id_branch(entity, spec):
+    conditions = ["name LIKE %(prefix)s"] + [f"`{column}` = %(query)s" for column in spec["exact"]]
+    return f"""(
+        SELECT {_result_sql(entity, spec)},
+            IF(name = %(query)s, {ID_EXACT_SCORE}, {ID_PREFIX_SCORE}) AS score
+        FROM `tab{spec['doctype']}`
+        WHERE {" OR ".join(conditions)}
+        LIMIT %(limit)s
+    )"""
+
+
+def _phone_branch(entity, spec):
+    conditions = [f"{_digits_sql(column)} LIKE %(phone)s" for column in spec["phone"]]
+    return f"""(
+        SELECT {_result_sql(entity, spec)}, {PHONE_SCORE} AS score
+        FROM `tab{spec['doctype']}`
+        WHERE {" OR ".join(conditions)}
+        LIMIT %(limit)s
+    )"""
+
+
+def search(query, entities=None, limit=None):
+    """
+    Ranked matches for `query` across the SEARCH_ENTITIES (or the listed subset).
+
+    Returns rows of entity, name, title, subtitle, email, phone, postcode,
+    created and score, best first.
+    """
+    query = (query or "").strip()
+    entities = [e for e in (entities or SEARCH_ENTITIES) if e in SEARCH_ENTITIES]
+    if not query or not entities:
+        return []
+
+    terms = get_search_terms(query)
+    # Short input would prefix-match half the users table
+    use_ids = len(query) >= FT_MIN_TOKEN_SIZE
+    phone_digits = get_phone_digits(query)
+
+    branches = []
+    for entity in entities:
+        spec = SEARCH_ENTITIES[entity]
+        if terms:
+            branches.append(_text_branch(entity, spec))
+        if use_ids:
+            branches.append(_id_branch(entity, spec))
+        if phone_digits and spec["phone"]:
+            branches.append(_phone_branch(entity, spec))
+
+    if not branches:
+        return []
+
+    prefix = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+    # Positional GROUP BY: a row found by both branches is returned once
+    rows = frappe.db.sql(f"""
+        SELECT entity, name, title, subtitle, email, phone, postcode, created,
+            MAX(score) AS score
+        FROM (
+            {" UNION ALL ".join(branches)}
+        ) hits
+        GROUP BY 1, 2, 3, 4, 5, 6, 7, 8
+        ORDER BY score DESC, created DESC
+        LIMIT %(limit)s
+    """, {
+        "terms": terms,
+        "query": query,
+        "prefix": prefix,
+        "phone": f"%{phone_digits}%",
+        "limit": get_page_size(limit)
+    }, as_dict=True)
+
+    for row in rows:
+        row["score"] = round(float(row["score"] or 0), 4)
+
+    return rows
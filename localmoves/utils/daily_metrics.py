@@ -0,0 +1,398 @@
+"""
+Daily Metrics - per-day rollups behind the admin charts
+
+Each metric in METRIC_SOURCES is a GROUP BY over one raw table that yields
+one row per day and dimension (company, plan, status, payment method).
+rebuild_daily_metrics() replaces a metric's rows for a date range with a
+single DELETE + INSERT ... SELECT, so a rebuild is idempotent.
+
+Rows are kept current three ways:
+    - doc_events on the source doctypes queue a rebuild of the days a saved
+      or deleted document touches (deduplicated per metric and day), only
+      when a column the metric reads has changed
+    - an hourly job rebuilds yesterday and today, which also covers writes
+      made with raw SQL that never fire doc_events
+    - code that updates an older document with db_set calls
+      queue_metric_refresh(doc) itself (e.g. process_full_payment)
+
+Rebuilds of the same metric are serialized with a MariaDB named lock held
+until the commit: two concurrent DELETE + INSERT runs over the same days
+would otherwise both insert and fail on the duplicate key.
+
+Charts read with get_metric_series() instead of scanning the raw tables;
+get_timeseries() is the generic, gap-filled read behind the metrics API.
+"""
+
+
+import re
+import frappe
+from datetime import timedelta
+from dateutil.relativedelta import relativedelta
+from frappe.utils import getdate, add_days, nowdate
+
+
+METRICS_TABLE = "tabDaily Metrics"
+REFRESH_QUEUE = "short"
+
+# metric: (source table, date expression, select list for the dimensions and
+# values, WHERE condition). The select list must produce company, plan, status,
+# payment_method, count, value, min_value and max_value.
+METRIC_SOURCES = {
+    "user_signups": (
+        "tabLocalMoves User", "creation",
+        """'' as company, '' as plan, '' as status, '' as payment_method,
+           COUNT(*) as count, COUNT(*) as value, NULL as min_value, NULL as max_value""",
+        "1=1"
+    ),
+    "subscription_payments": (
+        "tabPayment", "paid_date",
+        """IFNULL(company_name, '') as company, IFNULL(subscription_plan, '') as plan,
+           '' as status, IFNULL(payment_method, '') as payment_method,
+           COUNT(*) as count, SUM(amount) as value, MIN(amount) as min_value, MAX(amount) as max_value""",
+        "payment_status = 'Paid'"
+    ),
+    "deposit_payments": (
+        "tabPayment Transaction", "deposit_paid_at",
+        """IFNULL(company_name, '') as company, '' as plan, '' as status,
+           IFNULL(payment_method, '') as payment_method,
+           COUNT(*) as count, SUM(deposit_amount) as value,
+           MIN(deposit_amount) as min_value, MAX(deposit_amount) as max_value""",
+        "deposit_status = 'Paid'"
+    ),
+    # Paid deposit + balance bucketed by when the transaction was created
+    "request_payments": (
+        "tabPayment Transaction", "created_at",
+        """IFNULL(company_name, '') as company, '' as plan, IFNULL(payment_status, '') as status,
+           IFNULL(payment_method, '') as payment_method,
+           COUNT(*) as count,
+           SUM(CASE WHEN deposit_status = 'Paid' THEN deposit_amount ELSE 0 END) +
+           SUM(CASE WHEN balance_status = 'Paid' THEN remaining_amount ELSE 0 END) as value,
+           NULL as min_value, NULL as max_value""",
+        "1=1"
+    ),
+    "requests_created": (
+        "tabLogistics Request", "created_at",
+        """IFNULL(company_name, '') as company, '' as plan, IFNULL(status, '') as status,
+           '' as payment_method,
+           COUNT(*) as count, SUM(IFNULL(estimated_cost, 0)) as value, NULL as min_value, NULL as max_value""",
+        "1=1"
+    ),
+}
+
+# Which metrics, keyed by which date field, a saved document can move
+DOCTYPE_METRICS = {
+    "LocalMoves User": {"user_signups": "creation"},
+    "Payment": {"subscription_payments": "paid_date"},
+    "Payment Transaction": {"deposit_payments": "deposit_paid_at", "request_payments": "created_at"},
+    "Logistics Request": {"requests_created": "created_at"},
+}
+
+# Columns each metric reads; a save that changes none of them leaves it as is
+METRIC_FIELDS = {
+    "user_signups": ["creation"],
+    "subscription_payments": ["paid_date", "payment_status", "company_name", "subscription_plan",
+                              "payment_method", "amount"],
+    "deposit_payments": ["deposit_paid_at", "deposit_status", "company_name", "payment_method",
+                         "deposit_amount"],
+    "request_payments": ["created_at", "company_name", "payment_status", "payment_method",
+                         "deposit_status", "deposit_amount", "balance_status", "remaining_amount"],
+    "requests_created": ["created_at", "company_name", "status", "estimated_cost"],
+}
+
+METRIC_LOCK_PREFIX = "localmoves_daily_metrics:"
+METRIC_LOCK_TIMEOUT = 120
+
+DIMENSIONS = ("company", "plan", "status", "payment_method")
+
+# granularity: SQL bucket start for a metric_date
+GRANULARITIES = {
+    "day": "metric_date",
+    "week": "DATE_SUB(metric_date, INTERVAL WEEKDAY(metric_date) DAY)",
+    "month": "DATE_SUB(metric_date, INTERVAL DAYOFMONTH(metric_date) - 1 DAY)",
+}
+
+RANGE_UNITS = {"d": "days", "w": "weeks", "m": "months", "y": "years"}
+MAX_BUCKETS = 400
+TIMESERIES_CACHE_PREFIX = "metric_timeseries:"
+TIMESERIES_CACHE_TTL = 300
+
+PERIOD_EXPRESSIONS = {
+    "day": ("date", "metric_date"),
+    "month": ("month", "DATE_FORMAT(metric_date, '%%Y-%%m')"),
+}
+
+
+def rebuild_daily_metrics(from_date=None, to_date=None, metrics=None):
+    """
+    Recompute metrics for [from_date, to_date] (whole history when both are None).
+
+    The caller owns the commit.
+    """
+    for metric in metrics or METRIC_SOURCES:
+        table, date_field, select_list, condition = METRIC_SOURCES[metric]
+
+        date_filter = ""
+        metric_filter = ""
+        if from_date:
+            date_filter += f" AND `{date_field}` >= %(from_date)s"
+            metric_filter += " AND metric_date >= %(from_date)s"
+        if to_date:
+            date_filter += f" AND `{date_field}` < %(to_date)s"
+            metric_filter += " AND metric_date < %(to_date)s"
+
+        values = {
+            "metric": metric,
+            "from_date": getdate(from_date) if from_date else None,
+            "to_date": add_days(getdate(to_date), 1) if to_date else None,
+        }
+
+        frappe.db.sql(f"""
+            DELETE FROM `{METRICS_TABLE}`
+            WHERE metric = %(metric)s{metric_filter}
+        """, values)
+
+        source = f"`{table}`"
+        if table == "tabLogistics Request":
+            # Archived requests still belong in the history
+            from localmoves.utils.request_archive import requests_source
+            source = requests_source(
+                ["company_name", "status", "estimated_cost", "created_at"],
+                where=f"`{date_field}` IS NOT NULL{date_filter}",
+                include_archived=True
+            )
+
+        frappe.db.sql(f"""
+            INSERT INTO `{METRICS_TABLE}`
+                (name, creation, modified, owner, modified_by, docstatus, idx,
+                 metric_date, metric, company, plan, status, payment_method,
+                 count, value, min_value, max_value)
+            SELECT
+                MD5(CONCAT_WS(':', %(metric)s, metric_date, company, plan, status, payment_method)),
+                NOW(), NOW(), 'Administrator', 'Administrator', 0, 0,
+                metric_date, %(metric)s, company, plan, status, payment_method,
+                count, IFNULL(value, 0), min_value, max_value
+            FROM (
+                SELECT DATE(`{date_field}`) as metric_date, {select_list}
+                FROM {source}
+                WHERE `{date_field}` IS NOT NULL
+                AND {condition}{date_filter}
+                -- Positional: GROUP BY would pick the raw status column over the alias
+                GROUP BY 1, 2, 3, 4, 5
+            ) daily
+        """, values)
+
+
+def _lock_metrics(metrics):
+    """Take the rebuild lock of each metric (sorted, so two runs cannot deadlock)"""
+    locked = []
+    for metric in sorted(metrics):
+        name = METRIC_LOCK_PREFIX + metric
+        if frappe.db.sql("SELECT GET_LOCK(%s, %s)", (name, METRIC_LOCK_TIMEOUT))[0][0] != 1:
+            _unlock_metrics(locked)
+            frappe.throw(f"Timed out waiting for the {metric} rebuild lock")
+        locked.append(metric)
+    return locked
+
+
+def _unlock_metrics(metrics):
+    for metric in metrics:
+        frappe.db.sql("SELECT RELEASE_LOCK(%s)", (METRIC_LOCK_PREFIX + metric,))
+
+
+def refresh_daily_metrics(from_date, to_date, metrics=None):
+    """Rebuild and commit with the metrics' rebuild locks held until the commit"""
+    metrics = list(metrics or METRIC_SOURCES)
+    locked = []
+    try:
+        locked = _lock_metrics(metrics)
+        rebuild_daily_metrics(from_date, to_date, metrics)
+        frappe.db.commit()
+    except Exception:
+        frappe.db.rollback()
+        raise
+    finally:
+        _unlock_metrics(locked)
+
+
+def refresh_recent_daily_metrics():
+    """Rebuild yesterday and today for every metric (scheduler)"""
+    try:
+        refresh_daily_metrics(add_days(nowdate(), -1), nowdate())
+    except Exception as e:
+        frappe.log_error(f"Daily metrics refresh error: {str(e)}")
+
+
+def refresh_metric_day(metric, day):
+    """Background job queued by the doc_events below"""
+    refresh_daily_metrics(day, day, [metric])
+
+
+def queue_metric_refresh(doc, method=None):
+    """doc_events handler: rebuild the days this document counts towards (and used to)"""
+    metrics = DOCTYPE_METRICS.get(doc.doctype)
+    if not metrics:
+        return
+
+    before = doc.get_doc_before_save() if method != "on_trash" else None
+
+    for metric, date_field in metrics.items():
+        if before and not any(doc.has_value_changed(field) for field in METRIC_FIELDS[metric]):
+            continue
+
+        days = {doc.get(date_field), before.get(date_field) if before else None}
+        for day in {getdate(d) for d in days if d}:
+            frappe.enqueue(
+                "localmoves.utils.daily_metrics.refresh_metric_day",
+                queue=REFRESH_QUEUE,
+                job_id=f"daily_metrics::{metric}::{day}",
+                deduplicate=True,
+                enqueue_after_commit=True,
+                metric=metric,
+                day=str(day)
+            )
+
+
+def get_metric_series(metric, interval, period="day", aggregates=None, group_by=None, condition=None):
+    """
+    Rows of one metric from CURDATE() - INTERVAL `interval` on, per day or month.
+
+    interval is a SQL interval literal such as "7 DAY" or "12 MONTH".
+    aggregates maps output names to SQL over the rollup columns (default
+    count and value sums). group_by adds dimension columns to each row, as a
+    list of columns or a dict of {output name: column}.
+    """
+    label, period_sql = PERIOD_EXPRESSIONS[period]
+    aggregates = aggregates or {"count": "SUM(count)", "value": "SUM(value)"}
+    if not isinstance(group_by, dict):
+        group_by = {column: column for column in group_by or []}
+    dimensions = list(group_by)
+
+    select = [f"{period_sql} as {label}"]
+    select += [f"{column} as {name}" for name, column in group_by.items()]
+    select += [f"{sql} as {name}" for name, sql in aggregates.items()]
+
+    return frappe.db.sql(f"""
+        SELECT {", ".join(select)}
+        FROM `{METRICS_TABLE}`
+        WHERE metric = %(metric)s
+        AND metric_date >= DATE_SUB(CURDATE(), INTERVAL {interval})
+        {f"AND {condition}" if condition else ""}
+        GROUP BY {", ".join([label] + dimensions)}
+        ORDER BY {", ".join([label] + dimensions)}
+    """, {"metric": metric}, as_dict=True)
+
+
+def parse_range(time_range=None, from_date=None, to_date=None):
+    """
+    (start, end) dates for a range such as "7d", "12w", "12m", "1y" ending
+    today, or for explicit from_date / to_date. Defaults to the last 30 days.
+    """
+    end = getdate(to_date) if to_date else getdate(nowdate())
+
+    if from_date:
+        start = getdate(from_date)
+    else:
+        match = re.fullmatch(r"(\d+)([dwmy])", str(time_range or "30d").strip().lower())
+        if not match:
+            frappe.throw(f"Invalid range: {time_range}", frappe.ValidationError)
+        amount, unit = int(match.group(1)), RANGE_UNITS[match.group(2)]
+        start = end - relativedelta(**{unit: amount}) + timedelta(days=1)
+
+    if start > end:
+        frappe.throw("from_date must be before to_date", frappe.ValidationError)
+
+    return start, end
+
+
+def bucket_start(day, granularity):
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def iter_buckets(start, end, granularity):
+    """Every bucket start from the one holding `start` to the one holding `end`"""
+    bucket = bucket_start(start, granularity)
+    while bucket <= end:
+        yield bucket
+        if granularity == "week":
+            bucket += timedelta(days=7)
+        elif granularity == "month":
+            bucket += relativedelta(months=1)
+        else:
+            bucket += timedelta(days=1)
+
+
+def get_timeseries(metric, start, end, granularity="day", filters=None, split_by=None):
+    """
+    Gap-filled columns for one metric between start and end (inclusive).
+
+    filters narrows on dimensions ({"company": ..., "plan": ...}); split_by
+    names one dimension to return a series per value instead of one total.
+
+    Returns {"buckets": [...], "series": [{"name", "count": [...], "value": [...]}]}
+    with a 0 in every bucket that has no rows. Cached for TIMESERIES_CACHE_TTL.
+    """
+    if metric not in METRIC_SOURCES:
+        frappe.throw(f"Unknown metric: {metric}", frappe.ValidationError)
+    if granularity not in GRANULARITIES:
+        frappe.throw(f"Invalid granularity: {granularity}", frappe.ValidationError)
+    if split_by and split_by not in DIMENSIONS:
+        frappe.throw(f"Invalid dimension: {split_by}", frappe.ValidationError)
+
+    filters = {k: v for k, v in (filters or {}).items() if k in DIMENSIONS and v}
+
+    buckets = list(iter_buckets(start, end, granularity))
+    if len(buckets) > MAX_BUCKETS:
+        frappe.throw(f"Range too large for {granularity} buckets (max {MAX_BUCKETS})", frappe.ValidationError)
+
+    cache_key = TIMESERIES_CACHE_PREFIX + ":".join(
+        [metric, str(start), str(end), granularity, split_by or ""]
+        + [f"{k}={filters[k]}" for k in sorted(filters)]
+    )
+    cached = frappe.cache().get_value(cache_key)
+    if cached:
+        return cached
+
+    conditions = "".join(f" AND {dimension} = %({dimension})s" for dimension in filters)
+    split_column = f", {split_by} as series" if split_by else ", '' as series"
+
+    rows = frappe.db.sql(f"""
+        SELECT
+            {GRANULARITIES[granularity]} as bucket{split_column},
+            SUM(count) as count,
+            SUM(value) as value
+        FROM `{METRICS_TABLE}`
+        WHERE metric = %(metric)s
+        AND metric_date BETWEEN %(start)s AND %(end)s{conditions}
+        GROUP BY bucket, series
+    """, dict(filters, metric=metric, start=start, end=end), as_dict=True)
+
+    index = {bucket: i for i, bucket in enumerate(buckets)}
+    series = {}
+    for row in rows:
+        name = row.series if split_by else "total"
+        columns = series.setdefault(name, {"name": name, "count": [0] * len(buckets), "value": [0] * len(buckets)})
+        i = index.get(getdate(row.bucket))
+        if i is not None:
+            columns["count"][i] += int(row.count or 0)
+            columns["value"][i] += round(float(row.value or 0), 2)
+
+    if not split_by and not series:
+        series["total"] = {"name": "total", "count": [0] * len(buckets), "value": [0] * len(buckets)}
+
+    result = {
+        "metric": metric,
+        "granularity": granularity,
+        "from_date": str(start),
+        "to_date": str(end),
+        "filters": filters,
+        "split_by": split_by,
+        "buckets": [str(bucket) for bucket in buckets],
+        "series": sorted(series.values(), key=lambda s: -sum(s["value"]))
+    }
+
+    frappe.cache().set_value(cache_key, result, expires_in_sec=TIMESERIES_CACHE_TTL)
+    return result
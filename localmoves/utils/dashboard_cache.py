@@ -0,0 +1,131 @@
+"""
+Dashboard Cache - stale-while-revalidate snapshots for the dashboards
+
+A snapshot is keyed by dashboard and scope (e.g. "manager" + manager email).
+get_dashboard_snapshot() serves it directly while it is younger than the
+dashboard's fresh time. An older snapshot is still served, and one
+background job rebuilds it. A per-key lock (SET NX) makes sure only one
+refresh runs however many users load the page at once. Without any snapshot
+the first caller builds it inline under the same lock and the others wait
+briefly for its result.
+"""
+
+
+import time
+import frappe
+from datetime import datetime
+from localmoves.utils.read_replica import replica_connection
+
+
+SNAPSHOT_PREFIX = "dashboard_snapshot:"
+LOCK_PREFIX = "dashboard_snapshot_lock:"
+REFRESH_QUEUE = "short"
+
+# dashboard: seconds a snapshot is served without a refresh
+FRESH_SECONDS = {
+    "admin": 60,
+    "dashboard_stats": 120,
+    "manager": 30,
+    "user": 30,
+}
+DEFAULT_FRESH_SECONDS = 60
+
+# Snapshots older than this are dropped rather than served
+MAX_AGE_SECONDS = 30 * 60
+LOCK_SECONDS = 120
+WAIT_FOR_BUILD_SECONDS = 5
+
+
+def _snapshot_key(dashboard, scope):
+    return f"{SNAPSHOT_PREFIX}{dashboard}:{scope}"
+
+
+def _lock_key(dashboard, scope):
+    return frappe.cache().make_key(f"{LOCK_PREFIX}{dashboard}:{scope}")
+
+
+def _acquire_lock(dashboard, scope):
+    return bool(frappe.cache().set(_lock_key(dashboard, scope), 1, ex=LOCK_SECONDS, nx=True))
+
+
+def _release_lock(dashboard, scope):
+    frappe.cache().delete(_lock_key(dashboard, scope))
+
+
+def _build(dashboard, scope, builder, kwargs):
+    """Run the builder and store its result if it succeeded"""
+    result = frappe.get_attr(builder)(**kwargs)
+
+    if isinstance(result, dict) and result.get("success"):
+        frappe.cache().set_value(
+            _snapshot_key(dashboard, scope),
+            {"built_at": time.time(), "result": result},
+            expires_in_sec=MAX_AGE_SECONDS
+        )
+
+    return result
+
+
+def _serve(snapshot, stale):
+    result = dict(snapshot["result"])
+    result["snapshot"] = {
+        "built_at": str(datetime.fromtimestamp(snapshot["built_at"])),
+        "stale": stale
+    }
+    return result
+
+
+def refresh_dashboard_snapshot(dashboard, scope, builder, builder_kwargs=None):
+    """Background rebuild; the caller that queued it holds the lock"""
+    try:
+        with replica_connection():
+            _build(dashboard, scope, builder, builder_kwargs or {})
+    except Exception as e:
+        frappe.log_error(f"Dashboard snapshot refresh error ({dashboard}): {str(e)}")
+    finally:
+        _release_lock(dashboard, scope)
+
+
+def get_dashboard_snapshot(dashboard, scope, builder, **builder_kwargs):
+    """
+    Serve `builder(**builder_kwargs)` (a dotted path returning a response dict)
+    through the stale-while-revalidate cache.
+    """
+    cache = frappe.cache()
+    key = _snapshot_key(dashboard, scope)
+    snapshot = cache.get_value(key)
+
+    if snapshot:
+        age = time.time() - snapshot["built_at"]
+        if age < FRESH_SECONDS.get(dashboard, DEFAULT_FRESH_SECONDS):
+            return _serve(snapshot, stale=False)
+
+        # Stale: serve it and let exactly one worker rebuild
+        if _acquire_lock(dashboard, scope):
+            frappe.enqueue(
+                "localmoves.utils.dashboard_cache.refresh_dashboard_snapshot",
+                queue=REFRESH_QUEUE,
+                job_id=f"dashboard_snapshot::{dashboard}::{scope}",
+                deduplicate=True,
+                dashboard=dashboard,
+                scope=scope,
+                builder=builder,
+                builder_kwargs=builder_kwargs
+            )
+        return _serve(snapshot, stale=True)
+
+    # Cold: one caller builds, the rest wait for its snapshot
+    if _acquire_lock(dashboard, scope):
+        try:
+            return _build(dashboard, scope, builder, builder_kwargs)
+        finally:
+            _release_lock(dashboard, scope)
+
+    deadline = time.time() + WAIT_FOR_BUILD_SECONDS
+    while time.time() < deadline:
+        time.sleep(0.2)
+        snapshot = cache.get_value(key)
+        if snapshot:
+            return _serve(snapshot, stale=False)
+
+    return frappe.get_attr(builder)(**builder_kwargs)
@@ -0,0 +1,111 @@
+"""
+Document Sequence - per-prefix, per-period counters for invoice and receipt numbers
+
+Each (prefix, period) pair is one Document Sequence row. Numbers are
+allocated with a single atomic statement:
+
+    UPDATE `tabDocument Sequence` SET last_value = LAST_INSERT_ID(last_value + n)
+
+LAST_INSERT_ID() then returns the new value for this connection only. The
+UPDATE holds the row lock until the caller's transaction ends, so concurrent
+inserts get distinct numbers. A rolled-back insert hands its number back, so
+numbering stays gapless. Bulk runs reserve a whole block in one statement
+(reserve_numbers) and commit straight away, so they do not hold the row for
+the whole run.
+
+The first allocation in a period creates the row. It is seeded from the
+highest number already issued in that period (seed_from), so numbering
+continues from numbers issued before the sequence existed.
+"""
+
+
+import frappe
+from datetime import datetime
+
+
+SEQUENCE_DOCTYPE = "Document Sequence"
+SEQUENCE_TABLE = f"tab{SEQUENCE_DOCTYPE}"
+NUMBER_WIDTH = 4
+
+
+def get_period(date=None):
+    return (date or datetime.now()).strftime("%Y%m")
+
+
+def format_number(prefix, period, value):
+    return f"{prefix}-{period}-{value:0{NUMBER_WIDTH}d}"
+
+
+def _highest_issued(doctype, fieldname, prefix, period):
+    """Largest number already written as `<prefix>-<period>-NNNN` in doctype.fieldname"""
+    return frappe.db.sql(f"""
+        SELECT COALESCE(MAX(CAST(SUBSTRING_INDEX(`{fieldname}`, '-', -1) AS UNSIGNED)), 0)
+        FROM `tab{doctype}`
+        WHERE `{fieldname}` LIKE %(pattern)s
+    """, {"pattern": f"{prefix}-{period}-%"})[0][0]
+
+
+def ensure_sequence(prefix, period, seed_from=None):
+    """
+    Create the (prefix, period) row if it is missing.
+
+    seed_from is an optional (doctype, fieldname) holding numbers issued
+    before the sequence existed.
+    """
+    name = f"{prefix}-{period}"
+    if frappe.db.exists(SEQUENCE_DOCTYPE, name):
+        return name
+
+    start = _highest_issued(*seed_from, prefix, period) if seed_from else 0
+    now = frappe.utils.now()
+
+    # Two first allocations racing both land here; IGNORE keeps the first row
+    frappe.db.sql(f"""
+        INSERT IGNORE INTO `{SEQUENCE_TABLE}`
+            (name, creation, modified, owner, modified_by, docstatus, idx,
+             prefix, period, last_value)
+        VALUES (%(name)s, %(now)s, %(now)s, 'Administrator', 'Administrator', 0, 0,
+                %(prefix)s, %(period)s, %(start)s)
+    """, {"name": name, "now": now, "prefix": prefix, "period": period, "start": int(start)})
+
+    return name
+
+
+def allocate(prefix, period=None, count=1, seed_from=None):
+    """Reserve `count` consecutive values; returns the first one"""
+    count = int(count)
+    if count < 1:
+        frappe.throw("count must be at least 1", frappe.ValidationError)
+
+    period = period or get_period()
+    name = ensure_sequence(prefix, period, seed_from)
+
+    frappe.db.sql(f"""
+        UPDATE `{SEQUENCE_TABLE}`
+        SET last_value = LAST_INSERT_ID(last_value + %(count)s)
+        WHERE name = %(name)s
+    """, {"count": count, "name": name})
+
+    if frappe.db._cursor.rowcount != 1:
+        frappe.throw(f"Document sequence {name} could not be allocated")
+
+    last = frappe.db.sql("SELECT LAST_INSERT_ID()")[0][0]
+    return int(last) - count + 1
+
+
+def next_number(prefix, period=None, seed_from=None):
+    """The next formatted number, e.g. INV-202610-0042"""
+    period = period or get_period()
+    return format_number(prefix, period, allocate(prefix, period, 1, seed_from))
+
+
+def reserve_numbers(prefix, count, period=None, seed_from=None):
+    """
+    A block of `count` formatted numbers from one allocation (bulk runs).
+
+    Commit soon after reserving: the sequence row stays locked until then.
+    Numbers left unused are skipped, not reissued.
+    """
+    period = period or get_period()
+    first = allocate(prefix, period, count, seed_from)
+    return [format_number(prefix, period, value) for value in range(first, first + count)]
@@ -0,0 +1,162 @@
+"""
+Export Stream - CSV / NDJSON exports written to the response as they are read
+
+Rows are read in keyset chunks on the primary key (name > last LIMIT n), so
+neither the database nor the worker ever holds more than one chunk, and each
+chunk is written out before the next is read. The whitelisted endpoint
+returns a werkzeug Response wrapping a generator; Frappe hands that straight
+to the WSGI server.
+
+The request's DB connection is closed before the body is sent, so the
+generator opens its own for the site and closes it when the stream ends.
+Chunks are read from the read replica when it is healthy.
+"""
+
+
+import csv
+import io
+import json
+import frappe
+from datetime import datetime
+from werkzeug.wrappers import Response
+from localmoves.utils.read_replica import replica_connection
+
+
+EXPORT_CHUNK_SIZE = 1000
+
+# entity: doctype, columns never exported, filters the caller may pass
+EXPORTS = {
+    "payments": {
+        "doctype": "Payment Transaction",
+        "exclude": ["gateway_response"],
+        "filters": ["payment_status", "deposit_status", "balance_status", "company_name"],
+    },
+    "requests": {
+        "doctype": "Logistics Request",
+        "exclude": [],
+        "filters": ["status", "company_name", "user_email", "pickup_pincode"],
+    },
+    "users": {
+        "doctype": "LocalMoves User",
+        "exclude": ["password", "otp_code", "otp_expiry"],
+        "filters": ["role", "is_active"],
+    },
+    "companies": {
+        "doctype": "Logistics Company",
+        "exclude": [],
+        "filters": ["subscription_plan", "is_active"],
+    },
+}
+
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+# Frappe bookkeeping columns that mean nothing outside the desk
+SYSTEM_COLUMNS = {"docstatus", "idx", "_user_tags", "_comments", "_assign", "_liked_by", "_seen"}
+
+
+def get_export_columns(entity):
+    spec = EXPORTS[entity]
+    excluded = SYSTEM_COLUMNS | set(spec["exclude"])
+    return [c for c in frappe.db.get_table_columns(spec["doctype"]) if c not in excluded]
+
+
+def _iter_chunks(doctype, columns, filters):
+    """Yield lists of rows in primary-key order, one chunk at a time"""
+    column_sql = ", ".join(f"`{column}`" for column in columns)
+    conditions = "".join(f" AND `{field}` = %({field})s" for field in filters)
+
+    after = ""
+    while True:
+        rows = frappe.db.sql(f"""
+            SELECT {column_sql}
+            FROM `tab{doctype}`
+            WHERE name > %(after)s{conditions}
+            ORDER BY name
+            LIMIT %(limit)s
+        """, dict(filters, after=after, limit=EXPORT_CHUNK_SIZE), as_dict=True)
+
+        if not rows:
+            return
+
+        yield rows
+
+        if len(rows) < EXPORT_CHUNK_SIZE:
+            return
+        after = rows[-1]["name"]
+
+
+def _encode_csv(rows, columns, header):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    for row in rows:
+        writer.writerow(["" if row[c] is None else row[c] for c in columns])
+    return buffer.getvalue()
+
+
+def _encode_ndjson(rows):
+    return "".join(json.dumps(row, default=str) + "\n" for row in rows)
+
+
+def _generate(site, sites_path, user, entity, fmt, columns, filters):
+    frappe.init(site=site, sites_path=sites_path, force=True)
+    frappe.connect()
+    try:
+        frappe.set_user(user)
+
+        if fmt == "csv":
+            # Header even when there are no rows
+            yield _encode_csv([], columns, header=True).encode("utf-8")
+
+        with replica_connection():
+            for rows in _iter_chunks(EXPORTS[entity]["doctype"], columns, filters):
+                if fmt == "csv":
+                    yield _encode_csv(rows, columns, header=False).encode("utf-8")
+                else:
+                    yield _encode_ndjson(rows).encode("utf-8")
+
+    except Exception as e:
+        frappe.log_error(f"Export Stream Error ({entity}): {str(e)}")
+        raise
+    finally:
+        frappe.destroy()
+
+
+def stream_export(entity, fmt="csv", filters=None):
+    """
+    Streaming Response exporting `entity` (see EXPORTS) as csv or ndjson.
+
+    filters is a dict; only the entity's whitelisted fields are applied.
+    """
+    if entity not in EXPORTS:
+        frappe.throw(f"Unknown export: {entity}. Use one of {', '.join(EXPORTS)}", frappe.ValidationError)
+    if fmt not in FORMATS:
+        frappe.throw(f"Unknown format: {fmt}. Use csv or ndjson", frappe.ValidationError)
+
+    spec = EXPORTS[entity]
+    filters = {
+        field: value for field, value in (filters or {}).items()
+        if field in spec["filters"] and value not in (None, "")
+    }
+    columns = get_export_columns(entity)
+    content_type, extension = FORMATS[fmt]
+    filename = f"{entity}-{datetime.now():%Y%m%d-%H%M%S}.{extension}"
+
+    body = _generate(
+        frappe.local.site, frappe.local.sites_path, frappe.session.user,
+        entity, fmt, columns, filters
+    )
+
+    return Response(
+        body,
+        content_type=content_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            # Let nginx pass chunks through instead of buffering the whole file
+            "X-Accel-Buffering": "no",
+        }
+    )
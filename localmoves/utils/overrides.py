@@ -10,3 +10,25 @@ def custom_validate_auth():
     else:
         from frappe.api import validate_auth as original_validate_auth
         return original_validate_auth()
+
+
+@frappe.whitelist(allow_guest=True)
+def get_socket_user_info():
+    """
+    Override frappe.realtime.get_user_info (socket.io authentication).
+    
+    The socket server forwards the client's Authorization header here. A JWT
+    has already been validated by validate_jwt_before_request, so its user is
+    returned and the socket joins user:<email>; anything else falls through
+    to Frappe's session-based lookup.
+    """
+    jwt_user = getattr(frappe.local, "jwt_user", None)
+    if jwt_user and jwt_user.get("user_id"):
+        return {
+            "user": jwt_user.get("user_id"),
+            "user_type": "Website User",
+            "installed_apps": frappe.get_installed_apps()
+        }
+    
+    from frappe.realtime import get_user_info
+    return get_user_info()
@@ -0,0 +1,204 @@
+"""
+Keyset (cursor) pagination helpers shared by the search and list endpoints
+"""
+
+
+import frappe
+from frappe import _
+import base64
+import json
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def get_page_size(page_size=None, default=DEFAULT_PAGE_SIZE):
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE"""
+    try:
+        page_size = int(page_size or default)
+    except (ValueError, TypeError):
+        page_size = default
+
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(values):
+    """Encode the sort values of the last row on a page into an opaque cursor"""
+    raw = json.dumps(values, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, size):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Returns None for the first page (no cursor) and throws for a cursor that
+    is malformed or does not carry exactly `size` sort values.
+    """
+    if not cursor:
+        return None
+
+    try:
+        values = json.loads(base64.urlsafe_b64decode(str(cursor).encode()).decode())
+    except Exception:
+        values = None
+
+    if not isinstance(values, list) or len(values) != size:
+        frappe.throw(_("Invalid pagination cursor"), frappe.ValidationError)
+
+    return values
+
+
+def build_page(rows, page_size, cursor_fields):
+    """
+    Trim a result fetched with LIMIT page_size + 1 to one page.
+
+    Returns (page_rows, pagination) where pagination carries the next cursor
+    built from cursor_fields of the last row on the page.
+    """
+    has_more = len(rows) > page_size
+    page_rows = rows[:page_size]
+
+    next_cursor = None
+    if has_more and page_rows:
+        last_row = page_rows[-1]
+        next_cursor = encode_cursor([last_row.get(field) for field in cursor_fields])
+
+    return page_rows, {
+        "page_size": page_size,
+        "has_more": has_more,
+        "next_cursor": next_cursor
+    }
+
+
+# ---------------------------------------------------------------------------
+# Admin list queries: whitelisted filters and sort, keyset pages, optional count
+
+SORT_ORDERS = ("asc", "desc")
+FILTER_LIST_LIMIT = 50
+
+
+def build_list_filters(data, filter_fields, range_fields):
+    """
+    WHERE fragments and values for the whitelisted filters present in data.
+
+    Endpoints reuse it to aggregate over exactly the rows the list pages through.
+    """
+    conditions = []
+    values = {}
+
+    for field in filter_fields or ():
+        value = data.get(field)
+        if value in (None, "", []):
+            continue
+
+        if isinstance(value, (list, tuple)):
+            conditions.append(f"`{field}` IN %(f_{field})s")
+            values[f"f_{field}"] = tuple(value[:FILTER_LIST_LIMIT])
+        else:
+            conditions.append(f"`{field}` = %(f_{field})s")
+            values[f"f_{field}"] = value
+
+    for field in range_fields or ():
+        if data.get(f"{field}_from") not in (None, ""):
+            conditions.append(f"`{field}` >= %(from_{field})s")
+            values[f"from_{field}"] = data.get(f"{field}_from")
+        if data.get(f"{field}_to") not in (None, ""):
+            conditions.append(f"`{field}` <= %(to_{field})s")
+            values[f"to_{field}"] = data.get(f"{field}_to")
+
+    return conditions, values
+
+
+def get_list_page(doctype, fields, data, filter_fields=(), range_fields=(), sort_fields=("creation",),
+                  default_sort=None, default_order="desc", conditions=None, values=None,
+                  key_alias="name"):
+    """
+    One keyset page of an admin list.
+
+    fields are SQL select expressions and must include `name` (or `name as
+    <key_alias>`) and every sort field. data is the request dict:
+      - a field in filter_fields: equality (a list means IN)
+      - <field>_from / <field>_to for a field in range_fields
+      - sort_by (one of sort_fields) and sort_order (asc / desc)
+      - cursor and page_size
+      - with_count: "exact" runs COUNT(*); any other true value returns the
+        optimizer's row estimate, which costs nothing on large tables
+    conditions / values add fixed WHERE clauses (e.g. "rating > 0").
+
+    Sort fields should be NOT NULL for the listed rows; name breaks ties.
+    Returns (rows, pagination).
+    """
+    data = data or {}
+    sort_by = data.get("sort_by") or default_sort or sort_fields[0]
+    if sort_by not in sort_fields:
+        frappe.throw(_("Cannot sort by {0}").format(sort_by), frappe.ValidationError)
+
+    sort_order = str(data.get("sort_order") or default_order).lower()
+    if sort_order not in SORT_ORDERS:
+        frappe.throw(_("sort_order must be asc or desc"), frappe.ValidationError)
+
+    page_size = get_page_size(data.get("page_size"))
+
+    where, params = build_list_filters(data, filter_fields, range_fields)
+    where = list(conditions or []) + where
+    params.update(values or {})
+    filter_sql = " AND ".join(where) or "1=1"
+
+    keyset_sql = ""
+    after = decode_cursor(data.get("cursor"), 4)
+    if after:
+        if after[0] != sort_by or after[1] != sort_order:
+            frappe.throw(_("Cursor does not match the requested sort"), frappe.ValidationError)
+
+        op = "<" if sort_order == "desc" else ">"
+        keyset_sql = f"""
+            AND (`{sort_by}` {op} %(after_value)s
+                OR (`{sort_by}` = %(after_value)s AND name {op} %(after_name)s))"""
+        params.update(after_value=after[2], after_name=after[3])
+
+    rows = frappe.db.sql(f"""
+        SELECT {", ".join(fields)}
+        FROM `tab{doctype}`
+        WHERE {filter_sql}{keyset_sql}
+        ORDER BY `{sort_by}` {sort_order}, name {sort_order}
+        LIMIT %(limit)s
+    """, dict(params, limit=page_size + 1), as_dict=True)
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    # A cursor without the sort values would silently restart from page one
+    if rows and (sort_by not in rows[0] or key_alias not in rows[0]):
+        frappe.throw(_("{0} and {1} must be selected to page by {0}").format(sort_by, key_alias),
+                     frappe.ValidationError)
+
+    next_cursor = None
+    if has_more and rows:
+        last_row = rows[-1]
+        next_cursor = encode_cursor([sort_by, sort_order, last_row[sort_by], last_row[key_alias]])
+
+    pagination = {
+        "page_size": page_size,
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+        "sort_by": sort_by,
+        "sort_order": sort_order
+    }
+
+    with_count = data.get("with_count")
+    if with_count and str(with_count).lower() not in ("0", "false"):
+        if str(with_count).lower() == "exact":
+            pagination["total_count"] = frappe.db.sql(f"""
+                SELECT COUNT(*) FROM `tab{doctype}` WHERE {filter_sql}
+            """, params)[0][0]
+            pagination["count_is_estimate"] = False
+        else:
+            plan = frappe.db.sql(f"""
+                EXPLAIN SELECT name FROM `tab{doctype}` WHERE {filter_sql}
+            """, params, as_dict=True)
+            pagination["total_count"] = int(plan[0].get("rows") or 0) if plan else 0
+            pagination["count_is_estimate"] = True
+
+    return rows, pagination
@@ -0,0 +1,167 @@
+"""
+Query Indexes - composite indexes for the hot request/company/payment queries
+
+HOT_QUERY_INDEXES is the single list of composite indexes; each doctype's
+on_doctype_update and the add_hot_query_indexes patch create them from here.
+HOT_QUERIES mirrors the WHERE clauses of the busiest endpoints so
+verify_hot_query_indexes can EXPLAIN them on any site:
+
+    bench --site <fixture-site> execute localmoves.utils.query_indexes.verify_hot_query_indexes
+"""
+
+
+import frappe
+
+
+HOT_QUERY_INDEXES = {
+    "Logistics Request": [
+        ["company_name", "status"],
+        ["pickup_pincode", "status", "company_name"],
+        ["company_name", "rating", "rated_at"],
+        # Incremental sync (get_request_changes) keysets on updated_at
+        ["company_name", "updated_at"],
+        ["pickup_pincode", "updated_at"],
+        ["previously_assigned_to", "updated_at"],
+        ["user_email", "updated_at"],
+        # Archival scan (localmoves.utils.request_archive)
+        ["status", "updated_at"],
+    ],
+    # Scoped removals read by get_request_changes (localmoves.utils.request_tombstones)
+    "Request Tombstone": [
+        ["company_name", "removed_at"],
+        ["previously_assigned_to", "removed_at"],
+        ["user_email", "removed_at"],
+        ["pickup_pincode", "removed_at"],
+    ],
+    "Logistics Company": [
+        ["is_active", "subscription_plan"],
+    ],
+    "Payment Transaction": [
+        ["deposit_status", "deposit_paid_at"],
+    ],
+    "School Holiday": [
+        ["start_date", "end_date"],
+    ],
+}
+
+
+# (label, query, params) - sample values only need the right types
+HOT_QUERIES = [
+    (
+        "manager statistics",
+        """SELECT status, COUNT(*) FROM `tabLogistics Request`
+           WHERE company_name = %(company)s GROUP BY status""",
+        {"company": "__index_check__"}
+    ),
+    (
+        "available requests in pincode",
+        """SELECT name FROM `tabLogistics Request`
+           WHERE pickup_pincode = %(pincode)s AND status = 'Pending'
+           AND (company_name IS NULL OR company_name = '')""",
+        {"pincode": "__index_check__"}
+    ),
+    (
+        "pending for company",
+        """SELECT name FROM `tabLogistics Request`
+           WHERE previously_assigned_to = %(company)s AND status = 'Pending'""",
+        {"company": "__index_check__"}
+    ),
+    (
+        "company reviews",
+        """SELECT name, rating, rated_at FROM `tabLogistics Request`
+           WHERE company_name = %(company)s AND rating > 0
+           ORDER BY rated_at DESC LIMIT 20""",
+        {"company": "__index_check__"}
+    ),
+    (
+        "user's requests",
+        """SELECT name FROM `tabLogistics Request`
+           WHERE user_email = %(email)s ORDER BY created_at DESC""",
+        {"email": "__index_check__"}
+    ),
+    (
+        "request changes since",
+        """SELECT name FROM `tabLogistics Request`
+           WHERE user_email = %(email)s AND updated_at > %(since)s
+           ORDER BY updated_at, name LIMIT 101""",
+        {"email": "__index_check__", "since": "2000-01-01"}
+    ),
+    (
+        "finished requests to archive",
+        """SELECT name FROM `tabLogistics Request`
+           WHERE status IN ('Completed', 'Cancelled') AND updated_at < %(cutoff)s
+           ORDER BY updated_at LIMIT 500""",
+        {"cutoff": "2000-01-01"}
+    ),
+    (
+        "active companies by plan",
+        """SELECT name FROM `tabLogistics Company`
+           WHERE is_active = 1 AND subscription_plan IN ('Standard', 'Premium')""",
+        {}
+    ),
+    (
+        "paid deposits in range",
+        """SELECT SUM(deposit_amount) FROM `tabPayment Transaction`
+           WHERE deposit_status = 'Paid' AND deposit_paid_at >= %(since)s""",
+        {"since": "2000-01-01"}
+    ),
+    (
+        "school holiday on date",
+        """SELECT name FROM `tabSchool Holiday`
+           WHERE is_active = 1 AND %(date)s BETWEEN start_date AND end_date""",
+        {"date": "2000-01-01"}
+    ),
+]
+
+
+def ensure_hot_query_indexes(doctype=None):
+    """Create the composite indexes for one doctype (or all of them)"""
+    for dt, indexes in HOT_QUERY_INDEXES.items():
+        if doctype and dt != doctype:
+            continue
+
+        for fields in indexes:
+            frappe.db.add_index(dt, fields)
+
+
+def verify_hot_query_indexes(raise_on_full_scan=True):
+    """
+    EXPLAIN every hot query and report full table scans.
+
+    A plan step fails when it scans the whole table with no usable index
+    (type ALL/index and possible_keys empty). On a small fixture the
+    optimiser may still pick a scan when an index exists; that is only
+    reported as a warning.
+    """
+    failures = []
+    warnings = []
+
+    for label, query, params in HOT_QUERIES:
+        for step in frappe.db.sql(f"EXPLAIN {query}", params, as_dict=True):
+            if not str(step.get("table") or "").startswith("tab"):
+                continue
+
+            if step.get("type") not in ("ALL", "index"):
+                continue
+
+            message = f"{label}: full scan on {step.get('table')} (key: {step.get('key') or 'none'})"
+            if step.get("possible_keys"):
+                warnings.append(message)
+            else:
+                failures.append(message)
+
+    for message in warnings:
+        print(f"⚠️ {message}")
+    for message in failures:
+        print(f"❌ {message}")
+
+    if failures and raise_on_full_scan:
+        frappe.throw(
+            f"{len(failures)} hot queries have no usable index:\n" + "\n".join(failures),
+            frappe.ValidationError
+        )
+
+    if not failures:
+        print(f"✅ All {len(HOT_QUERIES)} hot queries can use an index")
+
+    return {"success": not failures, "failures": failures, "warnings": warnings}
@@ -0,0 +1,174 @@
+"""
+Read Replica - run read-only endpoints against Frappe's replica connection
+
+Dashboards, charts, statistics, review listings and exports only read, so
+they can run on the replica and leave the primary to bookings and payments.
+Decorate a whitelisted endpoint with @read_from_replica (below
+@frappe.whitelist()) or wrap a block in `with replica_connection():`.
+
+The replica is used only when all of these hold:
+  - site config has read_from_replica (plus replica_host / replica_db_port,
+    the same keys frappe.read_only() uses)
+  - the replica answers and is replicating (SHOW SLAVE STATUS)
+  - it is at most replica_max_lag_seconds behind (default 30)
+Otherwise the code runs on the primary as before. While on the replica
+frappe.flags.read_only is set, as frappe.read_only() does, so the error logs
+written by the endpoints' except blocks are deferred to the primary instead
+of being inserted on the replica. The health check result is
+cached for a few seconds, so a lagging or dead replica costs one failed
+check per interval rather than one per request.
+
+SHOW SLAVE STATUS needs a global privilege that bench does not give the site's
+database user. Grant it once on the replica, or every check fails with
+"access denied" and all reads stay on the primary:
+
+    -- MariaDB 10.5+ (older MariaDB / MySQL: REPLICATION CLIENT)
+    GRANT SLAVE MONITOR ON *.* TO '<site db user>'@'%';
+
+localmoves/tests/test_read_replica.py covers the fallback with a mocked
+replica. To try it against a real one, run two MariaDB instances with the second replicating the
+first, point replica_host / replica_db_port at the second and run
+`bench --site <site> execute localmoves.utils.read_replica.get_replica_status`.
+STOP SLAVE on the replica (or stop the instance) and the status switches to
+the primary with the reason.
+"""
+
+
+import frappe
+from contextlib import contextmanager
+from functools import wraps
+
+
+REPLICA_MAX_LAG_SECONDS = 30
+HEALTH_CACHE_KEY = "read_replica_health"
+HEALTH_CHECK_SECONDS = 10
+
+# "you need (at least one of) the SLAVE MONITOR privilege(s)"
+ER_SPECIFIC_ACCESS_DENIED = 1227
+
+
+def replica_enabled():
+    return bool(frappe.conf.get("read_from_replica"))
+
+
+def get_max_lag_seconds():
+    """Lag beyond which reads stay on the primary (site config: replica_max_lag_seconds)"""
+    return int(frappe.conf.get("replica_max_lag_seconds") or REPLICA_MAX_LAG_SECONDS)
+
+
+def get_replica_lag():
+    """Seconds the current connection's server is behind its primary, or None if not replicating"""
+    status = frappe.db.sql("SHOW SLAVE STATUS", as_dict=True)
+    if not status:
+        return None
+
+    lag = status[0].get("Seconds_Behind_Master")
+    return None if lag is None else int(lag)
+
+
+def _check_replica():
+    """Health of the replica frappe.db currently points at"""
+    try:
+        lag = get_replica_lag()
+    except Exception as e:
+        if e.args and e.args[0] == ER_SPECIFIC_ACCESS_DENIED:
+            return {"healthy": False, "lag": None,
+                    "reason": "site db user cannot run SHOW SLAVE STATUS (grant SLAVE MONITOR)"}
+        return {"healthy": False, "lag": None, "reason": f"replica unavailable: {str(e)}"}
+
+    if lag is None:
+        return {"healthy": False, "lag": None, "reason": "replica is not replicating"}
+
+    if lag > get_max_lag_seconds():
+        return {"healthy": False, "lag": lag, "reason": f"replica is {lag}s behind"}
+
+    return {"healthy": True, "lag": lag, "reason": None}
+
+
+def _switch_to_primary():
+    replica = frappe.local.db
+    frappe.local.db = frappe.local.primary_db
+    del frappe.local.primary_db
+    del frappe.local.replica_db
+
+    try:
+        replica.close()
+    except Exception:
+        pass
+
+
+def _switch_to_replica():
+    """Point frappe.db at a healthy replica; returns False to stay on the primary"""
+    if not replica_enabled():
+        return False
+
+    # Already on the replica (nested call or frappe.read_only())
+    if hasattr(frappe.local, "primary_db"):
+        return False
+
+    cache = frappe.cache()
+    health = cache.get_value(HEALTH_CACHE_KEY)
+    if health and not health["healthy"]:
+        return False
+
+    try:
+        if not frappe.connect_replica():
+            return False
+    except Exception as e:
+        frappe.log_error(f"Read Replica Connect Error: {str(e)}")
+        return False
+
+    if not health:
+        health = _check_replica()
+        cache.set_value(HEALTH_CACHE_KEY, health, expires_in_sec=HEALTH_CHECK_SECONDS)
+
+        if not health["healthy"]:
+            frappe.logger("localmoves").warning(f"Reads fall back to primary: {health['reason']}")
+            _switch_to_primary()
+            return False
+
+    return True
+
+
+@contextmanager
+def replica_connection():
+    """Run the block on the replica when it is healthy, else on the primary"""
+    switched = _switch_to_replica()
+    if switched:
+        was_read_only = frappe.flags.read_only
+        frappe.flags.read_only = True
+
+    try:
+        yield switched
+    finally:
+        if switched:
+            frappe.flags.read_only = was_read_only
+            _switch_to_primary()
+
+
+def read_from_replica(fn):
+    """Decorator for read-only endpoints; must never wrap code that writes"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with replica_connection():
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def get_replica_status():
+    """Fresh routing decision for this site (bench execute / health checks)"""
+    if not replica_enabled():
+        return {"enabled": False, "using_replica": False, "reason": "read_from_replica is not set"}
+
+    frappe.cache().delete_value(HEALTH_CACHE_KEY)
+
+    with replica_connection() as using_replica:
+        health = frappe.cache().get_value(HEALTH_CACHE_KEY) or {}
+
+    return {
+        "enabled": True,
+        "using_replica": using_replica,
+        "lag": health.get("lag"),
+        "max_lag": get_max_lag_seconds(),
+        "reason": health.get("reason")
+    }
@@ -0,0 +1,171 @@
+"""
+Request Archive - hot/cold split for Logistics Request
+
+Completed and Cancelled requests that have not changed for
+ARCHIVE_AFTER_MONTHS are moved in batches from `tabLogistics Request` to
+`tabLogistics Request Archive` by a daily job. The archive is created with
+CREATE TABLE ... LIKE, so it has the same columns and indexes; columns added
+to Logistics Request later are copied over before each run.
+
+The hot queries never touch the archive. Read APIs union it in only when the
+caller asks for it (include_archived), via requests_source(); dashboard totals
+always count both tables (count_requests_by_status).
+
+Requests with a Payment Transaction that is still open stay hot, so payment
+flows that load the linked request keep finding it. Each archived request
+gets an Archived Request Tombstone carrying its scope columns, so delta
+syncs (get_request_changes) drop it from the clients that had it.
+"""
+
+
+import frappe
+from frappe.utils import add_months, now_datetime
+from localmoves.utils.request_tombstones import insert_tombstones
+
+
+SOURCE_TABLE = "tabLogistics Request"
+ARCHIVE_DOCTYPE = "Logistics Request Archive"
+ARCHIVE_TABLE = f"tab{ARCHIVE_DOCTYPE}"
+
+ARCHIVE_STATUSES = ("Completed", "Cancelled")
+ARCHIVE_AFTER_MONTHS = 12
+ARCHIVE_BATCH_SIZE = 500
+
+# Payment Transaction statuses after which nothing loads the request any more
+SETTLED_PAYMENT_STATUSES = ("Fully Paid", "Verified", "Refunded", "Failed")
+
+
+def get_archive_after_months():
+    """Months a finished request stays hot (site config: request_archive_after_months)"""
+    return int(frappe.conf.get("request_archive_after_months") or ARCHIVE_AFTER_MONTHS)
+
+
+def wants_archived(value):
+    """Read an include_archived flag from a query arg or JSON body"""
+    return str(value).strip().lower() in ("1", "true", "yes")
+
+
+def archive_table_exists():
+    return frappe.db.table_exists(ARCHIVE_DOCTYPE)
+
+
+def _table_columns(table):
+    return [row[0] for row in frappe.db.sql(f"SHOW COLUMNS FROM `{table}`")]
+
+
+def ensure_archive_table():
+    """Create the archive table, or add columns Logistics Request gained since"""
+    if not frappe.db.table_exists(ARCHIVE_DOCTYPE, cached=False):
+        frappe.db.sql_ddl(f"CREATE TABLE IF NOT EXISTS `{ARCHIVE_TABLE}` LIKE `{SOURCE_TABLE}`")
+        return
+
+    archive_columns = set(_table_columns(ARCHIVE_TABLE))
+    for column in frappe.db.sql(f"SHOW COLUMNS FROM `{SOURCE_TABLE}`", as_dict=True):
+        if column.Field not in archive_columns:
+            frappe.db.sql_ddl(
+                f"ALTER TABLE `{ARCHIVE_TABLE}` ADD COLUMN `{column.Field}` {column.Type} NULL"
+            )
+
+
+def requests_source(columns, where="1=1", include_archived=False):
+    """
+    FROM-clause source for Logistics Request reads.
+
+    Without include_archived this is just the hot table. With it, the hot and
+    archive tables are UNION ALLed with `where` applied inside each branch so
+    both sides still use their indexes. Either way the rows carry an
+    `archived` column (0/1) and the source is aliased `requests`.
+    """
+    column_sql = ", ".join(columns)
+    source = f"SELECT {column_sql}, 0 AS archived FROM `{SOURCE_TABLE}` WHERE {where}"
+
+    if include_archived and archive_table_exists():
+        source += f"\n UNION ALL\n SELECT {column_sql}, 1 AS archived FROM `{ARCHIVE_TABLE}` WHERE {where}"
+
+    return f"({source}) requests"
+
+
+def count_requests_by_status(where="1=1", values=None):
+    """(total, {status: count}) over hot and archived requests matching `where`"""
+    rows = frappe.db.sql(f"""
+        SELECT status, COUNT(*) AS count
+        FROM {requests_source(["status"], where, include_archived=True)}
+        GROUP BY status
+    """, values or {}, as_dict=True)
+
+    by_status = {row.status: int(row["count"]) for row in rows}
+    return sum(by_status.values()), by_status
+
+
+def archive_finished_requests(after_months=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move Completed/Cancelled requests untouched for `after_months` to the archive (scheduler).
+
+    Each batch is copied and deleted in one transaction, so a failure leaves
+    the batch in the hot table for the next run.
+    """
+    cutoff = add_months(now_datetime(), -(after_months or get_archive_after_months()))
+
+    ensure_archive_table()
+    column_sql = ", ".join(f"`{column}`" for column in _table_columns(SOURCE_TABLE))
+
+    archived = 0
+    while True:
+        # (status, updated_at) index
+        rows = frappe.db.sql(f"""
+            SELECT name, company_name, previously_assigned_to, user_email, pickup_pincode
+            FROM `{SOURCE_TABLE}` r
+            WHERE status IN %(statuses)s
+            AND updated_at < %(cutoff)s
+            AND NOT EXISTS (
+                SELECT 1 FROM `tabPayment Transaction` pt
+                WHERE pt.request_id = r.name
+                AND pt.payment_status NOT IN %(settled)s
+            )
+            ORDER BY updated_at
+            LIMIT %(limit)s
+        """, {
+            "statuses": ARCHIVE_STATUSES,
+            "settled": SETTLED_PAYMENT_STATUSES,
+            "cutoff": cutoff,
+            "limit": batch_size
+        }, as_dict=True)
+
+        if not rows:
+            break
+
+        names = tuple(row.name for row in rows)
+
+        try:
+            frappe.db.sql(f"""
+                INSERT INTO `{ARCHIVE_TABLE}` ({column_sql})
+                SELECT {column_sql} FROM `{SOURCE_TABLE}`
+                WHERE name IN %(names)s
+            """, {"names": names})
+
+            frappe.db.sql(f"""
+                DELETE FROM `{SOURCE_TABLE}`
+                WHERE name IN %(names)s
+            """, {"names": names})
+
+            insert_tombstones(rows, "Archived")
+
+            frappe.db.commit()
+
+        except Exception as e:
+            frappe.db.rollback()
+            frappe.log_error(f"Archive requests error: {str(e)}")
+            break
+
+        archived += len(names)
+
+        from localmoves.api.request import clear_request_statistics
+        clear_request_statistics(*{row.company_name for row in rows})
+
+        if len(rows) < batch_size:
+            break
+
+    if archived:
+        print(f"✅ Archived {archived} finished requests older than {cutoff:%Y-%m-%d}")
+
+    return archived
@@ -0,0 +1,76 @@
+"""
+Request Tombstones - scoped removal records for incremental request sync
+
+get_request_changes only sees requests that are still in a caller's scope.
+A request that leaves a scope without a row change the caller can see needs
+a tombstone instead:
+    - Deleted: the request is gone (Logistics Request after_delete)
+    - Archived: moved to the archive table (localmoves.utils.request_archive)
+    - Unassigned: a company lost it to another company or to the pool
+
+A Request Tombstone carries the same scope columns as Logistics Request
+(company_name, previously_assigned_to, user_email, pickup_pincode), so the
+delta query applies the caller's scope condition to both tables. An
+Unassigned tombstone only fills company_name: the customer and the pincode
+pool still see the request itself.
+"""
+
+
+import frappe
+from datetime import datetime
+
+
+TOMBSTONE_DOCTYPE = "Request Tombstone"
+SCOPE_FIELDS = ("company_name", "previously_assigned_to", "user_email", "pickup_pincode")
+
+
+def insert_tombstones(requests, reason, removed_at=None):
+    """Tombstones for request rows (dicts with name and the scope fields)"""
+    requests = list(requests)
+    if not requests:
+        return
+
+    now = removed_at or datetime.now()
+    frappe.db.bulk_insert(
+        TOMBSTONE_DOCTYPE,
+        ["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+         "request_id", "reason", "removed_at"] + list(SCOPE_FIELDS),
+        [
+            (frappe.generate_hash(length=10), now, now, "Administrator", "Administrator", 0, 0,
+             request.get("name"), reason, now) + tuple(request.get(field) for field in SCOPE_FIELDS)
+            for request in requests
+        ]
+    )
+
+
+def record_request_exits(exits, removed_at=None):
+    """Unassigned tombstones for (request_id, company_name) pairs a company no longer sees"""
+    insert_tombstones(
+        ({"name": request_id, "company_name": company_name} for request_id, company_name in exits if company_name),
+        "Unassigned",
+        removed_at
+    )
+
+
+def get_request_owners(names, column="previously_assigned_to"):
+    """{request: company} for the requests whose `column` is set (read before an UPDATE clears it)"""
+    if not names:
+        return {}
+
+    return dict(frappe.db.sql(f"""
+        SELECT name, `{column}`
+        FROM `tabLogistics Request`
+        WHERE name IN %(names)s
+        AND `{column}` IS NOT NULL AND `{column}` != ''
+    """, {"names": tuple(names)}))
+
+
+def get_removed_requests(scope_condition, params, after_ts, window_end):
+    """Tombstones in (after_ts, window_end] matching scope_condition, one per request"""
+    return frappe.db.sql(f"""
+        SELECT request_id AS name, MAX(reason) AS status
+        FROM `tab{TOMBSTONE_DOCTYPE}`
+        WHERE ({scope_condition})
+        AND removed_at > %(after_ts)s AND removed_at <= %(window_end)s
+        GROUP BY request_id
+    """, dict(params, after_ts=after_ts, window_end=window_end), as_dict=True)
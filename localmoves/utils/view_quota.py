@@ -0,0 +1,364 @@
+"""
+View Quota - per-company monthly request quota held in Redis
+
+Usage is keyed by billing period: each (period, company) has one hash with
+usage, plan limit, plan and subscription end. A new month starts with a new
+key, so there is no reset job. Quota checks read the hash, and taking the
+quota is an atomic check-and-increment.
+
+The site's Redis cache evicts keys and does not survive every restart, so
+usage is also written through to a Company Quota Usage row per period (and
+mirrored onto Logistics Company.requests_viewed_this_month / quota_period):
+every change queues sync_quota_usage to run right after the caller's commit.
+An evicted hash is re-seeded from that row. The scheduled flush of dirty
+hashes stays as a safety net for syncs that failed or never ran.
+"""
+
+
+import frappe
+from datetime import datetime
+from functools import partial
+
+
+QUOTA_KEY_PREFIX = "view_quota:"
+DIRTY_KEY = "view_quota_dirty"
+QUOTA_TTL = 40 * 24 * 60 * 60
+FLUSH_BATCH_SIZE = 500
+SYNC_SAVEPOINT = "view_quota_sync"
+
+QUOTA_FIELDS = [
+    "company_name", "subscription_plan", "is_active", "subscription_end_date"
+]
+
+# KEYS: quota hash, dirty set. ARGV: dirty member, enforce limit (1/0), delta.
+# Returns the new usage, -1 when the limit is reached, -2 when not loaded.
+CONSUME_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -2
+end
+local delta = tonumber(ARGV[3])
+local used = tonumber(redis.call('HGET', KEYS[1], 'used') or '0')
+local limit = tonumber(redis.call('HGET', KEYS[1], 'limit') or '0')
+if ARGV[2] == '1' and delta > 0 and limit ~= -1 and used + delta > limit then
+    return -1
+end
+if used + delta < 0 then
+    delta = -used
+end
+used = redis.call('HINCRBY', KEYS[1], 'used', delta)
+redis.call('SADD', KEYS[2], ARGV[1])
+return used
+"""
+
+# KEYS: quota hash. ARGV: field/value pairs. Only seeds a missing hash so a
+# concurrent consume is never overwritten.
+SEED_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('HSET', KEYS[1], unpack(ARGV))
+    redis.call('EXPIRE', KEYS[1], %(ttl)s)
+end
+return redis.call('HGETALL', KEYS[1])
+""" % {"ttl": QUOTA_TTL}
+
+# KEYS: dirty set. ARGV: batch size, quota key prefix.
+# Pops a batch of dirty "period:company" members and returns member/used/plan triples.
+POP_DIRTY_SCRIPT = """
+local members = redis.call('SPOP', KEYS[1], tonumber(ARGV[1]))
+local out = {}
+for _, member in ipairs(members) do
+    local values = redis.call('HMGET', ARGV[2] .. member, 'used', 'plan')
+    if values[1] then
+        table.insert(out, member)
+        table.insert(out, values[1])
+        table.insert(out, values[2] or '')
+    end
+end
+return out
+"""
+
+GET_SCRIPT = "return redis.call('HGETALL', KEYS[1])"
+
+# KEYS: quota hash, dirty set. ARGV: dirty member, then field/value pairs.
+# Updates an existing hash only; marks it dirty when usage is overwritten.
+REFRESH_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local fields = {}
+for i = 2, #ARGV do
+    fields[#fields + 1] = ARGV[i]
+    if i % 2 == 0 and ARGV[i] == 'used' then
+        redis.call('SADD', KEYS[2], ARGV[1])
+    end
+end
+redis.call('HSET', KEYS[1], unpack(fields))
+return 1
+"""
+
+
+def current_period():
+    """Billing period key for today, e.g. 2026-10"""
+    return datetime.now().strftime("%Y-%m")
+
+
+def get_plan_limit(plan):
+    """Monthly request limit for a plan (-1 is unlimited)"""
+    from localmoves.api.request import PLAN_LIMITS
+    return PLAN_LIMITS.get(plan or "Basic", 10)
+
+
+def get_period_usage(company):
+    """
+    Current-period usage from a Logistics Company row or document.
+
+    requests_viewed_this_month only mirrors the last flushed period, so it
+    counts as 0 once quota_period is behind the current month.
+    """
+    if company.get("quota_period") != current_period():
+        return 0
+    return int(company.get("requests_viewed_this_month") or 0)
+
+
+def _member(company_name, period=None):
+    return f"{period or current_period()}:{company_name}"
+
+
+def _quota_key(company_name, period=None):
+    return frappe.cache().make_key(f"{QUOTA_KEY_PREFIX}{_member(company_name, period)}")
+
+
+def _dirty_key():
+    return frappe.cache().make_key(DIRTY_KEY)
+
+
+def _plan_fields(company):
+    """Hash fields derived from the company's plan and subscription"""
+    plan = company.get("subscription_plan") or "Basic"
+    end_date = company.get("subscription_end_date")
+    return {
+        "plan": plan,
+        "limit": get_plan_limit(plan),
+        "active": 1 if company.get("is_active") else 0,
+        "subscription_end": str(end_date) if end_date else ""
+    }
+
+
+def _flatten(fields):
+    pairs = []
+    for field, value in fields.items():
+        pairs.extend([field, value])
+    return pairs
+
+
+def _decode(raw):
+    """HGETALL reply (flat list or dict of bytes) -> dict of str"""
+    if isinstance(raw, dict):
+        items = raw.items()
+    else:
+        items = zip(raw[::2], raw[1::2])
+
+    return {
+        (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+        for k, v in items
+    }
+
+
+def load_quota(company_name):
+    """
+    Current-period quota hash for a company, seeded from the database on a miss.
+
+    Returns None if the company does not exist.
+    """
+    cache = frappe.cache()
+    key = _quota_key(company_name)
+
+    # Scripts throughout: the cache wrapper's h*/s* helpers pickle values
+    raw = cache.eval(GET_SCRIPT, 1, key)
+    if not raw:
+        company = frappe.db.get_value("Logistics Company", company_name, QUOTA_FIELDS, as_dict=True)
+        if not company:
+            return None
+
+        fields = _plan_fields(company)
+        fields["used"] = frappe.db.get_value(
+            "Company Quota Usage",
+            {"company": company_name, "period": current_period()},
+            "requests_used"
+        ) or 0
+
+        raw = cache.eval(SEED_SCRIPT, 1, key, *_flatten(fields))
+
+    quota = _decode(raw)
+    quota["used"] = int(quota.get("used") or 0)
+    quota["limit"] = int(quota.get("limit") or 0)
+    return quota
+
+
+def get_quota_company(company_name):
+    """
+    Quota as a company-shaped row, so it can be passed to the request
+    module's evaluate_subscription / evaluate_view_limit.
+    """
+    quota = load_quota(company_name)
+    if quota is None:
+        return None
+
+    end_date = quota.get("subscription_end")
+    return frappe._dict({
+        "company_name": company_name,
+        "subscription_plan": quota.get("plan"),
+        "is_active": int(quota.get("active") or 0),
+        "subscription_end_date": datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else None,
+        "requests_viewed_this_month": quota["used"]
+    })
+
+
+def _apply_delta(company_name, delta, enforce_limit):
+    cache = frappe.cache()
+    keys = [_quota_key(company_name), _dirty_key()]
+    args = [_member(company_name), 1 if enforce_limit else 0, delta]
+
+    result = cache.eval(CONSUME_SCRIPT, 2, *keys, *args)
+    if result == -2:
+        if load_quota(company_name) is None:
+            return -2
+        result = cache.eval(CONSUME_SCRIPT, 2, *keys, *args)
+
+    if result >= 0:
+        frappe.db.after_commit.add(partial(sync_quota_usage, company_name))
+
+    return result
+
+
+def consume_quota(company_name, count=1):
+    """
+    Take `count` requests from the monthly quota, all or nothing.
+    Returns the new usage, or None if not enough was left.
+    """
+    used = _apply_delta(company_name, count, enforce_limit=True)
+    return used if used >= 0 else None
+
+
+def add_usage(company_name, delta=1):
+    """Record usage without enforcing the limit (assignments made on the user's behalf)"""
+    return _apply_delta(company_name, delta, enforce_limit=False)
+
+
+def release_quota(company_name, count=1):
+    """Give back quota taken for assignments that were rolled back, cancelled or declined"""
+    return _apply_delta(company_name, -count, enforce_limit=False)
+
+
+def _refresh(company_name, fields):
+    frappe.cache().eval(
+        REFRESH_SCRIPT, 2, _quota_key(company_name), _dirty_key(),
+        _member(company_name), *_flatten(fields)
+    )
+
+
+def refresh_quota_plan(company):
+    """Push plan/subscription changes from a saved Logistics Company into its hash"""
+    _refresh(company.name, _plan_fields(company))
+
+
+def reset_quota_usage(company_name, used=0):
+    """Overwrite current-period usage, e.g. when a new subscription resets the counter"""
+    if load_quota(company_name) is not None:
+        _refresh(company_name, {"used": int(used or 0)})
+        sync_quota_usage(company_name)
+
+
+def _write_usage(company_name, period, used, plan, now):
+    """Upsert one period's usage row and, for the current period, the company mirror"""
+    frappe.db.sql("""
+        INSERT INTO `tabCompany Quota Usage`
+            (name, creation, modified, owner, modified_by, docstatus, idx,
+             company, period, subscription_plan, requests_used)
+        VALUES (%(name)s, %(now)s, %(now)s, 'Administrator', 'Administrator', 0, 0,
+             %(company)s, %(period)s, %(plan)s, %(used)s)
+        ON DUPLICATE KEY UPDATE
+            requests_used = VALUES(requests_used),
+            subscription_plan = VALUES(subscription_plan),
+            modified = VALUES(modified)
+    """, {
+        "name": f"{company_name}-{period}",
+        "company": company_name,
+        "period": period,
+        "plan": plan,
+        "used": used,
+        "now": now
+    })
+
+    if period == current_period():
+        frappe.db.sql("""
+            UPDATE `tabLogistics Company`
+            SET requests_viewed_this_month = %s, quota_period = %s
+            WHERE name = %s
+        """, (used, period, company_name))
+
+
+def sync_quota_usage(company_name):
+    """
+    Write a company's current usage from Redis to the database (after_commit).
+
+    The usage row is locked before Redis is read, so concurrent syncs for a
+    company write in the order they read and the last one leaves the latest value.
+    Errors roll back to a savepoint only: a full rollback would drop the other
+    after_commit callbacks still waiting to run.
+    """
+    period = current_period()
+    now = datetime.now()
+    frappe.db.savepoint(SYNC_SAVEPOINT)
+
+    try:
+        frappe.db.sql("""
+            INSERT IGNORE INTO `tabCompany Quota Usage`
+                (name, creation, modified, owner, modified_by, docstatus, idx,
+                 company, period, requests_used)
+            VALUES (%(name)s, %(now)s, %(now)s, 'Administrator', 'Administrator', 0, 0,
+                 %(company)s, %(period)s, 0)
+        """, {"name": f"{company_name}-{period}", "company": company_name, "period": period, "now": now})
+        frappe.db.sql("""
+            SELECT name FROM `tabCompany Quota Usage` WHERE name = %s FOR UPDATE
+        """, f"{company_name}-{period}")
+
+        raw = frappe.cache().eval(GET_SCRIPT, 1, _quota_key(company_name, period))
+        if raw:
+            quota = _decode(raw)
+            _write_usage(company_name, period, int(quota.get("used") or 0), quota.get("plan") or "", now)
+
+    except Exception as e:
+        frappe.db.rollback(save_point=SYNC_SAVEPOINT)
+        # Still dirty in Redis, so the scheduled flush writes it instead
+        frappe.log_error(f"Sync view quota usage error: {str(e)}")
+
+    frappe.db.commit()
+
+
+def flush_view_quota_counts():
+    """Write usage from Redis to Company Quota Usage and the company mirror (scheduler)"""
+    cache = frappe.cache()
+    prefix = cache.make_key(QUOTA_KEY_PREFIX)
+
+    while True:
+        raw = cache.eval(POP_DIRTY_SCRIPT, 1, _dirty_key(), FLUSH_BATCH_SIZE, prefix)
+        if not raw:
+            break
+
+        raw = [v.decode() if isinstance(v, bytes) else v for v in raw]
+        members = raw[::3]
+
+        try:
+            now = datetime.now()
+            for member, used, plan in zip(raw[::3], raw[1::3], raw[2::3]):
+                period, company_name = member.split(":", 1)
+                _write_usage(company_name, period, int(used or 0), plan, now)
+
+            frappe.db.commit()
+
+        except Exception as e:
+            frappe.db.rollback()
+            # Mark them dirty again so the next run retries
+            cache.eval("return redis.call('SADD', KEYS[1], unpack(ARGV))", 1, _dirty_key(), *members)
+            frappe.log_error(f"Flush view quota counts error: {str(e)}")
+            break